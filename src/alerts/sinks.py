@@ -0,0 +1,189 @@
+import json
+import queue
+import socket
+import threading
+from dataclasses import asdict
+from typing import Optional
+
+import requests
+
+from instrumentation.telemetry import ALERTS_DROPPED, ALERTS_SENT, incr
+
+# Events waiting for a sink beyond this are dropped, oldest first
+DEFAULT_QUEUE_SIZE = 1000
+
+_CLOSE = object()
+
+
+class Sink:
+    """
+    Delivers opportunity events from a background thread.
+
+    submit never blocks: events wait in a bounded queue and a sink that cannot keep up loses its oldest events
+    rather than stalling the scan loop. Subclasses implement deliver, which may block or raise; a failed delivery is
+    logged and the event dropped.
+
+    Attributes:
+        name (str): Label of the sink in telemetry.
+        dropped (int): Events lost because the queue was full or delivery failed.
+    """
+
+    name = "sink"
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.thread = threading.Thread(
+            target=self._run, name=f"alerts-{self.name}", daemon=True
+        )
+        self.thread.start()
+
+    def deliver(self, event):
+        raise NotImplementedError
+
+    def submit(self, event):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self._drop()
+                except queue.Empty:
+                    pass
+
+    def _drop(self):
+        self.dropped += 1
+        incr(ALERTS_DROPPED, sink=self.name)
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is _CLOSE:
+                return
+            try:
+                self.deliver(event)
+                incr(ALERTS_SENT, sink=self.name)
+            except Exception as e:
+                print(f"Alert sink {self.name} failed: {e!r}")
+                self._drop()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """
+        Delivers the queued events, waiting at most timeout seconds, and stops the thread. Like submit it never
+        blocks on a full queue, which loses its oldest event instead.
+        """
+        self.submit(_CLOSE)
+        self.thread.join(timeout)
+
+
+def event_json(event) -> str:
+    return json.dumps(asdict(event), ensure_ascii=False, default=str)
+
+
+class PrintSink(Sink):
+    name = "print"
+
+    def deliver(self, event):
+        print(event.summary())
+
+
+class JsonlSink(Sink):
+    """
+    Appends one JSON line per event to a file.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, path: str, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.path = path
+        super().__init__(queue_size)
+
+    def deliver(self, event):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(event_json(event) + "\n")
+
+
+class WebhookSink(Sink):
+    """
+    POSTs each event as JSON to a URL, e.g. a local bot or dashboard.
+    """
+
+    name = "webhook"
+
+    def __init__(
+        self, url: str, timeout: float = 5.0, queue_size: int = DEFAULT_QUEUE_SIZE
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        super().__init__(queue_size)
+
+    def deliver(self, event):
+        response = self.session.post(
+            self.url,
+            data=event_json(event).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+
+class SocketSink(Sink):
+    """
+    Streams events as JSON lines over a TCP connection, 'host:port', or a Unix socket path. The connection is opened
+    on the first event and reopened after a failure.
+    """
+
+    name = "socket"
+
+    def __init__(
+        self, address: str, timeout: float = 5.0, queue_size: int = DEFAULT_QUEUE_SIZE
+    ):
+        self.address = address
+        self.timeout = timeout
+        self.connection: Optional[socket.socket] = None
+        super().__init__(queue_size)
+
+    def _connect(self) -> socket.socket:
+        host, _, port = self.address.rpartition(":")
+        if host and port.isdigit():
+            return socket.create_connection((host, int(port)), timeout=self.timeout)
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        connection.connect(self.address)
+        return connection
+
+    def deliver(self, event):
+        if self.connection is None:
+            self.connection = self._connect()
+        try:
+            self.connection.sendall((event_json(event) + "\n").encode("utf-8"))
+        except OSError:
+            self.connection.close()
+            self.connection = None
+            raise
+
+    def close(self, timeout: Optional[float] = 5.0):
+        super().close(timeout)
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def sinks_from_settings():
+    """
+    The sinks configured by ALERT_JSONL_PATH, ALERT_WEBHOOK_URL and ALERT_SOCKET_ADDRESS, printing to stdout when
+    none is.
+    """
+    import settings
+
+    sinks = []
+    if settings.ALERT_JSONL_PATH:
+        sinks.append(JsonlSink(settings.ALERT_JSONL_PATH))
+    if settings.ALERT_WEBHOOK_URL:
+        sinks.append(WebhookSink(settings.ALERT_WEBHOOK_URL))
+    if settings.ALERT_SOCKET_ADDRESS:
+        sinks.append(SocketSink(settings.ALERT_SOCKET_ADDRESS))
+    return sinks or [PrintSink()]
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from history.price_store import now_ms
+from instrumentation.telemetry import ALERTS_SUPPRESSED, incr
+
+# An opportunity already reported is reported again after this long, or sooner when its value moved by MIN_CHANGE
+DEBOUNCE_MS = 5 * 60 * 1000
+MIN_CHANGE = 0.01
+
+
+@dataclass
+class OpportunityEvent:
+    """
+    An arbitrage opportunity on a matched pair.
+
+    Attributes:
+        venue (str): The venue the Futuur market is matched with.
+        futuur_id: The Futuur market id.
+        market_id: The market id on the other venue.
+        outcomes (list): The outcomes the opportunity covers, as [title, futuur price, other venue price].
+        agg_value (float): What covering every outcome costs; below 1 is a profit.
+        title (str, optional): The Futuur market title.
+        stake (float, optional): How much the risk limits allow, or the capital allocated to it, in USDC.
+        annualized_return (float, optional): The return of the stake compounded over a year of lock-ups.
+        detected_ms (int): When the opportunity was seen.
+        repeat (int): How many times the same opportunity was reported before.
+    """
+
+    venue: str
+    futuur_id: object
+    market_id: object
+    outcomes: List[list]
+    agg_value: float
+    title: Optional[str] = None
+    stake: Optional[float] = None
+    annualized_return: Optional[float] = None
+    detected_ms: int = field(default_factory=now_ms)
+    repeat: int = 0
+
+    @property
+    def key(self) -> Tuple:
+        """
+        Identifies an opportunity: the pair and the set of outcomes it covers, whatever the prices.
+        """
+        return (
+            self.venue,
+            str(self.futuur_id),
+            str(self.market_id),
+            tuple(sorted(str(o[0]) for o in self.outcomes)),
+        )
+
+    def summary(self) -> str:
+        lines = [
+            f"Opportunity {self.title or self.futuur_id} ({self.venue} {self.market_id}): "
+            f"agg_value={self.agg_value:.4f}"
+            + (f", stake={self.stake:.2f} USDC" if self.stake is not None else "")
+            + (
+                f", annualized={self.annualized_return:.1%}"
+                if self.annualized_return is not None
+                else ""
+            )
+        ]
+        lines += [
+            f"  {title}: futuur={futuur_price} {self.venue}={other_price}"
+            for title, futuur_price, other_price in self.outcomes
+        ]
+        return "\n".join(lines)
+
+
+class OpportunityStream:
+    """
+    Deduplicates and debounces opportunity events and fans them out to sinks.
+
+    The same opportunity, identified by OpportunityEvent.key, is forwarded once, then again only when debounce_ms
+    passed or its agg_value moved by at least min_change. An opportunity that went away and comes back is new.
+    Delivery is asynchronous, see alerts.sinks.Sink, so publish returns as soon as the event is queued.
+
+    With a state_path, what was reported is loaded when the stream is created and saved when it is closed, so
+    separate runs, e.g. successive run_main invocations, do not report the same opportunity again. Processes sharing
+    the file at the same time each save their own state, the last one closed wins.
+
+    Attributes:
+        sinks (list): Where events are delivered.
+        debounce_ms (int): Minimum time between two reports of an unchanged opportunity.
+        min_change (float): agg_value move that is reported before the debounce time.
+        state_path (str, optional): The JSON file the reported opportunities are kept in between runs.
+    """
+
+    def __init__(
+        self,
+        sinks: Sequence,
+        debounce_ms: int = DEBOUNCE_MS,
+        min_change: float = MIN_CHANGE,
+        state_path: Optional[str] = None,
+    ):
+        self.sinks = list(sinks)
+        self.debounce_ms = debounce_ms
+        self.min_change = min_change
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        # key -> (last reported ms, last reported agg_value, reports)
+        self.reported: Dict[Tuple, Tuple[int, float, int]] = {}
+        if state_path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            # A damaged state only means reporting the current opportunities again
+            return
+        for (venue, futuur_id, market_id, outcomes), reported in entries:
+            self.reported[(venue, futuur_id, market_id, tuple(outcomes))] = tuple(
+                reported
+            )
+
+    def save(self):
+        """
+        Writes the reported opportunities to state_path, replacing the file at once so a crash never leaves half of
+        it.
+        """
+        if not self.state_path:
+            return
+        with self.lock:
+            entries = [[list(key), list(value)] for key, value in self.reported.items()]
+        temporary = self.state_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(temporary, self.state_path)
+
+    def publish(self, event: OpportunityEvent) -> bool:
+        """
+        Forwards the event to every sink unless it repeats a recent report.
+
+        Returns:
+            bool: Whether the event was forwarded.
+        """
+        key = event.key
+        with self.lock:
+            last = self.reported.get(key)
+            if last is not None:
+                reported_ms, agg_value, reports = last
+                if (
+                    event.detected_ms - reported_ms < self.debounce_ms
+                    and abs(event.agg_value - agg_value) < self.min_change
+                ):
+                    incr(ALERTS_SUPPRESSED)
+                    return False
+                event.repeat = reports
+            self.reported[key] = (event.detected_ms, event.agg_value, event.repeat + 1)
+        for sink in self.sinks:
+            sink.submit(event)
+        return True
+
+    def retain(
+        self,
+        events: Sequence[OpportunityEvent],
+        venues: Optional[Sequence[str]] = None,
+    ):
+        """
+        Forgets the opportunities missing from a full scan, so they are reported again if they come back.
+
+        Args:
+            venues (list, optional): The venues the scan covered. Opportunities of other venues are kept.
+        """
+        keys = {event.key for event in events}
+        with self.lock:
+            for key in list(self.reported):
+                if key not in keys and (venues is None or key[0] in venues):
+                    del self.reported[key]
+
+    def close(self, timeout: Optional[float] = 5.0):
+        self.save()
+        for sink in self.sinks:
+            sink.close(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
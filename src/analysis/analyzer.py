@@ -1,11 +1,21 @@
-import json
-import os
 from typing import List
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 
 import settings
+from alerts.stream import OpportunityEvent
+from analysis.arbitrage import (
+    aggregate_value,
+    align_manifold_answers,
+    manifold_answers,
+    optimal_bet_amounts,
+)
+from analysis.fingerprint import ChangeTracker, market_fingerprint, pair_fingerprint
 from futuur.futuur_api import FutuurAPI
+from futuur.rates import FutuurPriceTable
+from history.recorder import FUTUUR, MANIFOLD, PriceRecorder
+from instrumentation.telemetry import span
 from manifold.manifold_api import ManifoldAPI
+from matcher.registry import MatchRegistry
 
 
 @dataclass
@@ -22,98 +32,191 @@ class MatchingMarket:
     manifold_id: str
     total_probability: float = 1
     outcomes: List[MatchingOutcome] = field(default_factory=list)
+    # False when neither market moved since the last analysis and the cached result was reused
+    changed: bool = True
 
 
 class Analizer:
-    def __init__(self):
+    def __init__(
+        self,
+        recorder: PriceRecorder | None = None,
+        markets_path="markets.json",
+        registry: MatchRegistry | None = None,
+        changes: ChangeTracker | None = None,
+    ):
         """
         Initializes the Analizer that will determine if there are or not arbitrage oportunities
+
+        Args:
+            recorder (PriceRecorder, optional): When given, every fetched market price is appended to the price history.
+            markets_path (str): The JSON file an empty match registry is seeded from. Default is 'markets.json'.
+            registry (MatchRegistry, optional): The registry of matching markets. Default is the registry at
+                settings.MATCH_REGISTRY_PATH.
+            changes (ChangeTracker, optional): The cache of results of unchanged pairs. Default is the cache at
+                settings.ANALYSIS_CACHE_PATH.
         """
-        self.manifold_api = ManifoldAPI()
+        self.recorder = recorder
+        self.markets_path = markets_path
+        self.registry = registry or MatchRegistry()
+        self.changes = changes or ChangeTracker(settings.ANALYSIS_CACHE_PATH)
+        self.manifold_api = ManifoldAPI(
+            base_url=settings.MANIFOLD_BASE_URL, api_key=settings.MANIFOLD_API_KEY
+        )
         self.futuur_api = FutuurAPI(
-            settings.FUTUUR_PUBLIC_KEY, settings.FUTUUR_PRIVATE_KEY
+            settings.FUTUUR_PUBLIC_KEY,
+            settings.FUTUUR_PRIVATE_KEY,
+            base_url=settings.FUTUUR_BASE_URL,
         )
         self.matching_markets = self.retrieve_matching_markets_outcomes()
 
     def retrieve_matching_markets_outcomes(self, currency="OOM"):
-        matching_markets = self.load_markets_from_json()
+        matching_markets = self.load_markets()
+        # Every Manifold leg is fetched up front in one concurrent batch
+        mani_markets = self.manifold_api.get_markets_by_ids(
+            market.manifold_id for market in matching_markets
+        )
 
         for market in matching_markets:
-            futuur_market = self.futuur_api.get_market(market.futuur_id)
-            market.futuur_title = futuur_market.get("title")
-            mani_market = self.manifold_api.get_market_by_id(market.manifold_id)
+            self.retrieve_market_outcomes(
+                market, currency=currency, mani_market=mani_markets[market.manifold_id]
+            )
+        self.changes.save()
+
+        return matching_markets
 
-            if mani_market.get("outcomeType") == "BINARY":
-                mani_awnsers = [
-                    {"text": "yes", "probability": mani_market.get("probability")},
-                    {"text": "no", "probability": 1 - mani_market.get("probability")},
-                ]
-            else:
-                mani_awnsers = mani_market.get("answers")
-            futuur_outcomes = futuur_market.get("outcomes")
-            total_probability = 0
-            for m in mani_awnsers:
-
-                matches = False
-                for o in futuur_outcomes:
-                    if m.get("text").lower().strip() == o.get("title").lower().strip():
-                        probability_mani = m["probability"]
-                        probability_futuur = o["price"][currency]
-                        smaller_probability = min(probability_mani, probability_futuur)
-                        total_probability += smaller_probability
-                        matches = True
-                        market.outcomes.append(
-                            MatchingOutcome(
-                                o.get("title"), probability_futuur, probability_mani
-                            )
+    def retrieve_market_outcomes(
+        self, market: MatchingMarket, currency="OOM", mani_market: dict | None = None
+    ):
+        """
+        Fetches both sides of a matching market, matches their outcomes and computes the total probability. When
+        neither market changed since the last analysis, the cached result is reused instead.
+
+        Args:
+            market (MatchingMarket): The market to fill in. Updated in place.
+            currency (str): The Futuur price currency to compare against Manifold. Default is 'OOM'.
+            mani_market (dict, optional): The Manifold market when it was already fetched.
+        """
+        futuur_market = self.futuur_api.get_market(market.futuur_id)
+        market.futuur_title = futuur_market.get("title")
+        if mani_market is None:
+            mani_market = self.manifold_api.get_market_by_id(market.manifold_id)
+        if self.recorder:
+            self.recorder.record_futuur_market(futuur_market)
+            self.recorder.record_manifold_market(mani_market)
+
+        key = f"{market.futuur_id}:{market.manifold_id}:{currency}"
+        fingerprint = pair_fingerprint(
+            market_fingerprint(FUTUUR, futuur_market),
+            market_fingerprint(MANIFOLD, mani_market),
+        )
+        cached = self.changes.get(key, fingerprint)
+        if cached is not None:
+            market.total_probability = cached["total_probability"]
+            market.outcomes = [MatchingOutcome(**o) for o in cached["outcomes"]]
+            market.changed = False
+            return
+
+        mani_awnsers = manifold_answers(mani_market)
+        if mani_awnsers is None:
+            # Nothing to compare before Manifold prices the market
+            market.total_probability = float("nan")
+            return
+        futuur_outcomes = futuur_market.get("outcomes") or []
+        futuur_prices = FutuurPriceTable([futuur_market]).outcome_probabilities(
+            (o.get("id") for o in futuur_outcomes), basis=currency
+        )
+        futuur_probabilities, mani_probabilities = [], []
+        with span("match_batch", venue="manifold"):
+            for a, f in align_manifold_answers(
+                [text for text, _ in mani_awnsers],
+                [o.get("title") for o in futuur_outcomes],
+            ):
+                probability_mani = mani_awnsers[a][1]
+                probability_futuur = futuur_prices[f] if f is not None else None
+                futuur_probabilities.append(probability_futuur)
+                mani_probabilities.append(probability_mani)
+                if f is not None:
+                    market.outcomes.append(
+                        MatchingOutcome(
+                            futuur_outcomes[f].get("title"),
+                            probability_futuur,
+                            probability_mani,
                         )
-                if not matches:
-                    total_probability += m["probability"]
+                    )
 
-            market.total_probability = total_probability
+        with span("arbitrage_evaluation", venue="manifold"):
+            market.total_probability = float(
+                aggregate_value(futuur_probabilities, mani_probabilities)
+            )
+        self.changes.put(
+            key,
+            fingerprint,
+            {
+                "total_probability": market.total_probability,
+                "outcomes": [asdict(o) for o in market.outcomes],
+            },
+        )
 
-        return matching_markets
+    def load_markets(self) -> List[MatchingMarket]:
+        """
+        Loads the Futuur/Manifold pairs from the match registry, seeding an empty registry from markets_path.
+        """
+        self.registry.import_json_if_empty((self.markets_path,))
+        return [
+            MatchingMarket(
+                futuur_title="",
+                futuur_id=match.futuur_id,
+                manifold_id=match.market_id,
+            )
+            for match in self.registry.matches(MANIFOLD)
+        ]
 
-    def load_markets_from_json(self, path="markets.json"):
-        markets = []
-        abs_path = os.path.abspath(path)
-        try:
-            with open(abs_path, "r") as file:
-                data = json.load(file)
-        except FileNotFoundError:
-            return [
-                MatchingMarket(
-                    futuur_title="",
-                    futuur_id=133793,
-                    manifold_id="Z9uy9T4q4rAfq4sGzPA0",
-                )
-            ]
-
-        for obj in data:
-            markets.append(
-                MatchingMarket(
-                    futuur_title="",
-                    futuur_id=obj.get("futuur"),
-                    manifold_id=obj.get("mani"),
-                )
+    def opportunity_events(self, only_changed=False) -> List[OpportunityEvent]:
+        """
+        The matching markets whose outcomes cost less than 1 in total, as opportunity events.
+
+        Args:
+            only_changed (bool): Skip the markets that did not move since the last analysis. Default is False.
+        """
+        return [
+            OpportunityEvent(
+                venue=MANIFOLD,
+                futuur_id=market.futuur_id,
+                market_id=market.manifold_id,
+                outcomes=[
+                    [o.title, o.futuur_probability, o.manifold_probability]
+                    for o in market.outcomes
+                ],
+                agg_value=market.total_probability,
+                title=market.futuur_title,
             )
+            for market in self.matching_markets
+            if market.total_probability < 1 and (market.changed or not only_changed)
+        ]
 
-        return markets
+    def display_arbitrage(self, only_changed=False):
+        """
+        Prints every matching market and how to bet on its opportunities.
 
-    def display_arbitrage(self):
+        Args:
+            only_changed (bool): Skip the markets that did not move since the last analysis. Default is False.
+        """
         for market in self.matching_markets:
+            if only_changed and not market.changed:
+                continue
             print("\n\nMarket: " + market.futuur_title)
             if market.total_probability < 1:
-                for outcome in market.outcomes:
+                bet_amounts = optimal_bet_amounts(
+                    [o.futuur_probability for o in market.outcomes],
+                    [o.manifold_probability for o in market.outcomes],
+                    total=market.total_probability,
+                )
+                for outcome, optimal_bet_amount in zip(market.outcomes, bet_amounts):
                     where_bet = (
                         "Manifold"
                         if outcome.manifold_probability < outcome.futuur_probability
                         else "Futuur"
                     )
-                    smaller_probability = min(
-                        outcome.manifold_probability, outcome.futuur_probability
-                    )
-                    optimal_bet_amount = smaller_probability / market.total_probability
 
                     print(
                         "Bet on",
@@ -0,0 +1,145 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from matcher.blocking import blocking_key, compatible
+
+# An opportunity is only taken when covering every outcome costs less than this.
+ARBITRAGE_THRESHOLD = 0.97
+# Outcomes whose TF-IDF similarity is below this are considered unmatched.
+MIN_OUTCOME_SIMILARITY = 0.1
+
+
+def best_outcome_match(
+    title: str, candidates: List[str], min_similarity=MIN_OUTCOME_SIMILARITY
+) -> Tuple[Optional[int], float]:
+    """
+    Finds the candidate outcome title most similar to the given title using TF-IDF cosine similarity.
+
+    Args:
+        title (str): The outcome title to match, usually a Futuur outcome.
+        candidates (list): Outcome titles on the other venue.
+        min_similarity (float): Scores at or below this are ignored. Default is 0.1.
+
+    Returns:
+        tuple: The index of the matching candidate, or None if nothing is similar enough, and its similarity.
+    """
+    if not title or not candidates:
+        return None, 0.0
+    vectorizer = TfidfVectorizer()
+    # Combine the target string with the list of strings to compare
+    try:
+        tfidf_matrix = vectorizer.fit_transform([title] + list(candidates))
+    except ValueError:
+        # Every text is made of stop words or punctuation only
+        return None, 0.0
+    similarity_scores = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:])
+    # "Above 50k" and "Above 60k" are textually close but never the same outcome
+    key = blocking_key(title)
+    for i, candidate in enumerate(candidates):
+        if not compatible(key, blocking_key(candidate)):
+            similarity_scores[0, i] = 0.0
+    most_similar_index = int(similarity_scores[0].argmax())
+    score = float(similarity_scores[0, most_similar_index])
+    if score > min_similarity:
+        return most_similar_index, score
+    return None, score
+
+
+def most_similar_outcome(
+    title: str, candidates: List[str], min_similarity=MIN_OUTCOME_SIMILARITY
+) -> Optional[int]:
+    """
+    Like best_outcome_match, returning only the index of the matching candidate.
+    """
+    return best_outcome_match(title, candidates, min_similarity)[0]
+
+
+def same_outcome(text: str, title: str) -> bool:
+    """
+    Exact, case insensitive outcome comparison, as used to match Manifold answers with Futuur outcomes.
+    """
+    return (text or "").lower().strip() == (title or "").lower().strip()
+
+
+def manifold_answers(market: dict) -> Optional[List[Tuple[str, float]]]:
+    """
+    (text, probability) of every answer of a Manifold market, a BINARY market answering 'yes' and 'no'. None when
+    the market has no probability yet.
+    """
+    if market.get("outcomeType") == "BINARY":
+        probability = market.get("probability")
+        if probability is None:
+            return None
+        return [("yes", probability), ("no", 1 - probability)]
+    return [(a.get("text"), a.get("probability")) for a in market.get("answers") or []]
+
+
+def align_manifold_answers(
+    answer_texts: List[str], futuur_titles: List[str]
+) -> List[Tuple[int, Optional[int]]]:
+    """
+    Aligns Manifold answers with Futuur outcomes, driven by the answers: every answer gives one (answer, outcome)
+    row per Futuur outcome it matches with same_outcome, or a single (answer, None) row. Answers without a Futuur
+    counterpart are kept, since covering the market still means buying them on Manifold.
+    """
+    rows = []
+    for a, text in enumerate(answer_texts):
+        matches = [
+            f for f, title in enumerate(futuur_titles) if same_outcome(text, title)
+        ]
+        rows.extend((a, f) for f in matches or [None])
+    return rows
+
+
+def cheapest_prices(futuur_prices, other_prices, missing=1.0) -> np.ndarray:
+    """
+    Returns, per outcome, the cheapest price between the two venues. Missing prices (None or NaN) are ignored, and
+    an outcome without a price on either venue costs `missing`.
+
+    Both arguments have outcomes on the first axis and may carry extra axes, e.g. time in backtests.
+    """
+    futuur = np.asarray(futuur_prices, dtype=float)
+    other = np.asarray(other_prices, dtype=float)
+    cheapest = np.fmin(futuur, other)
+    return np.where(np.isnan(cheapest), missing, cheapest)
+
+
+def aggregate_value(futuur_prices, other_prices, missing=1.0):
+    """
+    Cost of buying one share of every outcome at the cheapest venue. A value below 1 is an arbitrage.
+
+    Args:
+        futuur_prices: Futuur prices with outcomes on the first axis.
+        other_prices: Prices on the other venue, aligned with futuur_prices.
+        missing (float): Price of an outcome quoted on neither venue. NaN makes the whole aggregate NaN, which is
+            never an opportunity. Default is 1.
+
+    Returns:
+        float or numpy.ndarray: The aggregate value, reduced over the outcome axis.
+    """
+    return cheapest_prices(futuur_prices, other_prices, missing).sum(axis=0)
+
+
+def optimal_bet_amounts(futuur_prices, other_prices, total=None) -> np.ndarray:
+    """
+    Fraction of the stake to put on each outcome so that every outcome pays the same amount.
+
+    Args:
+        futuur_prices: Futuur prices with outcomes on the first axis.
+        other_prices: Prices on the other venue, aligned with futuur_prices.
+        total: The aggregate value. Computed when not given.
+
+    Returns:
+        numpy.ndarray: The stake fraction per outcome, same shape as the prices.
+    """
+    cheapest = cheapest_prices(futuur_prices, other_prices)
+    if total is None:
+        total = cheapest.sum(axis=0)
+    return cheapest / total
+
+
+def is_opportunity(agg_value, threshold=ARBITRAGE_THRESHOLD):
+    return np.asarray(agg_value) < threshold
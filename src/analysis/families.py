@@ -0,0 +1,337 @@
+import argparse
+import json
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from futuur.rates import FutuurPriceTable
+from history.recorder import FUTUUR, MANIFOLD, POLYMARKET
+
+# Price gaps below this are treated as noise rather than violations
+MIN_VIOLATION = 0.01
+
+# Constraint kinds. In a DATE ladder "by March" implies "by June", so the probability must not decrease with the
+# date. In an ABOVE ladder "above 60k" implies "above 50k", so it must not increase with the threshold; BELOW is
+# the other way around.
+DATE = "date"
+ABOVE = "above"
+BELOW = "below"
+# +1 where the probability must not decrease along the parameter, -1 where it must not increase
+DIRECTION = {DATE: 1, ABOVE: -1, BELOW: 1}
+
+MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [
+            ("january", "jan"),
+            ("february", "feb"),
+            ("march", "mar"),
+            ("april", "apr"),
+            ("may",),
+            ("june", "jun"),
+            ("july", "jul"),
+            ("august", "aug"),
+            ("september", "sep", "sept"),
+            ("october", "oct"),
+            ("november", "nov"),
+            ("december", "dec"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+DATE_PATTERN = re.compile(
+    r"\b(?P<op>by|before)\s+(?P<end>(?:the\s+)?end\s+of\s+)?"
+    r"(?:(?P<month>"
+    + "|".join(MONTHS)
+    + r")\.?\s+(?:(?P<day>\d{1,2})(?:st|nd|rd|th)?,?\s+)?)?"
+    r"(?P<year>\d{4})\b",
+    re.IGNORECASE,
+)
+THRESHOLD_PATTERN = re.compile(
+    r"\b(?P<op>above|over|at least|more than|greater than|exceeds?|reach(?:es)?|hits?|"
+    r"below|under|less than|fewer than)\s+\$?(?P<value>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>[kmb%])?(?![\w])",
+    re.IGNORECASE,
+)
+UNITS = {"k": 1e3, "m": 1e6, "b": 1e9}
+BELOW_OPERATORS = ("below", "under", "less than", "fewer than")
+
+
+@dataclass
+class LadderMarket:
+    """
+    A binary market that is a rung of a family: its title without the rung is the family template.
+    """
+
+    venue: str
+    market_id: object
+    title: str
+    probability: float
+    kind: str
+    template: str
+    parameter: float
+
+
+@dataclass
+class Violation:
+    """
+    Two rungs of a family priced against their ordering.
+
+    The event of `narrow` implies the event of `wide`, yet `narrow` is priced `margin` higher. Buying YES on `wide`
+    and NO on `narrow` costs 1 - margin and pays at least 1.
+    """
+
+    venue: str
+    kind: str
+    template: str
+    narrow: LadderMarket
+    wide: LadderMarket
+    margin: float
+
+
+def _date_parameter(match: re.Match) -> float:
+    """
+    The deadline of a date match as YYYYMMDD. A bare month or year means its end, after every dated day of it, and
+    "before" a period means the end of the period before it, unless it is "before the end of" the period.
+    """
+    year = int(match["year"])
+    month = MONTHS[match["month"].lower()] if match["month"] else None
+    day = int(match["day"]) if match["day"] else None
+    if match["op"].lower() == "before" and not match["end"]:
+        if day is not None:
+            # Just before the day itself
+            return year * 10_000 + month * 100 + day - 0.5
+        if month is not None:
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        else:
+            year, month = year - 1, 12
+    return year * 10_000 + (month or 12) * 100 + (day or 32)
+
+
+def _threshold_parameter(match: re.Match) -> Tuple[str, float]:
+    parameter = float(match["value"].replace(",", ""))
+    parameter *= UNITS.get((match["unit"] or "").lower(), 1)
+    kind = BELOW if match["op"].lower() in BELOW_OPERATORS else ABOVE
+    return kind, parameter
+
+
+def _template(title: str, match: re.Match) -> str:
+    template = title[: match.start()] + "{}" + title[match.end() :]
+    return " ".join(template.lower().split())
+
+
+def ladder_rungs(title: str) -> List[Tuple[str, str, float]]:
+    """
+    Parses a title into the (kind, template, parameter) of every ladder it is a rung of. A threshold with a
+    deadline, e.g. "Will Bitcoin reach $100k by Dec 31, 2024?", is a rung of both the ladder of thresholds at that
+    deadline and the ladder of deadlines for that threshold.
+    """
+    rungs = []
+    date = DATE_PATTERN.search(title)
+    if date:
+        rungs.append((DATE, _template(title, date), _date_parameter(date)))
+    threshold = THRESHOLD_PATTERN.search(title)
+    if threshold and not (
+        date and threshold.start() < date.end() and date.start() < threshold.end()
+    ):
+        kind, parameter = _threshold_parameter(threshold)
+        rungs.append((kind, _template(title, threshold), parameter))
+    return rungs
+
+
+def _yes_probabilities(venue: str, markets: Sequence[dict]) -> List[Tuple]:
+    """
+    (market id, title, YES probability) of the open binary markets of a catalog.
+    """
+    if venue == FUTUUR:
+        markets = [
+            m
+            for m in markets
+            if m.get("status", "o") == "o"
+            and [o.get("title", "").lower() for o in m.get("outcomes") or []]
+            == ["yes", "no"]
+        ]
+        probabilities = FutuurPriceTable(markets).outcome_probabilities(
+            (m["outcomes"][0].get("id") for m in markets)
+        )
+        return [
+            (m.get("id"), m.get("title"), p)
+            for m, p in zip(markets, probabilities)
+            if p is not None
+        ]
+    if venue == MANIFOLD:
+        return [
+            (m.get("id"), m.get("question"), m.get("probability"))
+            for m in markets
+            if m.get("outcomeType") == "BINARY"
+            and not m.get("isResolved")
+            and m.get("probability") is not None
+        ]
+    rows = []
+    for m in markets:
+        tokens = m.get("tokens") or []
+        if m.get("closed") or not m.get("active", True) or len(tokens) != 2:
+            continue
+        yes = next(
+            (t for t in tokens if (t.get("outcome") or "").lower() == "yes"), None
+        )
+        if yes and yes.get("price") is not None:
+            rows.append((m.get("condition_id"), m.get("question"), yes.get("price")))
+    return rows
+
+
+def build_ladders(catalogs: Dict[str, Sequence[dict]]) -> List[LadderMarket]:
+    """
+    The rungs of every family of at least two markets, from catalogs keyed by venue.
+    """
+    families: Dict[Tuple[str, str, str], List[LadderMarket]] = {}
+    for venue, markets in catalogs.items():
+        for market_id, title, probability in _yes_probabilities(venue, markets):
+            for kind, template, parameter in ladder_rungs(title or ""):
+                families.setdefault((venue, kind, template), []).append(
+                    LadderMarket(
+                        venue,
+                        market_id,
+                        title,
+                        float(probability),
+                        kind,
+                        template,
+                        parameter,
+                    )
+                )
+    return [rung for rungs in families.values() if len(rungs) > 1 for rung in rungs]
+
+
+def find_violations(
+    rungs: Sequence[LadderMarket], min_violation=MIN_VIOLATION
+) -> List[Violation]:
+    """
+    Checks every family at once. Rungs are sorted by family then parameter and their probabilities signed so that
+    every constraint reads "must not decrease". A segmented running maximum then gives, for each rung, the highest
+    signed probability of the rungs with a smaller parameter in its family; a rung below that maximum is a
+    violation, paired with the rung that set the maximum.
+
+    Returns:
+        list: The most mispriced pair ending at each violating rung, largest margin first.
+    """
+    if not rungs:
+        return []
+    families: Dict[Tuple[str, str, str], int] = {}
+    family = np.array(
+        [
+            families.setdefault((r.venue, r.kind, r.template), len(families))
+            for r in rungs
+        ]
+    )
+    parameter = np.array([r.parameter for r in rungs], dtype=float)
+    signed = np.array([DIRECTION[r.kind] * r.probability for r in rungs])
+
+    order = np.lexsort((parameter, family))
+    family, parameter, signed = family[order], parameter[order], signed[order]
+
+    # Signed probabilities lie in [-1, 1]; lifting each family 3 above the previous one keeps the running maximum
+    # from leaking across families
+    lifted = signed + 3.0 * family
+    running = np.maximum.accumulate(lifted)
+    position = np.arange(len(lifted))
+    argmax = np.maximum.accumulate(np.where(lifted == running, position, 0))
+
+    # Rungs with equal parameters are not ordered with each other, so each rung compares with the running maximum
+    # as it stood before the first rung sharing its parameter
+    new_group = np.ones(len(lifted), dtype=bool)
+    new_group[1:] = (family[1:] != family[:-1]) | (parameter[1:] != parameter[:-1])
+    before = np.maximum.accumulate(np.where(new_group, position, 0)) - 1
+    same_family = before >= 0
+    same_family[same_family] = family[before[same_family]] == family[same_family]
+    previous_argmax = argmax[np.maximum(before, 0)]
+    margin = np.where(same_family, running[np.maximum(before, 0)] - lifted, -np.inf)
+
+    violations = []
+    for j in np.flatnonzero(margin > min_violation):
+        first, last = rungs[order[previous_argmax[j]]], rungs[order[j]]
+        # Along a DATE or BELOW ladder the earlier rung is the narrower event, along an ABOVE ladder the later one
+        narrow, wide = (first, last) if DIRECTION[first.kind] > 0 else (last, first)
+        violations.append(
+            Violation(
+                first.venue, first.kind, first.template, narrow, wide, float(margin[j])
+            )
+        )
+    return sorted(violations, key=lambda v: v.margin, reverse=True)
+
+
+def scan(catalogs: Dict[str, Sequence[dict]], min_violation=MIN_VIOLATION):
+    return find_violations(build_ladders(catalogs), min_violation)
+
+
+def load_catalogs(paths: Dict[str, str]) -> Dict[str, List[dict]]:
+    """
+    Reads the catalogs dumped by the get_all_markets methods, skipping the missing ones.
+    """
+    catalogs = {}
+    for venue, path in paths.items():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                catalogs[venue] = json.load(f)
+        except FileNotFoundError:
+            print(f"No {venue} catalog at {path}")
+    return catalogs
+
+
+def sync_catalogs(paths: Dict[str, str]) -> Dict[str, List[dict]]:
+    """
+    Fetches the three catalogs, dumping them to the given paths.
+    """
+    import settings
+    from futuur.futuur_api import FutuurAPI
+    from manifold.manifold_api import ManifoldAPI
+    from polymarket.polymarket_api import PolymarketAPI
+
+    futuur_api = FutuurAPI(
+        settings.FUTUUR_PUBLIC_KEY,
+        settings.FUTUUR_PRIVATE_KEY,
+        base_url=settings.FUTUUR_BASE_URL,
+    )
+    manifold_api = ManifoldAPI(
+        base_url=settings.MANIFOLD_BASE_URL, api_key=settings.MANIFOLD_API_KEY
+    )
+    polymarket_api = PolymarketAPI(
+        host=settings.POLYMARKET_HOST,
+        key=settings.POLYMARKET_KEY,
+        chain_id=settings.POLYMARKET_CHAIN_ID,
+    )
+    return {
+        FUTUUR: futuur_api.get_all_markets(path=paths[FUTUUR]),
+        MANIFOLD: manifold_api.get_all_markets(path=paths[MANIFOLD]),
+        POLYMARKET: polymarket_api.get_all_markets(path=paths[POLYMARKET]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check date and threshold ladders of every venue for prices against their ordering."
+    )
+    parser.add_argument("--futuur", default="futuur_data.json")
+    parser.add_argument("--manifold", default="mani_data.json")
+    parser.add_argument("--polymarket", default="poly_data.json")
+    parser.add_argument(
+        "--sync", action="store_true", help="Fetch the catalogs before scanning"
+    )
+    parser.add_argument("--min-violation", type=float, default=MIN_VIOLATION)
+    args = parser.parse_args()
+
+    catalog_paths = {
+        FUTUUR: args.futuur,
+        MANIFOLD: args.manifold,
+        POLYMARKET: args.polymarket,
+    }
+    catalogs = (
+        sync_catalogs(catalog_paths) if args.sync else load_catalogs(catalog_paths)
+    )
+    for violation in scan(catalogs, args.min_violation):
+        print(
+            f"{violation.venue} {violation.kind} +{violation.margin:.3f}: "
+            f"{violation.narrow.title} ({violation.narrow.probability:.3f}) > "
+            f"{violation.wide.title} ({violation.wide.probability:.3f})"
+        )
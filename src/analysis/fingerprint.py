@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from history.recorder import FUTUUR, MANIFOLD, POLYMARKET
+
+
+def _futuur_content(market: dict):
+    return [
+        market.get("status"),
+        market.get("title"),
+        [
+            [o.get("id"), o.get("title"), o.get("price")]
+            for o in market.get("outcomes") or []
+        ],
+    ]
+
+
+def _manifold_content(market: dict):
+    return [
+        market.get("isResolved"),
+        market.get("resolution"),
+        market.get("question"),
+        market.get("probability"),
+        [
+            [a.get("id"), a.get("text"), a.get("probability")]
+            for a in market.get("answers") or []
+        ],
+    ]
+
+
+def _polymarket_content(market: dict):
+    return [
+        market.get("active"),
+        market.get("closed"),
+        market.get("question"),
+        [
+            [t.get("token_id"), t.get("outcome"), t.get("price"), t.get("winner")]
+            for t in market.get("tokens") or []
+        ],
+    ]
+
+
+CONTENT = {
+    FUTUUR: _futuur_content,
+    MANIFOLD: _manifold_content,
+    POLYMARKET: _polymarket_content,
+}
+
+
+def market_fingerprint(venue: str, market: dict) -> str:
+    """
+    Hash of what the analysis reads from a market payload: its status, its outcomes and their prices. Volumes,
+    comment counts and other fields that change without affecting the analysis are left out.
+    """
+    content = json.dumps(CONTENT[venue](market or {}), sort_keys=True, default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def pair_fingerprint(*fingerprints: str) -> str:
+    return hashlib.sha1(":".join(fingerprints).encode("utf-8")).hexdigest()
+
+
+class ChangeTracker:
+    """
+    Remembers, per matched pair, the fingerprint of both markets at the last analysis and the result derived from
+    them, across runs. A pair whose fingerprint did not change reuses its cached result instead of being matched and
+    evaluated again.
+
+    Attributes:
+        path (str, optional): The JSON file the cache is persisted to. None keeps it in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self.entries = {}
+
+    def get(self, key: str, fingerprint: str) -> Optional[dict]:
+        """
+        The cached result of a pair, or None when the pair is new or its fingerprint changed.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry.get("fingerprint") == fingerprint:
+            return entry.get("result")
+        return None
+
+    def put(self, key: str, fingerprint: str, result: dict):
+        with self.lock:
+            self.entries[key] = {"fingerprint": fingerprint, "result": result}
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            content = json.dumps(self.entries, ensure_ascii=False)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
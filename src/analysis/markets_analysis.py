@@ -1,8 +1,21 @@
+import settings
+from alerts.sinks import sinks_from_settings
+from alerts.stream import OpportunityStream
 from analysis.analyzer import Analizer
+from history.recorder import PriceRecorder
+from instrumentation import telemetry
 
 
 def analyze():
 
-    analyzer = Analizer()
-
-    analyzer.display_arbitrage()
+    recorder = PriceRecorder()
+    try:
+        analyzer = Analizer(recorder=recorder)
+        with OpportunityStream(
+            sinks_from_settings(), state_path=settings.ALERT_STATE_PATH
+        ) as stream:
+            for event in analyzer.opportunity_events(only_changed=True):
+                stream.publish(event)
+    finally:
+        recorder.close()
+    telemetry.export()
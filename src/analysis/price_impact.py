@@ -0,0 +1,220 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from futuur.futuur_api import FutuurAPI
+from instrumentation.telemetry import CACHE_HITS, CACHE_MISSES, incr
+
+# Stake used to probe a Futuur outcome with simulate_purchase when calibrating it
+PROBE_AMOUNT = 10.0
+# Bisection steps used to solve for an LMSR liquidity; each halves the search interval in log space
+CALIBRATION_STEPS = 60
+
+
+@dataclass
+class Impact:
+    """
+    The result of buying each stake, with markets on the first axis and stakes on the second.
+
+    Attributes:
+        shares (numpy.ndarray): Shares received. A share pays 1 when its outcome wins.
+        average_price (numpy.ndarray): Stake paid per share, the effective fill.
+        probability_after (numpy.ndarray): Price of the bought outcome once the trade is done.
+    """
+
+    shares: np.ndarray
+    average_price: np.ndarray
+    probability_after: np.ndarray
+
+
+def _grid(values, stakes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Broadcasts one value per market against the stakes, which are a ladder shared by every market or one row each.
+    """
+    values = np.asarray(values, dtype=float).reshape(-1, 1)
+    stakes = np.asarray(stakes, dtype=float)
+    if stakes.ndim < 2:
+        stakes = stakes.reshape(1, -1)
+    return values, stakes
+
+
+def _impact(stakes: np.ndarray, shares: np.ndarray, after: np.ndarray) -> Impact:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = np.where(shares > 0, stakes / shares, np.nan)
+    return Impact(shares, average, after)
+
+
+def cpmm_buy(pool_yes, pool_no, p, stakes, outcome="YES") -> Impact:
+    """
+    Buys YES or NO with each stake on Manifold cpmm-1 markets, fees left out.
+
+    The market keeps y ** p * n ** (1 - p) constant. A stake is added to both pools, then the bought side gives out
+    the shares that restore the constant, so the probability p * n / (p * n + (1 - p) * y) moves towards the bought
+    outcome.
+
+    Args:
+        pool_yes, pool_no, p: One value per market, from the 'pool' and 'p' fields of the market payload.
+        stakes: A ladder of stakes in mana shared by every market, or one ladder per market.
+        outcome (str): 'YES' or 'NO'.
+    """
+    y, stakes = _grid(pool_yes, stakes)
+    n, _ = _grid(pool_no, stakes)
+    p, _ = _grid(p, stakes)
+    k = y**p * n ** (1 - p)
+    y_added, n_added = y + stakes, n + stakes
+    if outcome == "YES":
+        y_after = (k / n_added ** (1 - p)) ** (1 / p)
+        shares, n_after = y_added - y_after, n_added
+    else:
+        n_after = (k / y_added**p) ** (1 / (1 - p))
+        shares, y_after = n_added - n_after, y_added
+    yes_after = p * n_after / (p * n_after + (1 - p) * y_after)
+    return _impact(stakes, shares, yes_after if outcome == "YES" else 1 - yes_after)
+
+
+def manifold_impact(markets: Sequence[dict], stakes, outcome="YES") -> Impact:
+    """
+    cpmm_buy over Manifold market payloads, e.g. from get_market_by_id. Markets that are not cpmm-1 come out NaN.
+    """
+    cpmm = [
+        m.get("mechanism") == "cpmm-1" and bool((m.get("pool") or {}).get("YES"))
+        for m in markets
+    ]
+    pools = [m.get("pool") or {} if ok else {} for m, ok in zip(markets, cpmm)]
+    return cpmm_buy(
+        [pool.get("YES", np.nan) for pool in pools],
+        [pool.get("NO", np.nan) for pool in pools],
+        [m.get("p", 0.5) if ok else np.nan for m, ok in zip(markets, cpmm)],
+        stakes,
+        outcome,
+    )
+
+
+def lmsr_buy(price, liquidity, stakes) -> Impact:
+    """
+    Buys an outcome with each stake in a logarithmic market scoring rule market.
+
+    Only the bought outcome's price matters: a stake A buys b * ln((e^(A/b) - 1 + p) / p) shares and moves the
+    price to 1 - (1 - p) * e^(-A/b), where p is the price before and b the liquidity.
+    """
+    p, stakes = _grid(price, stakes)
+    b, _ = _grid(liquidity, stakes)
+    growth = np.exp(stakes / b)
+    shares = b * np.log((growth - 1 + p) / p)
+    return _impact(stakes, shares, 1 - (1 - p) / growth)
+
+
+def lmsr_liquidity(price, stake, shares) -> np.ndarray:
+    """
+    The LMSR liquidity under which a stake buys the given shares, solved by bisection for many quotes at once.
+
+    Shares bought grow from stake, with no liquidity, towards stake / price as the liquidity grows, so a quote
+    strictly between the two pins down a single liquidity. Quotes at or better than the current price, or buying
+    fewer shares than the stake, which no liquidity gives, are NaN.
+    """
+    price, stake, shares = (np.asarray(v, dtype=float) for v in (price, stake, shares))
+    valid = (stake > 0) & (shares > stake) & (shares < stake / price)
+    # Invalid quotes are solved too, to keep the arrays whole, and masked out at the end
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        low = np.log(stake) - 10
+        high = np.log(stake) + 20
+        for _ in range(CALIBRATION_STEPS):
+            middle = (low + high) / 2
+            b = np.exp(middle)
+            # e^(stake / b) overflows to inf for a tiny b, which only means far too few shares
+            bought = b * np.log((np.exp(stake / b) - 1 + price) / price)
+            # Too few shares means too little liquidity
+            low, high = np.where(bought < shares, middle, low), np.where(
+                bought < shares, high, middle
+            )
+    b = np.exp((low + high) / 2)
+    return np.where(valid, b, np.nan)
+
+
+class FutuurImpactModel:
+    """
+    Futuur price impact from an LMSR model calibrated per outcome and currency.
+
+    Futuur does not publish its market maker state, so each outcome is probed once with simulate_purchase and the
+    liquidity reproducing that quote is cached for the TTL. Simulations are then local and vectorized; only
+    outcomes never seen or whose calibration expired cost a request.
+
+    Attributes:
+        api (FutuurAPI): The client used for simulate_purchase.
+        ttl (float): How long a calibration stays valid, in seconds.
+        probe_amount (float): The stake of the calibration quote.
+    """
+
+    def __init__(
+        self, api: FutuurAPI, ttl: float = 3600, probe_amount: float = PROBE_AMOUNT
+    ):
+        self.api = api
+        self.ttl = ttl
+        self.probe_amount = probe_amount
+        self._liquidity: Dict[Tuple[object, str], Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def calibrate_from_quote(self, outcome_id, currency: str, quote: dict) -> float:
+        """
+        Stores the liquidity implied by a simulate_purchase or purchase response and returns it.
+        """
+        current = quote.get("current_price")
+        amount = quote.get("amount")
+        shares = quote.get("shares")
+        if not current or not amount or not shares:
+            return np.nan
+        b = float(lmsr_liquidity(current, amount, shares))
+        with self._lock:
+            self._liquidity[(outcome_id, currency)] = (b, time.monotonic())
+        return b
+
+    def liquidity(self, outcome_id, currency="OOM") -> float:
+        """
+        The calibrated liquidity of an outcome, probing it when it has none or it expired. NaN when the probe fails.
+        """
+        with self._lock:
+            cached = self._liquidity.get((outcome_id, currency))
+        if cached and time.monotonic() - cached[1] < self.ttl:
+            incr(CACHE_HITS, cache="futuur_liquidity")
+            return cached[0]
+        incr(CACHE_MISSES, cache="futuur_liquidity")
+        try:
+            quote = self.api.simulate_purchase(
+                None, outcome_id, currency=currency, amount=self.probe_amount
+            )
+        except Exception as e:
+            print(f"Failed to calibrate Futuur outcome {outcome_id}: {e!r}")
+            return np.nan
+        return self.calibrate_from_quote(outcome_id, currency, quote)
+
+    def simulate(
+        self,
+        outcome_ids: Sequence,
+        prices,
+        stakes,
+        currency="OOM",
+        calibrate=True,
+    ) -> Impact:
+        """
+        Buys each outcome with each stake.
+
+        Args:
+            outcome_ids (list): The Futuur outcomes bought.
+            prices: The current price of each outcome in the currency, e.g. from FutuurPriceTable.
+            stakes: A ladder of stakes shared by every outcome, or one ladder per outcome.
+            currency (str): The currency of the prices and stakes. Default is 'OOM'.
+            calibrate (bool): Probe the outcomes without a valid calibration. When False they come out NaN.
+        """
+        if calibrate:
+            liquidity = [self.liquidity(o, currency) for o in outcome_ids]
+        else:
+            now = time.monotonic()
+            with self._lock:
+                cached = [self._liquidity.get((o, currency)) for o in outcome_ids]
+            liquidity = [
+                c[0] if c and now - c[1] < self.ttl else np.nan for c in cached
+            ]
+        return lmsr_buy(prices, liquidity, stakes)
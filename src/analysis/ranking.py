@@ -0,0 +1,281 @@
+import datetime
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+import settings
+from history.price_store import now_ms
+from history.recorder import FUTUUR, MANIFOLD, POLYMARKET
+
+YEAR_MS = 365 * 24 * 3600 * 1000
+# Capital is never considered locked for less than this, so a market closing in minutes does not rank as an
+# astronomical annualized return
+MIN_LOCKUP_MS = 24 * 3600 * 1000
+# Fraction of the stake each venue keeps as fees
+VENUE_FEES = {
+    FUTUUR: settings.FUTUUR_FEE,
+    MANIFOLD: settings.MANIFOLD_FEE,
+    POLYMARKET: settings.POLYMARKET_FEE,
+}
+# Total stakes, in USDC, at which the depth of an opportunity is probed
+STAKE_LADDER = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+GREEDY = "greedy"
+LP = "lp"
+METHODS = (GREEDY, LP)
+
+
+@dataclass
+class Ranking:
+    """
+    Opportunities scored and funded, aligned with the inputs of rank.
+
+    Attributes:
+        net_return (numpy.ndarray): Profit per unit staked once fees are paid, at resolution.
+        lockup_years (numpy.ndarray): How long the stake is locked, until the last leg resolves.
+        annualized_return (numpy.ndarray): net_return compounded to a yearly rate.
+        allocation (numpy.ndarray): Stake given to each opportunity.
+        order (numpy.ndarray): Indexes of the opportunities, best annualized return first.
+    """
+
+    net_return: np.ndarray
+    lockup_years: np.ndarray
+    annualized_return: np.ndarray
+    allocation: np.ndarray
+    order: np.ndarray
+
+
+def latest_close_ms(*dates) -> float:
+    """
+    When the last of the legs of an opportunity closes, from ISO strings or milliseconds. NaN when none is known.
+    """
+    closes = []
+    for date in dates:
+        if isinstance(date, (int, float)):
+            closes.append(float(date))
+        elif date:
+            try:
+                closes.append(
+                    datetime.datetime.fromisoformat(
+                        str(date).replace("Z", "+00:00")
+                    ).timestamp()
+                    * 1000
+                )
+            except ValueError:
+                pass
+    return max(closes) if closes else np.nan
+
+
+def executable_size(stakes, agg_values, threshold: float = 1.0) -> np.ndarray:
+    """
+    The largest stake of a ladder at which each opportunity still costs less than threshold once price impact is
+    paid, e.g. from the average fills of analysis.price_impact. 0 when even the smallest stake does not.
+
+    Args:
+        stakes: The stake ladder, increasing.
+        agg_values: Aggregate value after impact, opportunities on the first axis and the ladder on the second.
+    """
+    stakes = np.asarray(stakes, dtype=float)
+    fits = np.asarray(agg_values, dtype=float) < threshold
+    # Impact only grows with the stake, so the fitting stakes are a prefix of the ladder
+    count = np.cumprod(fits, axis=1).sum(axis=1)
+    return np.where(count > 0, stakes[np.maximum(count - 1, 0)], 0.0)
+
+
+def book_average_price(asks, stakes) -> np.ndarray:
+    """
+    Average price paid per share when buying each stake from an order book side, walking the levels cheapest
+    first. NaN for stakes the book is too thin for.
+
+    Args:
+        asks: (price, size) levels, in any order.
+        stakes: The stakes, in the currency of the prices.
+    """
+    stakes = np.asarray(stakes, dtype=float)
+    levels = np.asarray(asks, dtype=float).reshape(-1, 2)
+    levels = levels[np.argsort(levels[:, 0], kind="stable")]
+    if not len(levels):
+        return np.full(stakes.shape, np.nan)
+    price, size = levels[:, 0], levels[:, 1]
+    cost = np.cumsum(price * size)
+    shares = np.cumsum(size)
+    # The level each stake ends in, and what was bought on the levels before it
+    level = np.searchsorted(cost, stakes, "left")
+    inside = level < len(levels)
+    level = np.minimum(level, len(levels) - 1)
+    cost_before = np.where(level > 0, cost[level - 1], 0.0)
+    shares_before = np.where(level > 0, shares[level - 1], 0.0)
+    bought = shares_before + (stakes - cost_before) / price[level]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(inside & (bought > 0), stakes / bought, np.nan)
+
+
+def leg_stakes(prices, stakes=STAKE_LADDER) -> np.ndarray:
+    """
+    The stake of each outcome for each total stake of a ladder, outcomes on the first axis.
+
+    A total stake S covers every outcome for the same payout, so outcome i takes S * prices[i] / sum(prices).
+    Covering one unit of payout then costs the sum over outcomes of the average prices paid on these stakes, which
+    is the aggregate value with price impact that executable_size takes.
+    """
+    prices = np.asarray(prices, dtype=float)
+    return np.outer(prices / prices.sum(), np.asarray(stakes, dtype=float))
+
+
+def annualized_returns(
+    agg_values,
+    close_ms,
+    fees=0.0,
+    now: Optional[int] = None,
+    min_lockup_ms: int = MIN_LOCKUP_MS,
+):
+    """
+    Net and annualized return of staking on every outcome of each opportunity.
+
+    Covering every outcome costs agg_value per unit of payout, plus fees on the stake, and pays 1 when the market
+    resolves, so the net return is 1 / (agg_value * (1 + fees)) - 1 over the lock-up.
+
+    Args:
+        agg_values: The aggregate value of each opportunity.
+        close_ms: When the last leg of each opportunity closes, in milliseconds. NaN counts as a year away.
+        fees: Fraction of the stake paid in fees, per opportunity or shared.
+
+    Returns:
+        tuple: The net returns, the lock-ups in years and the annualized returns.
+    """
+    now = now if now is not None else now_ms()
+    agg_values = np.asarray(agg_values, dtype=float)
+    close_ms = np.asarray(close_ms, dtype=float)
+    net = 1 / (agg_values * (1 + np.asarray(fees, dtype=float))) - 1
+    lockup_ms = np.where(np.isnan(close_ms), YEAR_MS, close_ms - now)
+    years = np.maximum(lockup_ms, min_lockup_ms) / YEAR_MS
+    with np.errstate(invalid="ignore", over="ignore"):
+        annualized = np.where(net > -1, (1 + net) ** (1 / years) - 1, -1.0)
+    return net, years, annualized
+
+
+def allocate_greedy(
+    returns,
+    capacity,
+    budget: float,
+    groups: Optional[Sequence[Sequence[int]]] = None,
+    group_limits: Optional[Sequence[float]] = None,
+) -> np.ndarray:
+    """
+    Funds the opportunities best return first, each up to its capacity, until the budget is spent. Opportunities
+    with a non positive return get nothing. With groups, each opportunity also gets at most what is left of the
+    limits of its groups, see allocate_lp.
+    """
+    returns = np.asarray(returns, dtype=float)
+    capacity = np.nan_to_num(np.asarray(capacity, dtype=float), nan=0.0)
+    allocation = np.zeros(len(returns))
+    order = np.argsort(-returns, kind="stable")
+    funded = order[returns[order] > 0]
+    if not groups:
+        # Budget left before each opportunity, so the whole fill is a cumulative sum
+        before = np.concatenate([[0.0], np.cumsum(capacity[funded])[:-1]])
+        allocation[funded] = np.clip(budget - before, 0.0, capacity[funded])
+        return allocation
+    remaining = np.array(group_limits, dtype=float)
+    membership = [[] for _ in returns]
+    for g, group in enumerate(groups):
+        for i in group:
+            membership[i].append(g)
+    for i in funded:
+        amount = min(capacity[i], budget, *(remaining[g] for g in membership[i]))
+        if amount <= 0:
+            continue
+        allocation[i] = amount
+        budget -= amount
+        remaining[membership[i]] -= amount
+    return allocation
+
+
+def allocate_lp(
+    returns,
+    capacity,
+    budget: float,
+    groups: Optional[Sequence[Sequence[int]]] = None,
+    group_limits: Optional[Sequence[float]] = None,
+) -> np.ndarray:
+    """
+    Funds the opportunities by linear programming, maximizing the return weighted stake.
+
+    Without groups this is what allocate_greedy finds. Groups add shared limits, e.g. opportunities on the same
+    market or venue drawing on the same risk headroom, which greedy filling respects but may use suboptimally.
+
+    Args:
+        groups (list, optional): For each shared limit, the indexes of the opportunities it covers.
+        group_limits (list, optional): The most that can be staked across each group.
+    """
+    from scipy.optimize import linprog
+
+    returns = np.asarray(returns, dtype=float)
+    capacity = np.nan_to_num(np.asarray(capacity, dtype=float), nan=0.0)
+    upper = np.where(returns > 0, capacity, 0.0)
+    if not len(returns) or not upper.any():
+        return np.zeros(len(returns))
+    rows = [np.ones(len(returns))]
+    limits = [budget]
+    for group, limit in zip(groups or [], group_limits or []):
+        row = np.zeros(len(returns))
+        row[list(group)] = 1.0
+        rows.append(row)
+        limits.append(limit)
+    result = linprog(
+        -returns,
+        A_ub=np.vstack(rows),
+        b_ub=np.array(limits, dtype=float),
+        bounds=np.column_stack([np.zeros(len(returns)), upper]),
+        method="highs",
+    )
+    if not result.success:
+        return allocate_greedy(returns, capacity, budget, groups, group_limits)
+    return np.clip(result.x, 0.0, upper)
+
+
+def rank(
+    agg_values,
+    close_ms,
+    capacity,
+    budget: float,
+    fees=0.0,
+    method: str = GREEDY,
+    groups: Optional[Sequence[Sequence[int]]] = None,
+    group_limits: Optional[Sequence[float]] = None,
+    now: Optional[int] = None,
+) -> Ranking:
+    """
+    Ranks every live opportunity of a scan by annualized return and spreads the budget over them.
+
+    Args:
+        agg_values: The aggregate value of each opportunity.
+        close_ms: When the last leg of each opportunity closes, in milliseconds.
+        capacity: The most that can be staked on each opportunity, e.g. from executable_size and the risk headroom.
+        budget (float): The capital to allocate.
+        fees: Fraction of the stake paid in fees, per opportunity or shared.
+        method (str): GREEDY or LP. Default is GREEDY.
+        groups, group_limits (optional): Shared limits, see allocate_lp.
+
+    Raises:
+        ValueError: When method is neither GREEDY nor LP.
+    """
+    if method not in METHODS:
+        raise ValueError(
+            f"Unknown ranking method {method!r}, expected one of {METHODS}"
+        )
+    net, years, annualized = annualized_returns(agg_values, close_ms, fees, now)
+    allocate = allocate_lp if method == LP else allocate_greedy
+    allocation = allocate(annualized, capacity, budget, groups, group_limits)
+    return Ranking(
+        net, years, annualized, allocation, np.argsort(-annualized, kind="stable")
+    )
+
+
+def venue_fees(venues: Sequence[Sequence[str]], fees: Dict[str, float] = None):
+    """
+    The fee fraction of each opportunity, the sum of the fees of the venues of its legs.
+    """
+    fees = VENUE_FEES if fees is None else fees
+    return np.array([sum(fees.get(v, 0.0) for v in legs) for legs in venues])
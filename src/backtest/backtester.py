@@ -0,0 +1,347 @@
+import argparse
+import datetime
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from analysis.arbitrage import (
+    ARBITRAGE_THRESHOLD,
+    aggregate_value,
+    cheapest_prices,
+    is_opportunity,
+    most_similar_outcome,
+    same_outcome,
+)
+from history.price_store import PriceStore
+from history.recorder import FUTUUR, MANIFOLD, POLYMARKET
+import settings
+
+# Futuur currency compared against each venue, mirroring Analizer (play money vs mana) and run_main (real money vs USDC).
+DEFAULT_FUTUUR_CURRENCY = {MANIFOLD: "OOM", POLYMARKET: "USDC"}
+# Stake of an opportunity when the per market risk limit is disabled
+FALLBACK_STAKE_USDC = 50.0
+DEFAULT_STAKE = settings.RISK_MARKET_LIMIT_USDC or FALLBACK_STAKE_USDC
+
+
+@dataclass
+class BacktestPair:
+    futuur_id: int
+    venue: str
+    market_id: str
+
+
+@dataclass
+class FillAssumptions:
+    """
+    How an opportunity is assumed to be executed.
+
+    Attributes:
+        stake (float): Amount spread over all outcomes of an opportunity, in the venue currency. Default is the per
+            market risk limit, RISK_MARKET_LIMIT_USDC, or FALLBACK_STAKE_USDC when that limit is disabled.
+        threshold (float): Aggregate value below which an opportunity is taken.
+        fill_delay_ms (int): Delay between the signal and the fill. The fill uses the prices observed at that time.
+        slippage (float): Absolute price added to each outcome on fill.
+        fee_rate (float): Fee charged as a fraction of the stake.
+        max_staleness_ms (int, optional): Prices older than this are considered missing.
+    """
+
+    stake: float = DEFAULT_STAKE
+    threshold: float = ARBITRAGE_THRESHOLD
+    fill_delay_ms: int = 0
+    slippage: float = 0.0
+    fee_rate: float = 0.0
+    max_staleness_ms: Optional[int] = None
+
+    def __post_init__(self):
+        if self.stake is None or not self.stake > 0:
+            raise ValueError(f"The stake must be a positive amount, got {self.stake!r}")
+
+
+@dataclass
+class PairReport:
+    pair: BacktestPair
+    matched_outcomes: int = 0
+    observations: int = 0
+    opportunities: int = 0
+    filled: int = 0
+    pnl: float = 0.0
+    best_agg_value: Optional[float] = None
+    time_in_opportunity_ms: int = 0
+    durations_ms: List[int] = field(default_factory=list)
+
+    @property
+    def mean_duration_ms(self) -> float:
+        return float(np.mean(self.durations_ms)) if self.durations_ms else 0.0
+
+
+@dataclass
+class BacktestReport:
+    assumptions: FillAssumptions
+    start: Optional[int]
+    end: Optional[int]
+    pairs: List[PairReport] = field(default_factory=list)
+
+    @property
+    def total_pnl(self) -> float:
+        return sum(p.pnl for p in self.pairs)
+
+    @property
+    def total_opportunities(self) -> int:
+        return sum(p.opportunities for p in self.pairs)
+
+    def to_dict(self) -> dict:
+        return {
+            "assumptions": asdict(self.assumptions),
+            "start": self.start,
+            "end": self.end,
+            "total_pnl": self.total_pnl,
+            "total_opportunities": self.total_opportunities,
+            "pairs": [
+                {**asdict(p), "mean_duration_ms": p.mean_duration_ms}
+                for p in self.pairs
+            ],
+        }
+
+
+def forward_fill(
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    grid: np.ndarray,
+    max_staleness_ms: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Samples a price series on a time grid, carrying the last observed price forward. Grid points before the first
+    observation, or further than max_staleness_ms from the last one, are NaN.
+    """
+    out = np.full(grid.shape, np.nan)
+    if timestamps.size == 0:
+        return out
+    idx = np.searchsorted(timestamps, grid, side="right") - 1
+    valid = idx >= 0
+    out[valid] = prices[idx[valid]]
+    if max_staleness_ms is not None:
+        age = grid - timestamps[np.clip(idx, 0, None)]
+        out[valid & (age > max_staleness_ms)] = np.nan
+    return out
+
+
+def opportunity_episodes(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the start indexes and the exclusive end indexes of every run of True values in a boolean mask.
+    """
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    changes = np.diff(padded)
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+
+
+class Backtester:
+    """
+    Replays recorded prices through the arbitrage logic used by run_main and the Analizer.
+
+    Outcomes are matched once per pair with the same code as the live scan: exact titles for Manifold, TF-IDF for
+    Polymarket. Every recorded series of a pair is then forward filled on the union of its observation times, and the
+    aggregate value, the opportunity windows and the fills are computed with array operations over the whole period.
+
+    Attributes:
+        store (PriceStore): The recorded prices.
+        assumptions (FillAssumptions): How opportunities are executed.
+        futuur_currency (dict): Futuur price currency to compare against each venue.
+    """
+
+    def __init__(
+        self,
+        store: Optional[PriceStore] = None,
+        assumptions: Optional[FillAssumptions] = None,
+        futuur_currency: Optional[Dict[str, str]] = None,
+    ):
+        self.store = store or PriceStore(settings.PRICE_HISTORY_DIR)
+        self.assumptions = assumptions or FillAssumptions()
+        self.futuur_currency = {**DEFAULT_FUTUUR_CURRENCY, **(futuur_currency or {})}
+
+    def match_outcomes(
+        self, pair: BacktestPair
+    ) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Pairs the recorded Futuur outcome series with the other venue's series.
+
+        Returns:
+            list: (futuur_key, other_key) rows. Either side is None when the outcome has no match.
+        """
+        currency = self.futuur_currency.get(pair.venue, "OOM")
+        futuur_labels = {
+            k: v
+            for k, v in self.store.outcomes(FUTUUR, pair.futuur_id).items()
+            if k.endswith(f":{currency}")
+        }
+        other_labels = self.store.outcomes(pair.venue, pair.market_id)
+
+        rows = []
+        if pair.venue == MANIFOLD:
+            # As in Analizer.retrieve_matching_markets_outcomes, Manifold answers drive the comparison
+            for other_key, text in other_labels.items():
+                matches = [k for k, t in futuur_labels.items() if same_outcome(text, t)]
+                rows.extend((k, other_key) for k in matches)
+                if not matches:
+                    rows.append((None, other_key))
+        else:
+            # As in run_main, Futuur outcomes drive the comparison
+            other_keys = list(other_labels)
+            other_titles = [other_labels[k] for k in other_keys]
+            for futuur_key, title in futuur_labels.items():
+                index = most_similar_outcome(title, other_titles)
+                rows.append(
+                    (futuur_key, other_keys[index] if index is not None else None)
+                )
+        return rows
+
+    def _series(self, venue, market_id, key, end):
+        if key is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return self.store.query(venue, market_id, key, end=end)
+
+    def run_pair(
+        self, pair: BacktestPair, start: Optional[int] = None, end: Optional[int] = None
+    ) -> PairReport:
+        """
+        Backtests a single matched pair over [start, end] (milliseconds since epoch, both optional).
+        """
+        report = PairReport(pair=pair)
+        rows = self.match_outcomes(pair)
+        report.matched_outcomes = sum(1 for f, o in rows if f and o)
+        if not rows:
+            return report
+
+        # Prices before the window are still loaded so the first grid points can be forward filled.
+        futuur_series = [self._series(FUTUUR, pair.futuur_id, f, end) for f, _ in rows]
+        other_series = [
+            self._series(pair.venue, pair.market_id, o, end) for _, o in rows
+        ]
+        grid = np.unique(np.concatenate([ts for ts, _ in futuur_series + other_series]))
+        if start is not None:
+            grid = grid[grid >= start]
+        report.observations = int(grid.size)
+        if grid.size == 0:
+            return report
+
+        staleness = self.assumptions.max_staleness_ms
+        futuur_prices = np.vstack(
+            [forward_fill(ts, p, grid, staleness) for ts, p in futuur_series]
+        )
+        other_prices = np.vstack(
+            [forward_fill(ts, p, grid, staleness) for ts, p in other_series]
+        )
+
+        cheapest = cheapest_prices(futuur_prices, other_prices)
+        agg_value = aggregate_value(futuur_prices, other_prices)
+        report.best_agg_value = float(agg_value.min())
+
+        starts, ends = opportunity_episodes(
+            is_opportunity(agg_value, self.assumptions.threshold)
+        )
+        if starts.size == 0:
+            return report
+
+        # An episode still open at the end of the window lasts until the last observation.
+        end_times = grid[np.minimum(ends, grid.size - 1)]
+        durations = end_times - grid[starts]
+        report.opportunities = int(starts.size)
+        report.durations_ms = durations.astype(int).tolist()
+        report.time_in_opportunity_ms = int(durations.sum())
+
+        # One entry per episode, filled with the prices seen fill_delay_ms after the signal.
+        fill_idx = np.searchsorted(
+            grid, grid[starts] + self.assumptions.fill_delay_ms, side="left"
+        )
+        fill_idx = np.minimum(fill_idx, grid.size - 1)
+        fill_prices = np.minimum(cheapest[:, fill_idx] + self.assumptions.slippage, 1.0)
+        fill_agg = fill_prices.sum(axis=0)
+        filled = fill_agg < 1
+        stake = self.assumptions.stake
+        # Staking proportionally to each price makes every outcome pay stake / fill_agg.
+        pnl = stake / fill_agg[filled] - stake - stake * self.assumptions.fee_rate
+        report.filled = int(filled.sum())
+        report.pnl = float(pnl.sum())
+        return report
+
+    def run(
+        self,
+        pairs: List[BacktestPair],
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> BacktestReport:
+        report = BacktestReport(assumptions=self.assumptions, start=start, end=end)
+        for pair in pairs:
+            report.pairs.append(self.run_pair(pair, start=start, end=end))
+        return report
+
+
+def load_pairs(path="markets.json") -> List[BacktestPair]:
+    """
+    Loads backtest pairs from a markets.json style file. Entries need a 'futuur' id and either a 'mani' id or a
+    'poly_condition_id', since Polymarket prices are recorded per condition id and not per event URL.
+    """
+    with open(os.path.abspath(path), "r") as file:
+        data = json.load(file)
+    pairs = []
+    for item in data:
+        if item.get("mani"):
+            pairs.append(BacktestPair(item["futuur"], MANIFOLD, item["mani"]))
+        elif item.get("poly_condition_id"):
+            pairs.append(
+                BacktestPair(item["futuur"], POLYMARKET, item["poly_condition_id"])
+            )
+    return pairs
+
+
+def _to_ms(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    return int(datetime.datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def print_report(report: BacktestReport):
+    for p in report.pairs:
+        print(
+            f"Futuur {p.pair.futuur_id} vs {p.pair.venue} {p.pair.market_id}: "
+            f"{p.opportunities} opportunities, {p.filled} filled, PnL {p.pnl:.2f}, "
+            f"mean duration {p.mean_duration_ms / 1000:.0f}s, best agg value {p.best_agg_value}"
+        )
+    print(
+        f"Total: {report.total_opportunities} opportunities, PnL {report.total_pnl:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backtest the arbitrage rules on recorded prices."
+    )
+    parser.add_argument("--pairs", default="markets.json")
+    parser.add_argument("--start", help="ISO date, e.g. 2024-07-01")
+    parser.add_argument("--end", help="ISO date, e.g. 2024-08-01")
+    parser.add_argument("--threshold", type=float, default=ARBITRAGE_THRESHOLD)
+    parser.add_argument("--stake", type=float, default=DEFAULT_STAKE)
+    parser.add_argument("--fill-delay-ms", type=int, default=0)
+    parser.add_argument("--slippage", type=float, default=0.0)
+    parser.add_argument("--fee-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    backtester = Backtester(
+        assumptions=FillAssumptions(
+            stake=args.stake,
+            threshold=args.threshold,
+            fill_delay_ms=args.fill_delay_ms,
+            slippage=args.slippage,
+            fee_rate=args.fee_rate,
+        )
+    )
+    result = backtester.run(
+        load_pairs(args.pairs), _to_ms(args.start), _to_ms(args.end)
+    )
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result.to_dict(), f, indent=4)
@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from analysis.arbitrage import most_similar_outcome
+from mock_venue.catalog import SyntheticCatalog, manifold_id
+from mock_venue.server import MockVenueConfig, MockVenueServer
+
+STAGES = ["futuur_sync", "manifold_sync", "polymarket_sync", "match", "scan"]
+DEFAULT_SIZES = [1_000, 10_000]
+
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def bench_futuur_sync(size: int, urls: Dict[str, str], options: dict) -> dict:
+    from futuur.futuur_api import FutuurAPI
+
+    api = FutuurAPI("bench", "bench", base_url=urls["futuur"])
+    start = time.perf_counter()
+    markets = api.get_all_markets(page_delay=0, path=None)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "items": len(markets), "unit": "markets"}
+
+
+def bench_manifold_sync(size: int, urls: Dict[str, str], options: dict) -> dict:
+    from manifold.manifold_api import ManifoldAPI
+
+    api = ManifoldAPI(base_url=urls["manifold"])
+    start = time.perf_counter()
+    markets = api.get_all_markets(total_limit=size, path=None)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "items": len(markets), "unit": "markets"}
+
+
+def bench_polymarket_sync(size: int, urls: Dict[str, str], options: dict) -> dict:
+    from polymarket.polymarket_api import PolymarketAPI
+
+    api = PolymarketAPI(host=urls["polymarket"])
+    start = time.perf_counter()
+    markets = api.get_all_markets(max_markets=size, page_delay=0, path=None)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "items": len(markets), "unit": "markets"}
+
+
+def bench_match(size: int, urls: Dict[str, str], options: dict) -> dict:
+    """
+    Outcome matching of run_main over Futuur/Polymarket pairs built from the synthetic catalog, without network.
+    """
+    catalog = SyntheticCatalog(size)
+    pairs = min(size, options["max_pairs"])
+    futuur = [catalog.futuur_market(i) for i in range(pairs)]
+    poly = [catalog.polymarket_market(i) for i in range(pairs)]
+
+    start = time.perf_counter()
+    for futuur_market, poly_market in zip(futuur, poly):
+        poly_outcomes = [token.get("outcome") for token in poly_market["tokens"]]
+        for futuur_outcome in futuur_market["outcomes"]:
+            most_similar_outcome(futuur_outcome.get("title"), poly_outcomes)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "items": pairs, "unit": "pairs"}
+
+
+def bench_scan(size: int, urls: Dict[str, str], options: dict) -> dict:
+    """
+    Per pair latency of Analizer.retrieve_market_outcomes against the mock venues.
+    """
+    import settings
+
+    settings.FUTUUR_BASE_URL = urls["futuur"]
+    settings.FUTUUR_PUBLIC_KEY = settings.FUTUUR_PUBLIC_KEY or "bench"
+    settings.FUTUUR_PRIVATE_KEY = settings.FUTUUR_PRIVATE_KEY or "bench"
+    settings.MANIFOLD_BASE_URL = urls["manifold"]
+    from analysis.analyzer import Analizer, MatchingMarket
+    from analysis.fingerprint import ChangeTracker
+    from matcher.registry import MatchRegistry
+
+    analyzer = Analizer(registry=MatchRegistry(":memory:"), changes=ChangeTracker())
+    pairs = min(size, options["max_scan_pairs"])
+    step = max(1, size // pairs)
+    latencies = []
+    for i in range(0, step * pairs, step):
+        market = MatchingMarket(
+            futuur_title="", futuur_id=i + 1, manifold_id=manifold_id(i)
+        )
+        start = time.perf_counter()
+        analyzer.retrieve_market_outcomes(market)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "seconds": float(sum(latencies)),
+        "items": pairs,
+        "unit": "pairs",
+        "latency_ms_mean": float(latencies_ms.mean()),
+        "latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+        "latency_ms_p95": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+BENCHMARKS = {
+    "futuur_sync": bench_futuur_sync,
+    "manifold_sync": bench_manifold_sync,
+    "polymarket_sync": bench_polymarket_sync,
+    "match": bench_match,
+    "scan": bench_scan,
+}
+
+
+def run_case(stage: str, size: int, urls: Dict[str, str], options: dict) -> dict:
+    """
+    Runs one benchmark. Meant to be executed in a fresh process so peak RSS belongs to this case alone.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = BENCHMARKS[stage](size, urls, options)
+    result["throughput"] = (
+        result["items"] / result["seconds"] if result["seconds"] else None
+    )
+    result["peak_rss_kb"] = peak_rss_kb()
+    return {"stage": stage, "size": size, **result}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(
+    stages: List[str],
+    sizes: List[int],
+    latency_ms: float = 0.0,
+    max_pairs: int = 2_000,
+    max_scan_pairs: int = 200,
+) -> dict:
+    options = {"max_pairs": max_pairs, "max_scan_pairs": max_scan_pairs}
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for size in sizes:
+        config = MockVenueConfig(catalog_size=size, latency_ms=latency_ms)
+        with MockVenueServer(config) as server:
+            urls = {
+                "futuur": server.futuur_url,
+                "manifold": server.manifold_url,
+                "polymarket": server.polymarket_url,
+            }
+            for stage in stages:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_case, stage, size, urls, options).result()
+                print(
+                    f"{stage:16} size={size:<8} {result['seconds']:.3f}s "
+                    f"{result['throughput'] or 0:,.1f} {result['unit']}/s "
+                    f"peak_rss={result['peak_rss_kb'] / 1024:.1f}MB"
+                )
+                results.append(result)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_ms": latency_ms,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.1) -> List[str]:
+    """
+    Compares two result files case by case and returns the cases that got slower than the tolerance allows.
+    """
+    previous = {(r["stage"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["size"]))
+        if not before or not before.get("throughput") or not result.get("throughput"):
+            continue
+        change = result["throughput"] / before["throughput"] - 1
+        rss_change = result["peak_rss_kb"] / before["peak_rss_kb"] - 1
+        line = (
+            f"{result['stage']:16} size={result['size']:<8} throughput {change:+.1%}, "
+            f"peak RSS {rss_change:+.1%}"
+        )
+        print(line)
+        if change < -tolerance or rss_change > tolerance:
+            regressions.append(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark catalog sync, matching and scans against the local mock venues."
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--max-pairs", type=int, default=2_000)
+    parser.add_argument("--max-scan-pairs", type=int, default=200)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="A previous results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    report = run_suite(
+        args.stages,
+        args.sizes,
+        latency_ms=args.latency_ms,
+        max_pairs=args.max_pairs,
+        max_scan_pairs=args.max_scan_pairs,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.tolerance:.0%}")
+            sys.exit(1)
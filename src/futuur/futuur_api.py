@@ -7,7 +7,19 @@ import time
 from typing import List
 from urllib.parse import urlencode
 
-import requests
+
+from instrumentation.telemetry import (
+    PARSE_ERRORS,
+    REQUESTS,
+    RESPONSE_BYTES,
+    endpoint_label,
+    incr,
+    span,
+    telemetry,
+)
+from transport.record_replay import get_transport
+
+BASE_URL = "https://api.futuur.com/api/v1/"
 
 
 class FutuurAPI:
@@ -34,15 +46,16 @@ class FutuurAPI:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, key=None, secret=None):
+    def __init__(self, key=None, secret=None, base_url=None):
         """
         Initializes the FutuurAPI instance.
 
         Args:
             key (str): The public key for authentication.
             secret (str): The private key for authentication.
+            base_url (str, optional): Overrides the API base URL, e.g. to point at the local mock venue server.
         """
-        self.base_url = "https://api.futuur.com/api/v1/"
+        self.base_url = base_url or BASE_URL
         self.PUBLIC_KEY = key
         self.PRIVATE_KEY = secret
 
@@ -137,10 +150,21 @@ class FutuurAPI:
             # For POST requests, include the payload as JSON in the body of the request
             request_kwargs["json"] = payload
 
-        response = requests.request(**request_kwargs)
+        endpoint_name = endpoint_label(endpoint)
+        with span("call_api", venue="futuur", method=method, endpoint=endpoint_name):
+            response = get_transport().request("futuur", **request_kwargs)
+        if telemetry.enabled:
+            incr(
+                REQUESTS,
+                venue="futuur",
+                endpoint=endpoint_name,
+                status=response.status_code,
+            )
+            incr(RESPONSE_BYTES, len(response.content), venue="futuur")
         try:
             return response.json()
         except ValueError:
+            incr(PARSE_ERRORS, venue="futuur", endpoint=endpoint_name)
             response = {
                 "error": "Failed to parse JSON response",
                 "status_code": response.status_code,
@@ -386,26 +410,38 @@ class FutuurAPI:
         """
         return self.call_api("bets/rates/", method="GET")
 
-    def get_all_markets(self, category=None):
+    def get_all_markets(self, category=None, page_delay=1, path="futuur_data.json"):
+        """
+        Fetches every page of markets, optionally restricted to a category.
+
+        Args:
+            category (int, optional): The ID of the category of markets to fetch. Default is None, fetching all categories.
+            page_delay (float): Seconds to sleep between pages, to stay under the API rate limit. Default is 1.
+            path (str, optional): Where to dump the markets as JSON. None skips the dump. Default is 'futuur_data.json'.
 
-        # params = {'offset': offset}
-        response = self.get_markets(category=category)
+        Returns:
+            list: The markets sorted by real money volume, highest first.
+        """
+        with span("pagination_page", venue="futuur"):
+            response = self.get_markets(category=category)
 
         results: List = response.get("results")
         offset = response.get("pagination").get("page_size")
 
         next = response.get("pagination").get("next")
         while next:
-            response = self.get_markets(offset=offset, category=category)
+            with span("pagination_page", venue="futuur"):
+                response = self.get_markets(offset=offset, category=category)
             results.extend(response.get("results"))
 
             next = response.get("pagination").get("next")
             offset += response.get("pagination").get("page_size")
-            time.sleep(1)
+            time.sleep(page_delay)
 
         sorted_markets = sorted(
             results, key=lambda x: x["volume_real_money"], reverse=True
         )
-        with open("futuur_data.json", "w", encoding="utf-8") as f:
-            json.dump(sorted_markets, f, ensure_ascii=False, indent=4)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(sorted_markets, f, ensure_ascii=False, indent=4)
         return sorted_markets
@@ -1,74 +1,170 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional
+
 import settings as settings
+from instrumentation.telemetry import span
 from .futuur_api import FutuurAPI
-from urllib.parse import urlparse, parse_qs
 
 
-class FutuurMarket(FutuurAPI):
+class FutuurMarket:
     """
-    A class for interacting with the Futuur Market API to fetch and manage market data.
+    A lazy, iterable cursor over the Futuur markets endpoint.
 
-    This class inherits from FutuurAPI and provides methods specifically tailored to interacting
-    with market-related endpoints of the Futuur API.
+    Requests go through the given FutuurAPI, so the cursor shares its keys, base URL and session. Nothing is fetched
+    when it is created: iterating it walks the market pages with offset pagination, and while one page is being
+    consumed the next one is already being fetched on a background thread. Every request uses the filters given to
+    the constructor.
 
     Attributes:
-        PUBLIC_KEY (str): The public API key for authentication, obtained from settings.
-        PRIVATE_KEY (str): The private API key for authentication, obtained from settings.
-        base_url (str): The base URL for the API endpoints, inherited from FutuurAPI.
+        api (FutuurAPI): The client the pages are fetched with.
         currency_mode (str): Determines the currency mode for market data queries ('play_money' or 'real_money').
         ordering (str): Specifies the ordering of market data results (e.g., 'relevance').
         hide_my_bets (bool): Flag to hide the user's bets in the query results.
-        market_request (dict): The initial market data fetched from the API.
-        pagination (dict): Contains pagination information for fetching additional market data.
-        markets (list): A list of market entries fetched from the API.
+        page_size (int): The number of markets requested per page.
+        pagination (dict): Pagination information of the last fetched page.
+        pages (deque): The fetched pages kept in memory, at most max_pages_in_memory of them.
 
     Methods:
-        __init__(currency_mode="play_money", ordering="relevance", hide_my_bets=True):
-            Initializes a new instance of the FutuurMarket class with default or specified settings.
+        __iter__(): Iterates over every market, from the first page.
+        iter_pages(): Iterates over the pages, from the first one.
+        add_markets(): Fetches the next page of the cursor and keeps it in memory.
 
-        add_markets():
-            Fetches additional markets based on the current pagination state and adds them to the instance's market list
+    Usage:
+        for market in FutuurMarket(currency_mode="real_money", max_pages_in_memory=2):
+            ...
     """
 
     def __init__(
-        self, currency_mode="play_money", ordering="relevance", hide_my_bets=True
+        self,
+        currency_mode="play_money",
+        ordering="relevance",
+        hide_my_bets=True,
+        page_size=40,
+        category=None,
+        tag=None,
+        live=None,
+        resolved_only=False,
+        max_pages_in_memory: Optional[int] = None,
+        prefetch=True,
+        futuur_api: Optional[FutuurAPI] = None,
     ):
         """
-        Initializes the FutuurAPI instance.
+        Initializes the FutuurMarket instance. No request is made until the markets are iterated.
 
         Params:
-            limit (int): The number of markets to return.
-            offset (int): The number of markets to skip.
             currency_mode (str): The currency mode to use. Can be 'play_money' or 'real_money'.
-            ordering (str): The ordering to use. Can be 'relevance', 'popularity', 'newest', or 'oldest'.
+            ordering (str): The ordering to use. Options include 'relevance', '-created_on', 'bet_end_date',
+                '-wagers_count', '-volume'.
             hide_my_bets (bool): Whether to hide the user's bets.
-
-        Args:
-            key (str): The public key for authentication.
-            secret (str): The private key for authentication.
+            page_size (int): The number of markets to request per page. Default is 40.
+            category (int, optional): Only fetch markets of this category.
+            tag (str, optional): Only fetch markets with this tag.
+            live (bool, optional): Only fetch live markets.
+            resolved_only (bool): Only fetch resolved markets.
+            max_pages_in_memory (int, optional): Keep only the last N fetched pages in memory. Default keeps all.
+            prefetch (bool): Fetch the next page in the background while the current one is consumed.
+            futuur_api (FutuurAPI, optional): The client to fetch with. Default client uses the settings.
         """
-        super().__init__(
-            key=settings.FUTUUR_PUBLIC_KEY, secret=settings.FUTUUR_PRIVATE_KEY
+        self.api = futuur_api or FutuurAPI(
+            settings.FUTUUR_PUBLIC_KEY,
+            settings.FUTUUR_PRIVATE_KEY,
+            base_url=settings.FUTUUR_BASE_URL,
         )
         self.currency_mode = currency_mode
         self.ordering = ordering
         self.hide_my_bets = hide_my_bets
+        self.page_size = page_size
+        self.category = category
+        self.tag = tag
+        self.live = live
+        self.resolved_only = resolved_only
+        self.prefetch = prefetch
+
+        self.pagination: Optional[dict] = None
+        self.pages: Deque[List[dict]] = deque(maxlen=max_pages_in_memory)
+        self.next_offset: Optional[int] = 0
+
+    @property
+    def markets(self) -> List[dict]:
+        """
+        The markets of the pages currently kept in memory.
+        """
+        return [market for page in self.pages for market in page]
+
+    def fetch_page(self, offset: int) -> dict:
+        """
+        Fetches one page of markets with the cursor filters.
+
+        Args:
+            offset (int): The offset from which to return the results.
+
+        Returns:
+            dict: The raw API response, with 'pagination' and 'results'.
+        """
+        with span("pagination_page", venue="futuur"):
+            return self.api.get_markets(
+                limit=self.page_size,
+                offset=offset,
+                currency_mode=self.currency_mode,
+                ordering=self.ordering,
+                hide_my_bets=self.hide_my_bets,
+                live=self.live,
+                resolved_only=self.resolved_only,
+                category=self.category,
+                tag=self.tag,
+            )
+
+    def _next_offset(self, offset: int, response: dict) -> Optional[int]:
+        pagination = response.get("pagination") or {}
+        if not pagination.get("next"):
+            return None
+        return offset + (
+            pagination.get("page_size") or len(response.get("results") or [])
+        )
+
+    def iter_pages(self) -> Iterator[List[dict]]:
+        """
+        Iterates over the pages of markets from the first one. Each page is kept in the in-memory window.
+        """
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        pending: Optional[Future] = None
+        try:
+            offset: Optional[int] = 0
+            if executor:
+                pending = executor.submit(self.fetch_page, offset)
+            while offset is not None:
+                response = pending.result() if pending else self.fetch_page(offset)
+                pending = None
+                next_offset = self._next_offset(offset, response)
+                if executor and next_offset is not None:
+                    pending = executor.submit(self.fetch_page, next_offset)
+
+                results = response.get("results") or []
+                self.pagination = response.get("pagination")
+                self.pages.append(results)
+                offset = next_offset
+                yield results
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
 
-        self.market_request = self.get_markets(limit=40, offset=0)
-        self.pagination = self.market_request.get("pagination")
-        self.markets = self.market_request.get("results")
+    def __iter__(self) -> Iterator[dict]:
+        for page in self.iter_pages():
+            yield from page
 
-    def add_markets(self):
+    def add_markets(self) -> List[dict]:
         """
-        Fetches additional markets from the Futuur API based on the current pagination state and appends them to the
-        instance's markets list.
+        Fetches the next page of the cursor and keeps it in the in-memory window.
 
-        This method dynamically constructs the query parameters for the API request from the pagination information of
-        the last fetched data. It updates the instance's market list and pagination info with the newly fetched data.
+        Returns:
+            list: The markets of the fetched page. Empty once every page was fetched.
         """
-        parsed_url = urlparse(self.pagination.get("next"))
-        query_string = parsed_url.query
-        query_dict = parse_qs(query_string)
-        params = {k: v[0] if len(v) == 1 else v for k, v in query_dict.items()}
-        response = self.call_api("markets/", params=params)
+        if self.next_offset is None:
+            return []
+        response = self.fetch_page(self.next_offset)
+        results = response.get("results") or []
         self.pagination = response.get("pagination")
-        self.markets += response.get("results")
+        self.pages.append(results)
+        self.next_offset = self._next_offset(self.next_offset, response)
+        return results
@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from instrumentation.telemetry import CACHE_HITS, CACHE_MISSES, incr
+from .futuur_api import FutuurAPI
+
+PLAY_MONEY = "OOM"
+# Preference order when a real money price is needed: the first currency with a price wins.
+REAL_MONEY_CURRENCIES = ["USDC", "USDT", "BTC", "ETH"]
+BASES = {"play_money": [PLAY_MONEY], "real_money": REAL_MONEY_CURRENCIES}
+
+
+def _parse_rates(response) -> Dict[str, float]:
+    """
+    Reads the rates endpoint into {currency: value of one unit in USDC}. Accepts a flat mapping of numbers, or a
+    mapping of currency to quotes keyed 'USDC'/'USD'/'rate'.
+    """
+    rates = {}
+    if not isinstance(response, dict):
+        return rates
+    for currency, value in response.items():
+        if isinstance(value, dict):
+            value = value.get("USDC", value.get("USD", value.get("rate")))
+        try:
+            rates[str(currency).upper()] = float(value)
+        except (TypeError, ValueError):
+            continue
+    rates.setdefault("USDC", 1.0)
+    return rates
+
+
+class RateCache:
+    """
+    TTL cache over FutuurAPI.get_rates, so a scan makes at most one rate call per TTL.
+
+    Attributes:
+        api (FutuurAPI): The client used to refresh the rates.
+        ttl (float): How long fetched rates stay valid, in seconds.
+    """
+
+    def __init__(self, api: FutuurAPI, ttl: float = 300):
+        self.api = api
+        self.ttl = ttl
+        self._rates: Dict[str, float] = {}
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict[str, float]:
+        """
+        Returns {currency: value of one unit in USDC}, refreshing it when older than the TTL.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._fetched_at is not None and now - self._fetched_at < self.ttl:
+                incr(CACHE_HITS, cache="futuur_rates")
+                return self._rates
+            incr(CACHE_MISSES, cache="futuur_rates")
+            rates = _parse_rates(self.api.get_rates())
+            if len(rates) > 1 or not self._rates:
+                self._rates = rates
+            self._fetched_at = now
+            return self._rates
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = None
+
+    def rate_vector(self, currencies: Sequence[str]) -> np.ndarray:
+        """
+        USDC value of one unit of each currency, NaN for unknown currencies.
+        """
+        rates = self.get()
+        return np.array([rates.get(c.upper(), np.nan) for c in currencies], dtype=float)
+
+    def to_usdc(self, amounts, currencies: Sequence[str]) -> np.ndarray:
+        """
+        Converts amounts quoted in the given currencies to USDC in one vectorized step.
+        """
+        return np.asarray(amounts, dtype=float) * self.rate_vector(currencies)
+
+
+class FutuurPriceTable:
+    """
+    Outcome prices of many Futuur markets, packed once into a (outcome, currency) matrix.
+
+    Futuur quotes every outcome in each currency pool, and a share bought in a currency pays one unit of that
+    currency, so each quote is already a probability per unit of payout whatever the currency. What differs is which
+    pool is compared: play money (OOM) against Manifold mana, real money against Polymarket USDC. Missing quotes are
+    NaN instead of 1, so an unpriced outcome is never mistaken for an expensive one.
+
+    Attributes:
+        currencies (list): The matrix columns.
+        outcome_ids (numpy.ndarray): The Futuur outcome id of each row.
+        market_ids (numpy.ndarray): The Futuur market id of each row.
+        prices (numpy.ndarray): The price matrix, NaN where a currency has no quote.
+    """
+
+    def __init__(self, markets: Iterable[dict], currencies: Optional[List[str]] = None):
+        markets = [m for m in markets if m and m.get("outcomes")]
+        if currencies is None:
+            found = {
+                c for m in markets for o in m["outcomes"] for c in o.get("price") or {}
+            }
+            known = [PLAY_MONEY] + REAL_MONEY_CURRENCIES
+            currencies = [c for c in known if c in found] + sorted(found - set(known))
+        self.currencies = currencies
+        column = {c: i for i, c in enumerate(currencies)}
+
+        outcomes = [(m.get("id"), o) for m in markets for o in m["outcomes"]]
+        self.market_ids = np.array([m for m, _ in outcomes], dtype=object)
+        self.outcome_ids = np.array([o.get("id") for _, o in outcomes], dtype=object)
+        self.prices = np.full((len(outcomes), len(currencies)), np.nan)
+        for row, (_, outcome) in enumerate(outcomes):
+            for currency, price in (outcome.get("price") or {}).items():
+                if price is not None and currency in column:
+                    self.prices[row, column[currency]] = price
+        self._rows = {oid: row for row, oid in enumerate(self.outcome_ids)}
+        self._probabilities: Dict[str, np.ndarray] = {}
+
+    def currency_vector(self, currency: str) -> np.ndarray:
+        """
+        The price of every outcome in one currency pool, NaN where it has no quote.
+        """
+        if currency not in self.currencies:
+            return np.full(len(self.outcome_ids), np.nan)
+        return self.prices[:, self.currencies.index(currency)]
+
+    def probabilities(self, basis="real_money") -> np.ndarray:
+        """
+        One probability per outcome on a common basis.
+
+        Args:
+            basis (str): 'play_money', 'real_money' (first quoted currency of REAL_MONEY_CURRENCIES) or a currency.
+
+        Returns:
+            numpy.ndarray: The probability of each row, NaN where no currency of the basis is quoted.
+        """
+        out = self._probabilities.get(basis)
+        if out is None:
+            out = np.full(len(self.outcome_ids), np.nan)
+            for currency in BASES.get(basis, [basis]):
+                out = np.where(np.isnan(out), self.currency_vector(currency), out)
+            self._probabilities[basis] = out
+        return out
+
+    def outcome_probabilities(
+        self, outcome_ids: Iterable, basis="real_money"
+    ) -> List[Optional[float]]:
+        """
+        Probabilities of the given outcomes on a basis, None where unknown or unquoted.
+        """
+        probabilities = self.probabilities(basis)
+        values = []
+        for outcome_id in outcome_ids:
+            row = self._rows.get(outcome_id)
+            value = probabilities[row] if row is not None else np.nan
+            values.append(None if np.isnan(value) else float(value))
+        return values
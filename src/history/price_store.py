@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CHUNK_SIZE = 4096
+# Timestamps are stored as millisecond offsets from the chunk base, which keeps
+# each record at 8 bytes. A chunk is rolled over as soon as an offset would not
+# fit in an unsigned 32 bit integer (~49 days).
+RECORD_DTYPE = np.dtype([("dt", "<u4"), ("price", "<f4")])
+MAX_DELTA_MS = np.iinfo(np.uint32).max
+INDEX_FILE = "index.json"
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _safe_name(value) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(value))
+
+
+class PriceStore:
+    """
+    Compact on-disk time-series store for outcome prices.
+
+    Every (venue, market, outcome) series is split into fixed size chunks. Each chunk is a memory-mapped ``.npy``
+    file of ``RECORD_DTYPE`` records whose timestamps are delta-encoded against the chunk base timestamp. A single
+    ``index.json`` per market holds chunk bases, record counts and outcome labels, so range queries only open the
+    chunks overlapping the requested window.
+
+    Appends only write the record into its chunk. The index is rewritten when a chunk is created, and otherwise on
+    flush or close, so other processes see the records of an open chunk once the writer flushes.
+
+    Layout:
+        <root>/<venue>/<market_id>/index.json
+        <root>/<venue>/<market_id>/<outcome_key>/<chunk_no>.npy
+
+    Attributes:
+        root (str): The directory holding the store.
+        chunk_size (int): Number of records per chunk file.
+    """
+
+    def __init__(self, root: str, chunk_size: int = CHUNK_SIZE, max_open_chunks=256):
+        """
+        Initializes the PriceStore instance.
+
+        Args:
+            root (str): The directory holding the store. Created if missing.
+            chunk_size (int): Number of records per chunk file. Default is 4096.
+            max_open_chunks (int): How many writable chunk memmaps are kept open between appends. Default is 256.
+        """
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_open_chunks = max_open_chunks
+        self._indexes: Dict[Tuple[str, str], dict] = {}
+        self._open_chunks: "OrderedDict[str, np.memmap]" = OrderedDict()
+        # Markets whose cached index has appends not written to index.json yet
+        self._dirty_indexes: set = set()
+        os.makedirs(root, exist_ok=True)
+
+    def _market_dir(self, venue: str, market_id) -> str:
+        return os.path.join(self.root, _safe_name(venue), _safe_name(market_id))
+
+    def _load_index(self, venue: str, market_id) -> dict:
+        key = (venue, str(market_id))
+        index = self._indexes.get(key)
+        if index is None:
+            path = os.path.join(self._market_dir(venue, market_id), INDEX_FILE)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except FileNotFoundError:
+                index = {"market_id": str(market_id), "title": "", "outcomes": {}}
+            self._indexes[key] = index
+        return index
+
+    def _save_index(self, venue: str, market_id, index: dict):
+        market_dir = self._market_dir(venue, market_id)
+        os.makedirs(market_dir, exist_ok=True)
+        path = os.path.join(market_dir, INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _writable_chunk(self, path: str, create: bool) -> np.memmap:
+        chunk = self._open_chunks.pop(path, None)
+        if chunk is None:
+            if create:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                chunk = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=RECORD_DTYPE, shape=(self.chunk_size,)
+                )
+            else:
+                chunk = np.lib.format.open_memmap(path, mode="r+")
+        self._open_chunks[path] = chunk
+        while len(self._open_chunks) > self.max_open_chunks:
+            _, evicted = self._open_chunks.popitem(last=False)
+            evicted.flush()
+        return chunk
+
+    def append(
+        self,
+        venue: str,
+        market_id,
+        prices: Dict[str, float],
+        timestamp: Optional[int] = None,
+        labels: Optional[Dict[str, str]] = None,
+        title: Optional[str] = None,
+    ):
+        """
+        Appends one price observation per outcome of a market.
+
+        Args:
+            venue (str): The venue name, e.g. 'futuur', 'manifold' or 'polymarket'.
+            market_id: The venue specific market id.
+            prices (dict): Mapping of outcome key to observed price. None values are skipped.
+            timestamp (int, optional): Observation time in milliseconds since epoch. Default is now.
+            labels (dict, optional): Human readable outcome titles, stored once per outcome.
+            title (str, optional): The market title, stored in the market index.
+
+        Raises:
+            ValueError: If the timestamp is older than the last record of a series.
+        """
+        timestamp = now_ms() if timestamp is None else int(timestamp)
+        index = self._load_index(venue, market_id)
+        prices = {str(k): v for k, v in prices.items() if v is not None}
+        # The whole observation is checked before the cached index changes, so a rejected one leaves no trace
+        for outcome in prices:
+            chunks = index["outcomes"].get(outcome, {}).get("chunks")
+            if chunks and timestamp < chunks[-1]["last_ms"]:
+                raise ValueError(
+                    f"Out of order observation for {venue}/{market_id}/{outcome}: "
+                    f"{timestamp} < {chunks[-1]['last_ms']}"
+                )
+        if title:
+            index["title"] = title
+        market_dir = self._market_dir(venue, market_id)
+
+        created = False
+        for outcome, price in prices.items():
+            series = index["outcomes"].setdefault(
+                outcome, {"dir": _safe_name(outcome), "label": outcome, "chunks": []}
+            )
+            if labels and labels.get(outcome):
+                series["label"] = labels[outcome]
+            chunks: List[dict] = series["chunks"]
+
+            last = chunks[-1] if chunks else None
+            create = (
+                last is None
+                or last["count"] >= self.chunk_size
+                or timestamp - last["base_ms"] > MAX_DELTA_MS
+            )
+            if create:
+                last = {
+                    "file": f"{len(chunks):05d}.npy",
+                    "base_ms": timestamp,
+                    "last_ms": timestamp,
+                    "count": 0,
+                }
+                chunks.append(last)
+
+            path = os.path.join(market_dir, series["dir"], last["file"])
+            chunk = self._writable_chunk(path, create=create)
+            chunk[last["count"]] = (timestamp - last["base_ms"], price)
+            last["count"] += 1
+            last["last_ms"] = timestamp
+            created = created or create
+
+        key = (venue, str(market_id))
+        if created:
+            # A new chunk file must be in the index before anything else can find it
+            self._save_index(venue, market_id, index)
+            self._dirty_indexes.discard(key)
+        else:
+            self._dirty_indexes.add(key)
+
+    def flush(self):
+        """
+        Flushes every open chunk to disk, releases the memory maps and writes the indexes with pending appends.
+        """
+        for chunk in self._open_chunks.values():
+            chunk.flush()
+        self._open_chunks.clear()
+        for venue, market_id in self._dirty_indexes:
+            self._save_index(venue, market_id, self._indexes[(venue, market_id)])
+        self._dirty_indexes.clear()
+
+    def close(self):
+        self.flush()
+        self._indexes.clear()
+
+    def venues(self) -> List[str]:
+        return sorted(
+            d
+            for d in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, d))
+        )
+
+    def markets(self, venue: str) -> List[str]:
+        venue_dir = os.path.join(self.root, _safe_name(venue))
+        if not os.path.isdir(venue_dir):
+            return []
+        return sorted(
+            d
+            for d in os.listdir(venue_dir)
+            if os.path.isfile(os.path.join(venue_dir, d, INDEX_FILE))
+        )
+
+    def market_info(self, venue: str, market_id) -> dict:
+        """
+        Returns the market index: its title and, per outcome, the label and chunk metadata.
+        """
+        return self._load_index(venue, market_id)
+
+    def outcomes(self, venue: str, market_id) -> Dict[str, str]:
+        """
+        Returns a mapping of outcome key to outcome label for a recorded market.
+        """
+        index = self._load_index(venue, market_id)
+        return {k: v["label"] for k, v in index["outcomes"].items()}
+
+    def query(
+        self,
+        venue: str,
+        market_id,
+        outcome,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the recorded prices of one outcome inside a time window.
+
+        Only chunks overlapping [start, end] are opened, and the window edges inside a chunk are found with a binary
+        search on the delta-encoded timestamps, so the cost is proportional to the size of the result.
+
+        Args:
+            venue (str): The venue name.
+            market_id: The venue specific market id.
+            outcome: The outcome key.
+            start (int, optional): Window start in milliseconds since epoch, inclusive. Default is unbounded.
+            end (int, optional): Window end in milliseconds since epoch, inclusive. Default is unbounded.
+
+        Returns:
+            tuple: (timestamps, prices) as int64 milliseconds and float64 arrays, sorted by time.
+        """
+        index = self._load_index(venue, market_id)
+        series = index["outcomes"].get(str(outcome))
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        market_dir = self._market_dir(venue, market_id)
+        timestamps, prices = [], []
+        for meta in series["chunks"]:
+            if meta["count"] == 0:
+                continue
+            if start is not None and meta["last_ms"] < start:
+                continue
+            if end is not None and meta["base_ms"] > end:
+                break
+            path = os.path.join(market_dir, series["dir"], meta["file"])
+            chunk = self._open_chunks.get(path)
+            if chunk is None:
+                chunk = np.load(path, mmap_mode="r")
+            records = chunk[: meta["count"]]
+            deltas = records["dt"]
+            lo = 0
+            hi = meta["count"]
+            if start is not None and start > meta["base_ms"]:
+                lo = int(np.searchsorted(deltas, start - meta["base_ms"], side="left"))
+            if end is not None:
+                hi = int(np.searchsorted(deltas, end - meta["base_ms"], side="right"))
+            if hi <= lo:
+                continue
+            timestamps.append(deltas[lo:hi].astype(np.int64) + meta["base_ms"])
+            prices.append(records["price"][lo:hi].astype(np.float64))
+
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(timestamps), np.concatenate(prices)
@@ -0,0 +1,97 @@
+from typing import Optional
+
+import settings
+from history.price_store import PriceStore
+
+FUTUUR = "futuur"
+MANIFOLD = "manifold"
+POLYMARKET = "polymarket"
+
+
+class PriceRecorder:
+    """
+    Appends every outcome price we observe on a venue to a PriceStore, so runs can later be replayed and backtested.
+
+    Attributes:
+        store (PriceStore): The time-series store the observations are written to.
+    """
+
+    def __init__(self, store: Optional[PriceStore] = None):
+        """
+        Initializes the PriceRecorder instance.
+
+        Args:
+            store (PriceStore, optional): The store to write to. Default is a store at settings.PRICE_HISTORY_DIR.
+        """
+        self.store = store or PriceStore(settings.PRICE_HISTORY_DIR)
+
+    def record_futuur_market(self, market: dict, timestamp=None):
+        """
+        Records the prices of every outcome of a Futuur market payload, as returned by FutuurAPI.get_market.
+
+        Outcome prices are kept per currency, so each (outcome, currency) pair is its own series keyed
+        '<outcome_id>:<currency>'.
+        """
+        if not market or market.get("id") is None:
+            return
+        prices, labels = {}, {}
+        for outcome in market.get("outcomes") or []:
+            for currency, price in (outcome.get("price") or {}).items():
+                key = f"{outcome.get('id')}:{currency}"
+                prices[key] = price
+                labels[key] = outcome.get("title")
+        self.store.append(
+            FUTUUR,
+            market["id"],
+            prices,
+            timestamp=timestamp,
+            labels=labels,
+            title=market.get("title"),
+        )
+
+    def record_manifold_market(self, market: dict, timestamp=None):
+        """
+        Records the probabilities of a Manifold market payload, as returned by ManifoldAPI.get_market_by_id.
+        """
+        if not market or market.get("id") is None:
+            return
+        if market.get("outcomeType") == "BINARY":
+            probability = market.get("probability")
+            if probability is None:
+                return
+            prices = {"YES": probability, "NO": 1 - probability}
+            labels = {"YES": "yes", "NO": "no"}
+        else:
+            answers = [a for a in market.get("answers") or [] if a.get("id")]
+            prices = {a.get("id"): a.get("probability") for a in answers}
+            labels = {a.get("id"): a.get("text") for a in answers}
+        self.store.append(
+            MANIFOLD,
+            market["id"],
+            prices,
+            timestamp=timestamp,
+            labels=labels,
+            title=market.get("question"),
+        )
+
+    def record_polymarket_market(self, market: dict, timestamp=None):
+        """
+        Records the token prices of a Polymarket CLOB market, as returned by ClobClient.get_market.
+        """
+        if not market or market.get("condition_id") is None:
+            return
+        tokens = market.get("tokens") or []
+        tokens = [t for t in tokens if t.get("token_id")]
+        prices = {t["token_id"]: t.get("price") for t in tokens}
+        labels = {t["token_id"]: t.get("outcome") for t in tokens}
+        self.store.append(
+            POLYMARKET,
+            market["condition_id"],
+            prices,
+            timestamp=timestamp,
+            labels=labels,
+            title=market.get("question"),
+        )
+
+    def close(self):
+        self.store.close()
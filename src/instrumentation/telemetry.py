@@ -0,0 +1,229 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+import settings
+
+METRIC_PREFIX = "prediction_markets"
+MAX_SPAN_EVENTS = 10_000
+
+# Counter names shared by the API clients and the caches
+REQUESTS = "requests_total"
+RESPONSE_BYTES = "response_bytes_total"
+PARSE_ERRORS = "parse_errors_total"
+CACHE_HITS = "cache_hits_total"
+CACHE_MISSES = "cache_misses_total"
+# Opportunity alerts, see alerts.stream
+ALERTS_SENT = "alerts_sent_total"
+ALERTS_SUPPRESSED = "alerts_suppressed_total"
+ALERTS_DROPPED = "alerts_dropped_total"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def endpoint_label(endpoint: str) -> str:
+    """
+    Collapses ids in an API path so every market shares one label, e.g. 'markets/123/' -> 'markets/:id/'.
+    """
+    return "/".join(
+        ":id" if re.search(r"\d", part) else part for part in endpoint.split("/")
+    )
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("telemetry", "name", "labels", "start")
+
+    def __init__(self, telemetry: "Telemetry", name: str, labels: dict):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.labels["error"] = exc_type.__name__
+        self.telemetry.record_span(self.name, self.labels, duration)
+        return False
+
+
+class Telemetry:
+    """
+    Lightweight in-process timing spans and counters.
+
+    Spans are aggregated per (name, labels) into count, total and max duration, and the most recent ones are also
+    kept as events for structured logs. Everything can be exported as JSON lines or as Prometheus text. When
+    disabled, ``span`` returns a shared no-op context manager and ``incr`` returns immediately, so instrumented
+    code pays a single attribute check.
+
+    Attributes:
+        enabled (bool): Whether spans and counters are recorded.
+    """
+
+    def __init__(self, enabled: bool = False, max_events: int = MAX_SPAN_EVENTS):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.spans: Dict[Tuple[str, Labels], list] = {}
+        self.events: Deque[dict] = deque(maxlen=max_events)
+
+    def span(self, name: str, **labels):
+        """
+        Times the enclosed block.
+
+        Usage:
+            with telemetry.span("call_api", venue="futuur"):
+                ...
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, labels)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def record_span(self, name: str, labels: dict, duration: float):
+        key = (name, _labels(labels))
+        with self.lock:
+            stats = self.spans.get(key)
+            if stats is None:
+                self.spans[key] = [1, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+            self.events.append(
+                {"ts": time.time(), "span": name, "seconds": duration, **labels}
+            )
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.spans.clear()
+            self.events.clear()
+
+    def to_json_lines(self) -> str:
+        """
+        Exports the recent span events followed by the aggregated spans and counters, one JSON object per line.
+        """
+        with self.lock:
+            lines = [json.dumps({"type": "span_event", **e}) for e in self.events]
+            for (name, labels), (count, total, longest) in self.spans.items():
+                lines.append(
+                    json.dumps(
+                        {
+                            "type": "span",
+                            "span": name,
+                            "count": count,
+                            "seconds_total": total,
+                            "seconds_max": longest,
+                            **dict(labels),
+                        }
+                    )
+                )
+            for (name, labels), value in self.counters.items():
+                lines.append(
+                    json.dumps(
+                        {
+                            "type": "counter",
+                            "counter": name,
+                            "value": value,
+                            **dict(labels),
+                        }
+                    )
+                )
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_prometheus(self) -> str:
+        """
+        Exports spans as a summary (count and sum) plus a max gauge, and counters as Prometheus counters.
+        """
+
+        def fmt(labels: Labels) -> str:
+            if not labels:
+                return ""
+            escaped = (
+                v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                for _, v in labels
+            )
+            return (
+                "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+            )
+
+        out = []
+        with self.lock:
+            if self.spans:
+                metric = f"{METRIC_PREFIX}_span_seconds"
+                out.append(f"# TYPE {metric} summary")
+                for (name, labels), (count, total, _) in sorted(self.spans.items()):
+                    label_str = fmt((("span", name),) + labels)
+                    out.append(f"{metric}_count{label_str} {count}")
+                    out.append(f"{metric}_sum{label_str} {total:.9f}")
+                out.append(f"# TYPE {metric}_max gauge")
+                for (name, labels), (_, _, longest) in sorted(self.spans.items()):
+                    out.append(
+                        f"{metric}_max{fmt((('span', name),) + labels)} {longest:.9f}"
+                    )
+            by_name: Dict[str, list] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                by_name.setdefault(name, []).append((labels, value))
+            for name, series in by_name.items():
+                metric = f"{METRIC_PREFIX}_{name}"
+                out.append(f"# TYPE {metric} counter")
+                for labels, value in series:
+                    out.append(f"{metric}{fmt(labels)} {value:g}")
+        return "\n".join(out) + "\n" if out else ""
+
+    def export(self, path: str):
+        """
+        Writes the telemetry to a file: Prometheus text for '.prom' files, JSON lines otherwise.
+        """
+        content = (
+            self.to_prometheus() if path.endswith(".prom") else self.to_json_lines()
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+telemetry = Telemetry(enabled=settings.TELEMETRY_ENABLED)
+
+
+def span(name: str, **labels):
+    return telemetry.span(name, **labels)
+
+
+def incr(name: str, value: float = 1, **labels):
+    telemetry.incr(name, value, **labels)
+
+
+def export(path: Optional[str] = None):
+    path = path or settings.TELEMETRY_EXPORT_PATH
+    if telemetry.enabled and path:
+        telemetry.export(path)
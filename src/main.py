@@ -1,39 +1,53 @@
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import time
 from typing import List, Optional
+from alerts.sinks import sinks_from_settings
+from alerts.stream import OpportunityEvent, OpportunityStream
+from analysis.fingerprint import ChangeTracker, market_fingerprint, pair_fingerprint
+from analysis.arbitrage import (
+    ARBITRAGE_THRESHOLD,
+    aggregate_value,
+    best_outcome_match,
+    is_opportunity,
+)
 from analysis.markets_analysis import analyze
+from analysis.price_impact import FutuurImpactModel
+from analysis.ranking import (
+    STAKE_LADDER,
+    book_average_price,
+    executable_size,
+    latest_close_ms,
+    leg_stakes,
+    rank,
+    venue_fees,
+)
 from matcher.matcher import Matcher
+from matcher.registry import MarketMatch, MatchRegistry, content_hash
 import re
 import os
 
 import settings
 from futuur.futuur_api import FutuurAPI
+from futuur.rates import FutuurPriceTable, RateCache
+from history.recorder import FUTUUR, POLYMARKET, PriceRecorder
+from instrumentation import telemetry
+from instrumentation.telemetry import span
 from polymarket.polymarket_api import PolymarketAPI
-from py_clob_client.client import ClobClient
+from risk.engine import RiskEngine, futuur_category
+from settlement.tracker import SettlementTracker
+from transport.record_replay import clob_client, get_transport
+import numpy as np
 import requests
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 
-def load_markets():
-    abs_path = os.path.abspath("markets.json")
-
-    try:
-        with open(abs_path, "r") as file:
-            data = json.load(file)
-            return data
-
-    except FileNotFoundError:
-        try:
-            abs_path = os.path.abspath("src/markets.json")
-            with open(abs_path, "r") as file:
-                data = json.load(file)
-                return data
-
-        except FileNotFoundError:
-
-            return None
+def load_markets(registry: MatchRegistry):
+    """
+    Returns the Futuur/Polymarket pairs of the match registry that have a Polymarket event URL, as markets.json
+    entries. An empty registry is first seeded from markets.json.
+    """
+    registry.import_json_if_empty()
+    return [entry for entry in registry.entries(POLYMARKET) if entry.get("poly")]
 
 
 @dataclass
@@ -53,6 +67,7 @@ class PolyUrlToMarkets:
 class FutuurPayloadToPolyConditions:
     futuur_payload: dict
     poly_markets: dict
+    registry_match: Optional[MarketMatch] = None
 
 
 @dataclass
@@ -66,7 +81,18 @@ class FutuurToPolyMarket:
     futuur_to_poly_outcomes: Optional[list[FutuurOutcomeToPolyOutcome]]
     agg_value: float = 0.0
     futuur_question_id: int | None = None
+    poly_condition_id: str | None = None
+    category: int | None = None
     agg_amount_bet_on_futuur: float = 0.0
+    # What the risk limits and the depth of both legs still allow to stake on the pair, in USDC
+    stake_usdc: float = 0.0
+    # When the later of the two markets closes, which is how long a stake stays locked
+    close_ms: float = np.nan
+    # Capital given to the pair by the ranking of the scan, and the annualized return it ranked by
+    allocation_usdc: float = 0.0
+    annualized_return: float = 0.0
+    # False when neither market changed since the last run and the cached outcomes and agg_value were reused
+    changed: bool = True
     # TODO include more info here, like agg amount bet, and etc.
 
 
@@ -75,21 +101,94 @@ class FutuurOutcomesToPolyOutcomes:
     futuur_to_poly_markets: Optional[list[FutuurToPolyMarket]]
 
 
+def _ask_levels(book) -> List[tuple]:
+    """
+    (price, size) of the asks of a CLOB order book, an OrderBookSummary or its JSON.
+    """
+    asks = getattr(book, "asks", None)
+    if asks is None and isinstance(book, dict):
+        asks = book.get("asks")
+    levels = []
+    for level in asks or []:
+        price = level.get("price") if isinstance(level, dict) else level.price
+        size = level.get("size") if isinstance(level, dict) else level.size
+        levels.append((float(price), float(size)))
+    return levels
+
+
+def executable_sizes(
+    opportunities: List["FutuurToPolyMarket"],
+    futuur_prices: FutuurPriceTable,
+    poli_client,
+    impact_model: FutuurImpactModel,
+) -> np.ndarray:
+    """
+    The largest stake of STAKE_LADDER, in USDC, at which each opportunity still clears ARBITRAGE_THRESHOLD once
+    the depth of its legs is paid for: each outcome is bought on its cheaper venue, walking the Polymarket order
+    book or the calibrated Futuur LMSR. 0 when a leg cannot be priced.
+    """
+    agg_values = np.full((len(opportunities), len(STAKE_LADDER)), np.nan)
+    for row, fut_to_poly in enumerate(opportunities):
+        outcomes = fut_to_poly.futuur_to_poly_outcomes
+        futuur = np.array(
+            futuur_prices.outcome_probabilities(
+                o.futuur_outcome.get("id") for o in outcomes
+            ),
+            dtype=float,
+        )
+        poly = np.array([o.poly_outcome.get("price") for o in outcomes], dtype=float)
+        on_futuur = ~(poly < futuur) & ~np.isnan(futuur)
+        prices = np.where(on_futuur, futuur, poly)
+        if np.isnan(prices).any():
+            continue
+        stakes = leg_stakes(prices)
+        average = np.full(stakes.shape, np.nan)
+        for leg, outcome in enumerate(outcomes):
+            try:
+                if on_futuur[leg]:
+                    average[leg] = impact_model.simulate(
+                        [outcome.futuur_outcome.get("id")],
+                        [prices[leg]],
+                        [stakes[leg]],
+                        currency="USDC",
+                    ).average_price[0]
+                else:
+                    with span("order_book", venue="polymarket"):
+                        book = poli_client.get_order_book(
+                            outcome.poly_outcome.get("token_id")
+                        )
+                    average[leg] = book_average_price(_ask_levels(book), stakes[leg])
+            except Exception as e:
+                print(
+                    f"Failed to price the depth of {fut_to_poly.futuur_question_id}: {e!r}"
+                )
+                break
+        agg_values[row] = average.sum(axis=0)
+    return executable_size(STAKE_LADDER, agg_values, ARBITRAGE_THRESHOLD)
+
+
 # FOCUSING MOSTLY ON YESSES AND NOs ATM
-def run_main():
+def run_main(
+    recorder: PriceRecorder | None = None,
+    registry: MatchRegistry | None = None,
+    changes: ChangeTracker | None = None,
+    risk: RiskEngine | None = None,
+    stream: OpportunityStream | None = None,
+):
 
     # TODO
     # 1. Put futuur URLs and maifold URLs on markets.json
     # 2. Iterate all URLs and get the markets
     # 3. for reach polyfold market try and get matching outcome with futuur based on a diff algorithm or something.
 
-    poli_client = ClobClient(
+    poli_client = clob_client(
         settings.POLYMARKET_HOST,
         key=settings.POLYMARKET_KEY,
         chain_id=settings.POLYMARKET_CHAIN_ID,
     )
 
-    data = load_markets()
+    registry = registry or MatchRegistry()
+    data = load_markets(registry)
     print(data)
     poly_url_list = [item["poly"] for item in data]
 
@@ -99,7 +198,8 @@ def run_main():
 
     for url in poly_url_list:
         try:
-            res_poli = requests.request(method="GET", url=url)
+            with span("call_api", venue="polymarket_web", method="GET"):
+                res_poli = get_transport().request("polymarket_web", "GET", url)
             matches = re.findall(
                 r'"conditionId":"(0x[a-fA-F0-9]{64})', res_poli.text, re.DOTALL
             )
@@ -116,7 +216,12 @@ def run_main():
     # As of now we're only supporting poly simple markets. Some are more complicated, the ones with many choices. We're focusing on A or B type of bets. In the future we can have some code that identifies which is which and loops over multiple condition IDs if that's the case
     for poly_url_conditions in poly_url_conditions_list:
         for condition in poly_url_conditions.condition_ids:
-            res = poli_client.get_market(condition_id=condition)
+            with span(
+                "call_api", venue="polymarket", method="GET", endpoint="markets/:id"
+            ):
+                res = poli_client.get_market(condition_id=condition)
+            if recorder:
+                recorder.record_polymarket_market(res)
             poly_url_market_list.append(
                 PolyUrlToMarkets(
                     url=poly_url_conditions.url, market=res, condition_id=condition
@@ -128,17 +233,29 @@ def run_main():
 
     futuur_payload_to_poly_conditions: List[FutuurPayloadToPolyConditions] = []
 
-    futuur_api = FutuurAPI(settings.FUTUUR_PUBLIC_KEY, settings.FUTUUR_PRIVATE_KEY)
+    futuur_api = FutuurAPI(
+        settings.FUTUUR_PUBLIC_KEY,
+        settings.FUTUUR_PRIVATE_KEY,
+        base_url=settings.FUTUUR_BASE_URL,
+    )
 
     for poly_url_market in poly_url_market_list:
 
         for item in data:
             if item["poly"] == poly_url_market.url:
                 res = futuur_api.get_market(item["futuur"])
+                if recorder:
+                    recorder.record_futuur_market(res)
 
                 futuur_payload_to_poly_conditions.append(
                     FutuurPayloadToPolyConditions(
-                        futuur_payload=res, poly_markets=poly_url_market.market
+                        futuur_payload=res,
+                        poly_markets=poly_url_market.market,
+                        registry_match=registry.get(
+                            item["futuur"],
+                            POLYMARKET,
+                            item.get("poly_condition_id") or item["poly"],
+                        ),
                     )
                 )
 
@@ -150,93 +267,235 @@ def run_main():
         futuur_to_poly_markets=[]
     )
 
-    vectorizer = TfidfVectorizer()
+    changes = changes or ChangeTracker(settings.ANALYSIS_CACHE_PATH)
+    fingerprints = {}
     for match in futuur_payload_to_poly_conditions:
 
         market = FutuurToPolyMarket(
             futuur_to_poly_outcomes=[],
             futuur_question_id=match.futuur_payload.get("id"),
+            poly_condition_id=match.poly_markets.get("condition_id"),
+            category=futuur_category(match.futuur_payload),
+            close_ms=latest_close_ms(
+                match.futuur_payload.get("bet_end_date"),
+                match.poly_markets.get("end_date_iso"),
+            ),
         )
 
+        # Neither market changed since the last run: reuse the outcome pairs and agg_value computed then
+        change_key = f"{market.futuur_question_id}:{market.poly_condition_id}"
+        fingerprint = pair_fingerprint(
+            market_fingerprint(FUTUUR, match.futuur_payload),
+            market_fingerprint(POLYMARKET, match.poly_markets),
+        )
+        cached = changes.get(change_key, fingerprint)
+        if cached:
+            market.futuur_to_poly_outcomes = [
+                FutuurOutcomeToPolyOutcome(**outcome) for outcome in cached["outcomes"]
+            ]
+            market.agg_value = cached["agg_value"]
+            market.changed = False
+            futuur_outcomes_to_poly_outcomes.futuur_to_poly_markets.append(market)
+            continue
+        fingerprints[id(market)] = (change_key, fingerprint)
+
         futuur_outcomes = match.futuur_payload.get("outcomes")
         poly_tokens = match.poly_markets.get("tokens")
         print("@@match.poly_markets: ", match.poly_markets)
         condition_id = match.poly_markets.get("condition_id")
+        poly_outcomes = [token.get("outcome") for token in poly_tokens]
 
-        for futuur_outcome in futuur_outcomes:
-            poly_outcomes = [token.get("outcome") for token in poly_tokens]
-
-            # Create a TF-IDF Vectorizer
-            vectorizer = TfidfVectorizer()
-
-            # Combine the target string with the list of strings to compare
-            texts = [futuur_outcome.get("title")] + poly_outcomes
-
-            # Transform strings into TF-IDF vectors
-            tfidf_matrix = vectorizer.fit_transform(texts)
-
-            # Compute cosine similarity (comparing 'a' with each string in 'b')
-            similarity_scores = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:])
-
-            # Find the index of the most similar string in the list 'b'
-            most_similar_index = similarity_scores[0].argmax()
-            # print(
-            #     f"The string most similar to '{futuur_outcome.get('title')}' is '{poly_outcomes[most_similar_index]}' at index {most_similar_index} with a cosine similarity score of {similarity_scores[0, most_similar_index]}."
-            # )
-
-            # ignore low similary. <0.1
-            poly_outcome = {}
-            if similarity_scores[0, most_similar_index] > 0.1:
-                for token in poly_tokens:
-                    if token.get("outcome") == poly_outcomes[most_similar_index]:
-                        poly_outcome = {"condition_id": condition_id, **token}
-
-            market.futuur_to_poly_outcomes.append(
-                FutuurOutcomeToPolyOutcome(
-                    futuur_outcome=futuur_outcome, poly_outcome=poly_outcome
+        # Reuse the outcome mapping of the registry unless a side changed since it was verified
+        futuur_hash = content_hash(
+            match.futuur_payload.get("title"), [o.get("title") for o in futuur_outcomes]
+        )
+        poly_hash = content_hash(match.poly_markets.get("question"), poly_outcomes)
+        outcome_map = None
+        if match.registry_match and not registry.needs_rematch(
+            match.registry_match, futuur_hash, poly_hash
+        ):
+            outcome_map = registry.outcome_map(match.registry_match.id)
+        rematched = outcome_map is None
+        if rematched:
+            outcome_map = {}
+        tokens_by_id = {token.get("token_id"): token for token in poly_tokens}
+
+        with span("match_batch", venue="polymarket"):
+            for futuur_outcome in futuur_outcomes:
+                poly_outcome = {}
+                if rematched:
+                    # ignore low similary. <0.1
+                    most_similar_index, similarity = best_outcome_match(
+                        futuur_outcome.get("title"), poly_outcomes
+                    )
+                    token = (
+                        poly_tokens[most_similar_index]
+                        if most_similar_index is not None
+                        else None
+                    )
+                    outcome_map[futuur_outcome.get("id")] = (
+                        token.get("token_id") if token else None,
+                        similarity,
+                    )
+                else:
+                    token_id, _ = outcome_map.get(futuur_outcome.get("id"), (None, 0))
+                    token = tokens_by_id.get(token_id)
+                if token:
+                    poly_outcome = {"condition_id": condition_id, **token}
+
+                market.futuur_to_poly_outcomes.append(
+                    FutuurOutcomeToPolyOutcome(
+                        futuur_outcome=futuur_outcome, poly_outcome=poly_outcome
+                    )
                 )
-            )
         futuur_outcomes_to_poly_outcomes.futuur_to_poly_markets.append(market)
+        if rematched and match.registry_match:
+            registry.save_outcome_map(
+                match.registry_match.id, outcome_map, futuur_hash, poly_hash
+            )
 
+    # Real money Futuur prices, packed once for every fetched market, compared against Polymarket USDC prices
+    futuur_prices = FutuurPriceTable(
+        match.futuur_payload for match in futuur_payload_to_poly_conditions
+    )
     for fut_to_poly in futuur_outcomes_to_poly_outcomes.futuur_to_poly_markets:
-        agg_value = 0
-        for single_outcome_match in fut_to_poly.futuur_to_poly_outcomes:
-
-            agg_value += min(
-                single_outcome_match.futuur_outcome.get("price").get("BTC") or 1,
-                single_outcome_match.poly_outcome.get("price") or 1,
+        if not fut_to_poly.changed:
+            continue
+        with span("arbitrage_evaluation", venue="polymarket"):
+            fut_to_poly.agg_value = float(
+                aggregate_value(
+                    futuur_prices.outcome_probabilities(
+                        single_outcome_match.futuur_outcome.get("id")
+                        for single_outcome_match in fut_to_poly.futuur_to_poly_outcomes
+                    ),
+                    [
+                        single_outcome_match.poly_outcome.get("price")
+                        for single_outcome_match in fut_to_poly.futuur_to_poly_outcomes
+                    ],
+                    missing=np.nan,
+                )
             )
-
-        fut_to_poly.agg_value = agg_value
+        change_key, fingerprint = fingerprints[id(fut_to_poly)]
+        changes.put(
+            change_key,
+            fingerprint,
+            {
+                "outcomes": [asdict(o) for o in fut_to_poly.futuur_to_poly_outcomes],
+                "agg_value": fut_to_poly.agg_value,
+            },
+        )
+    changes.save()
 
     # print("MATCHED OUTCOMES BY THE END: ", futuur_outcomes_to_poly_outcomes)
 
-    limit = 50  # USDC
+    rates = RateCache(futuur_api, ttl=settings.FUTUUR_RATES_TTL)
+    # The engine follows the ledger: new bets are filled into it and settled ones released, so an engine passed in
+    # from an earlier run stays current, and every check below is answered in memory
+    risk = risk or RiskEngine(rates=rates)
+    with SettlementTracker(
+        futuur_api=futuur_api, poly_client=poli_client, risk=risk
+    ) as tracker:
+        tracker.sync_futuur_positions()
+        tracker.poll()
     print(futuur_outcomes_to_poly_outcomes)
 
-    for fut_to_poly in futuur_outcomes_to_poly_outcomes.futuur_to_poly_markets:
-        agg_amount_bet_on_futuur = 0.0
-        if fut_to_poly.agg_value < 0.97:
-            bets_response = futuur_api.get_betting_list(
-                active=True,
-                currency_mode="real_money",
-                question=fut_to_poly.futuur_question_id,
-            )
-            for bet in bets_response.get("results"):
-                active_purchases = bet.get("active_purchases")
-                for active_pur in active_purchases:
-                    if active_pur.get("currency") == "USDC":
-                        agg_amount_bet_on_futuur += active_pur.get("amount")
+    opportunities = [
+        fut_to_poly
+        for fut_to_poly in futuur_outcomes_to_poly_outcomes.futuur_to_poly_markets
+        if is_opportunity(fut_to_poly.agg_value)
+    ]
+    for fut_to_poly in opportunities:
+        risk.set_category(FUTUUR, fut_to_poly.futuur_question_id, fut_to_poly.category)
+        risk.set_category(
+            POLYMARKET, fut_to_poly.poly_condition_id, fut_to_poly.category
+        )
+        fut_to_poly.agg_amount_bet_on_futuur = risk.exposure(
+            FUTUUR, fut_to_poly.futuur_question_id
+        )
+        # Both legs are bought, so the pair is limited by the tighter of the two
+        fut_to_poly.stake_usdc = min(
+            risk.check(
+                FUTUUR,
+                fut_to_poly.futuur_question_id,
+                risk.limits.market or np.inf,
+            ).headroom,
+            risk.check(
+                POLYMARKET,
+                fut_to_poly.poly_condition_id,
+                risk.limits.market or np.inf,
+            ).headroom,
+        )
+
+    # Risk headroom and order book depth both cap what each opportunity can take
+    depth = executable_sizes(
+        opportunities, futuur_prices, poli_client, FutuurImpactModel(futuur_api)
+    )
+    for fut_to_poly, size in zip(opportunities, depth):
+        fut_to_poly.stake_usdc = min(fut_to_poly.stake_usdc, float(size))
 
-            # TODO do the same for condition id to update agg amount bet
+    # Every pair stakes on both venues, so the shared limits are split between its two legs
+    categories = sorted(
+        {o.category for o in opportunities if o.category is not None}, key=str
+    )
+    with span("capital_allocation"):
+        ranking = rank(
+            [o.agg_value for o in opportunities],
+            [o.close_ms for o in opportunities],
+            [o.stake_usdc for o in opportunities],
+            budget=min(
+                settings.SCAN_BUDGET_USDC or np.inf,
+                risk.headroom() / 2,
+                risk.headroom(FUTUUR),
+                risk.headroom(POLYMARKET),
+            ),
+            fees=venue_fees([(FUTUUR, POLYMARKET)] * len(opportunities)),
+            method=settings.RANKING_METHOD,
+            groups=[
+                [i for i, o in enumerate(opportunities) if o.category == category]
+                for category in categories
+            ],
+            group_limits=[
+                risk.headroom(category=category) / 2 for category in categories
+            ],
+        )
 
-            fut_to_poly.agg_amount_bet_on_futuur = agg_amount_bet_on_futuur
+    owns_stream = stream is None
+    stream = stream or OpportunityStream(
+        sinks_from_settings(), state_path=settings.ALERT_STATE_PATH
+    )
+    events = []
+    for i in ranking.order:
+        fut_to_poly = opportunities[i]
+        fut_to_poly.allocation_usdc = float(ranking.allocation[i])
+        fut_to_poly.annualized_return = float(ranking.annualized_return[i])
+
+        outcomes = fut_to_poly.futuur_to_poly_outcomes
+        futuur_probabilities = futuur_prices.outcome_probabilities(
+            o.futuur_outcome.get("id") for o in outcomes
+        )
+        event = OpportunityEvent(
+            venue=POLYMARKET,
+            futuur_id=fut_to_poly.futuur_question_id,
+            market_id=fut_to_poly.poly_condition_id,
+            outcomes=[
+                [o.futuur_outcome.get("title"), p, o.poly_outcome.get("price")]
+                for o, p in zip(outcomes, futuur_probabilities)
+            ],
+            agg_value=fut_to_poly.agg_value,
+            stake=fut_to_poly.allocation_usdc,
+            annualized_return=fut_to_poly.annualized_return,
+        )
+        events.append(event)
+        stream.publish(event)
 
-            # if currency == 'USDC':
-            #     print("@bet: ", bet)
+        # if currency == 'USDC':
+        #     print("@bet: ", bet)
+    if owns_stream:
+        # Every Polymarket pair was scanned, those missing are reported again when they come back
+        stream.retain(events, venues=[POLYMARKET])
+        stream.close()
 
     # TODO now that we have the agg price we need to iterate and hit the APIs to determine if we can make money or not. Simulate 1 dollar, then doubling. 1, 2, 4, 8....
-    # TODO lastly we need to check current active bets to see if we're under the threshold to actually bet.
 
     # requests.request(
     #         method="GET", url=endpoint, headers=headers, json=data if data else None
@@ -244,4 +503,9 @@ def run_main():
 
 
 if __name__ == "__main__":
-    run_main()
+    recorder = PriceRecorder()
+    try:
+        run_main(recorder=recorder)
+    finally:
+        recorder.close()
+    telemetry.export()
@@ -1,8 +1,24 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
 from urllib.parse import urlencode
 import requests
 import json
 
+from instrumentation.telemetry import (
+    PARSE_ERRORS,
+    REQUESTS,
+    RESPONSE_BYTES,
+    endpoint_label,
+    incr,
+    span,
+    telemetry,
+)
+from transport.record_replay import get_transport
+
+BASE_URL = "https://api.manifold.markets/v0/"
+# Concurrent requests used by get_markets_by_ids, also the size of the keep-alive connection pool
+MAX_CONCURRENT_REQUESTS = 8
+
 
 class ManifoldAPI:
     """
@@ -10,6 +26,8 @@ class ManifoldAPI:
 
     Attributes:
         base_url (str): The base URL for the API endpoints.
+        api_key (str): The Manifold API key, required to bet and to cancel limit orders.
+        session (requests.Session): Keep-alive connections shared by every call.
 
     """
 
@@ -17,14 +35,29 @@ class ManifoldAPI:
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
-            cls._instance = super().__new__(cls, *args, **kwargs)
+            cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, base_url=None, api_key=None):
         """
-        Initializes the FutuurAPI instance.
+        Initializes the ManifoldAPI instance. Every construction returns the same instance, so only the arguments
+        actually given replace its settings: a later ManifoldAPI() does not drop the key of the first one.
+
+        Args:
+            base_url (str, optional): Overrides the API base URL, e.g. to point at the local mock venue server.
+            api_key (str, optional): The Manifold API key. Only needed for authenticated endpoints.
         """
-        self.base_url = "https://api.manifold.markets/v0/"
+        if base_url is not None or getattr(self, "base_url", None) is None:
+            self.base_url = base_url or BASE_URL
+        if api_key is not None or not hasattr(self, "api_key"):
+            self.api_key = api_key
+        if getattr(self, "session", None) is None:
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=MAX_CONCURRENT_REQUESTS
+            )
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
 
     def call_api(
         self,
@@ -32,11 +65,12 @@ class ManifoldAPI:
         params: dict | None = None,
         payload: dict | None = None,
         method: str = "GET",
+        auth: bool = False,
     ) -> dict:
 
         url = self.base_url + endpoint
 
-        url_params = "?" + urlencode(params) if params else ""
+        url_params = "?" + urlencode(params, doseq=True) if params else ""
 
         request_kwargs = {
             "method": method,
@@ -45,11 +79,28 @@ class ManifoldAPI:
         if method.upper() == "POST" and payload is not None:
             # For POST requests, include the payload as JSON in the body of the request
             request_kwargs["json"] = payload
-
-        response = requests.request(**request_kwargs)
+        if auth:
+            if not self.api_key:
+                raise ValueError(f"A Manifold API key is required for {endpoint}")
+            request_kwargs["headers"] = {"Authorization": f"Key {self.api_key}"}
+
+        endpoint_name = endpoint_label(endpoint)
+        with span("call_api", venue="manifold", method=method, endpoint=endpoint_name):
+            response = get_transport().request(
+                "manifold", session=self.session, **request_kwargs
+            )
+        if telemetry.enabled:
+            incr(
+                REQUESTS,
+                venue="manifold",
+                endpoint=endpoint_name,
+                status=response.status_code,
+            )
+            incr(RESPONSE_BYTES, len(response.content), venue="manifold")
         try:
             return response.json()
         except ValueError:
+            incr(PARSE_ERRORS, venue="manifold", endpoint=endpoint_name)
             response = {
                 "error": "Failed to parse JSON response",
                 "status_code": response.status_code,
@@ -83,8 +134,211 @@ class ManifoldAPI:
         """
         return self.call_api(f"slug/{slug}/", method="GET")
 
-    def list_all_markets(self):
-        pass
+    def get_markets_by_ids(
+        self, market_ids: Iterable[str], max_workers=MAX_CONCURRENT_REQUESTS
+    ) -> Dict[str, dict]:
+        """
+        Fetches many markets at once. Manifold has no multi-market endpoint, so duplicate ids are dropped and the
+        lookups run concurrently over the session's keep-alive connections.
+
+        Args:
+            market_ids (iterable): The IDs of the markets to fetch.
+            max_workers (int): How many lookups run at the same time. Default is 8.
+
+        Returns:
+            dict: The market of each id. Markets that failed to load hold the error response.
+        """
+        unique_ids = list(dict.fromkeys(market_ids))
+        if len(unique_ids) <= 1 or max_workers <= 1:
+            return {
+                market_id: self.get_market_by_id(market_id) for market_id in unique_ids
+            }
+        with span("market_batch", venue="manifold"):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                markets = list(executor.map(self.get_market_by_id, unique_ids))
+        return dict(zip(unique_ids, markets))
+
+    def get_me(self) -> dict:
+        """
+        Fetches the user owning the API key, including its id and mana balance.
+        """
+        return self.call_api("me", method="GET", auth=True)
+
+    def place_bet(
+        self,
+        market_id: str,
+        amount: float,
+        outcome: str = "YES",
+        limit_prob: Optional[float] = None,
+        expires_at: Optional[int] = None,
+        answer_id: Optional[str] = None,
+        dry_run: bool = False,
+    ) -> dict:
+        """
+        Places a bet. Without limit_prob it is a market order; with it, whatever does not fill immediately stays
+        on the book as a limit order.
+
+        Args:
+            market_id (str): The ID of the market.
+            amount (float): The mana to spend.
+            outcome (str): 'YES' or 'NO'. Default is 'YES'.
+            limit_prob (float, optional): The limit probability, between 0.01 and 0.99.
+            expires_at (int, optional): When an unfilled limit order is cancelled, in milliseconds since epoch.
+            answer_id (str, optional): The answer to bet on, for multiple choice markets.
+            dry_run (bool): Only simulate the bet and return the would-be fills. Default is False.
+
+        Returns:
+            dict: The placed bet, including its fills and whether it is filled.
+        """
+        payload = {"contractId": market_id, "amount": amount, "outcome": outcome}
+        optional = {
+            "limitProb": limit_prob,
+            "expiresAt": expires_at,
+            "answerId": answer_id,
+            "dryRun": dry_run or None,
+        }
+        payload.update({k: v for k, v in optional.items() if v is not None})
+        return self.call_api("bet", payload=payload, method="POST", auth=True)
+
+    def place_limit_order(
+        self,
+        market_id: str,
+        amount: float,
+        limit_prob: float,
+        outcome: str = "YES",
+        expires_at: Optional[int] = None,
+        answer_id: Optional[str] = None,
+    ) -> dict:
+        """
+        Places a limit order at limit_prob. See place_bet.
+        """
+        return self.place_bet(
+            market_id,
+            amount,
+            outcome=outcome,
+            limit_prob=limit_prob,
+            expires_at=expires_at,
+            answer_id=answer_id,
+        )
+
+    def cancel_bet(self, bet_id: str) -> dict:
+        """
+        Cancels the unfilled part of a limit order.
+        """
+        return self.call_api(f"bet/cancel/{bet_id}", method="POST", auth=True)
+
+    def get_bets(
+        self,
+        market_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        kinds: Optional[str] = None,
+        limit: int = 1000,
+        before: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Lists bets, newest first.
+
+        Args:
+            market_id (str, optional): Only bets on this market.
+            user_id (str, optional): Only bets of this user.
+            kinds (str, optional): 'open-limit' for the unfilled, uncancelled limit orders only.
+            limit (int): Number of bets to fetch. Max 1000.
+            before (str, optional): ID of a bet to fetch bets before.
+        """
+        params = {
+            "contractId": market_id,
+            "userId": user_id,
+            "kinds": kinds,
+            "limit": limit,
+            "before": before,
+        }
+        return self.call_api(
+            "bets", params={k: v for k, v in params.items() if v is not None}
+        )
+
+    def get_open_limit_orders(
+        self, market_id: Optional[str] = None, user_id: Optional[str] = None
+    ) -> List[dict]:
+        return self.get_bets(market_id=market_id, user_id=user_id, kinds="open-limit")
+
+    def get_positions(
+        self, market_id: str, user_id: Optional[str] = None, top: Optional[int] = None
+    ) -> List[dict]:
+        """
+        Fetches the positions held on a market, each with its shares per outcome, invested mana and profit.
+
+        Args:
+            market_id (str): The ID of the market.
+            user_id (str, optional): Only the position of this user.
+            top (int, optional): Only the top N positions by profit.
+        """
+        params = {"userId": user_id, "top": top}
+        return self.call_api(
+            f"market/{market_id}/positions",
+            params={k: v for k, v in params.items() if v is not None},
+        )
+
+    def search_markets(
+        self,
+        term: str = "",
+        topic_slug: Optional[str] = None,
+        sort: str = "newest",
+        limit: int = 1000,
+        offset: int = 0,
+    ) -> List[dict]:
+        """
+        Searches markets.
+        [API reference](https://docs.manifold.markets/api#get-v0search-markets)
+
+        Args:
+            term (str): The search terms. Default matches every market.
+            topic_slug (str, optional): Only markets in this group (topic).
+            sort (str): The order of the results. Default is 'newest', which keeps offset pages stable.
+            limit (int): Number of markets to fetch. Max 1000.
+            offset (int): Number of markets to skip, to page through the results.
+
+        Returns:
+            The list of markets as raw JSON. Like /markets they are LiteMarkets, without groupSlugs.
+        """
+        params = {
+            "term": term,
+            "topicSlug": topic_slug,
+            "sort": sort,
+            "limit": limit,
+            "offset": offset,
+        }
+        return self.call_api(
+            "search-markets", params={k: v for k, v in params.items() if v is not None}
+        )
+
+    def get_group_markets(self, topic_slug: str, total_limit=20_000) -> List[dict]:
+        """
+        Fetches the markets of a group, up to total_limit. /markets lists LiteMarkets, which do not say which groups
+        a market is in, so group membership comes from the search filtered by group.
+
+        Args:
+            topic_slug (str): The slug of the group.
+            total_limit (int): The maximum number of markets to fetch. Default is 20000.
+
+        Returns:
+            list: The markets of the group, newest first.
+        """
+        markets = []
+        while len(markets) < total_limit:
+            num_to_get = min(total_limit - len(markets), 1000)
+            with span("pagination_page", venue="manifold"):
+                page = self.search_markets(
+                    topic_slug=topic_slug, limit=num_to_get, offset=len(markets)
+                )
+            if not isinstance(page, list):
+                break
+            markets.extend(page)
+            if len(page) < num_to_get:
+                break
+        return markets
+
+    def list_all_markets(self) -> List[dict]:
+        return self.get_all_markets(path=None)
 
     def _get_markets(self, limit: int = 500, before: str = None) -> List[dict]:
         """Get a list of markets (not including comments or bets).
@@ -127,15 +381,13 @@ class ManifoldAPI:
             num_to_get = min(total_limit - len(markets), 500)
             if num_to_get <= 0:
                 break
-            new_markets = [
-                x
-                for x in self._get_markets(before=i, limit=num_to_get)
-                if x["createdTime"] > after
-            ]
+            with span("pagination_page", venue="manifold"):
+                new_markets = [
+                    x
+                    for x in self._get_markets(before=i, limit=num_to_get)
+                    if x["createdTime"] > after
+                ]
             markets.extend(new_markets)
-            print(f"Fetched {len(markets)} markets.")
-            print("Markets: ", len(markets))
-            # todo remove this line
             if len(new_markets) < 500:
                 break
             else:
@@ -144,11 +396,25 @@ class ManifoldAPI:
         assert len(markets) == len({m["id"] for m in markets})
         return markets
 
-    def get_all_markets(self, after: int = 0, total_limit=20_000) -> dict:
-        markets = self._get_all_markets(after=after, total_limit=20_000)
+    def get_all_markets(
+        self, after: int = 0, total_limit=20_000, path="mani_data.json"
+    ) -> List[dict]:
+        """
+        Fetches markets created after a given time, up to total_limit.
+
+        Args:
+            after (int): Only markets created after this timestamp in milliseconds are kept. Default is 0.
+            total_limit (int): The maximum number of markets to fetch. Default is 20000.
+            path (str, optional): Where to dump the markets as JSON. None skips the dump. Default is 'mani_data.json'.
+
+        Returns:
+            list: The markets sorted by 24 hour volume, highest first.
+        """
+        markets = self._get_all_markets(after=after, total_limit=total_limit)
 
         sorted_markets = sorted(markets, key=lambda x: x["volume24Hours"], reverse=True)
 
-        with open("mani_data.json", "w", encoding="utf-8") as f:
-            json.dump(sorted_markets, f, ensure_ascii=False, indent=4)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(sorted_markets, f, ensure_ascii=False, indent=4)
         return sorted_markets
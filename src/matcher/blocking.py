@@ -0,0 +1,271 @@
+import datetime
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Two markets closing further apart than this are not the same question
+CLOSE_WINDOW_MS = 45 * 24 * 3600 * 1000
+
+YEAR_PATTERN = re.compile(r"\b(19\d{2}|20\d{2})\b")
+NUMBER_PATTERN = re.compile(
+    r"(?<![\w.])\$?(\d[\d,]*(?:\.\d+)?)\s*(k|m|bn|b|%|percent)?(?![\w.])",
+    re.IGNORECASE,
+)
+NUMBER_UNITS = {"k": 1e3, "m": 1e6, "b": 1e9, "bn": 1e9}
+# Days of month, which are part of a date rather than numbers of the question
+DAY_PATTERN = re.compile(
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?\b",
+    re.IGNORECASE,
+)
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'&.-]*")
+# Words too common in market titles to tell markets apart, ignored whatever their case
+STOP_WORDS = {
+    "will",
+    "who",
+    "what",
+    "which",
+    "when",
+    "where",
+    "how",
+    "does",
+    "do",
+    "did",
+    "is",
+    "are",
+    "was",
+    "the",
+    "a",
+    "an",
+    "in",
+    "on",
+    "at",
+    "by",
+    "for",
+    "from",
+    "with",
+    "without",
+    "before",
+    "after",
+    "of",
+    "to",
+    "be",
+    "than",
+    "and",
+    "or",
+    "not",
+    "any",
+    "this",
+    "that",
+    "next",
+    "end",
+    "yes",
+    "no",
+    "other",
+    "get",
+    "hit",
+    "reach",
+    "win",
+    "lose",
+    "more",
+    "less",
+    "most",
+    "least",
+    "over",
+    "under",
+    "above",
+    "below",
+    "between",
+    "new",
+    "first",
+    "last",
+    "january",
+    "february",
+    "march",
+    "april",
+    "may",
+    "june",
+    "july",
+    "august",
+    "september",
+    "october",
+    "november",
+    "december",
+}
+
+
+def _iso_to_ms(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(
+            datetime.datetime.fromisoformat(
+                str(value).replace("Z", "+00:00")
+            ).timestamp()
+            * 1000
+        )
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class BlockingKey:
+    """
+    The structured facts of a market that two equivalent markets must agree on.
+
+    Attributes:
+        tokens (frozenset): Lower cased words of the title other than stop words, the hash index keys.
+        years (frozenset): Years named in the title.
+        numbers (frozenset): Other numbers in the title, units applied, e.g. thresholds.
+        close_ms (int, optional): When the market closes or resolves.
+    """
+
+    tokens: FrozenSet[str]
+    years: FrozenSet[int]
+    numbers: FrozenSet[float]
+    close_ms: Optional[int] = None
+
+
+def blocking_key(title: str, close=None) -> BlockingKey:
+    """
+    Extracts the blocking key of a market from its title and its close date, an ISO string or milliseconds.
+    """
+    title = title or ""
+    years = frozenset(int(year) for year in YEAR_PATTERN.findall(title))
+    numbers = set()
+    for value, unit in NUMBER_PATTERN.findall(DAY_PATTERN.sub(" ", title)):
+        number = float(value.replace(",", ""))
+        if not unit and number.is_integer() and int(number) in years:
+            continue
+        numbers.add(number * NUMBER_UNITS.get(unit.lower(), 1))
+    # Case is ignored, so a title typed in lower case gets the same tokens as its capitalized twin
+    words = (word.lower().strip(".'-") for word in WORD_PATTERN.findall(title))
+    tokens = frozenset(
+        word for word in words if len(word) > 1 and word not in STOP_WORDS
+    )
+    return BlockingKey(tokens, years, frozenset(numbers), _iso_to_ms(close))
+
+
+def compatible(a: BlockingKey, b: BlockingKey, close_window_ms=CLOSE_WINDOW_MS) -> bool:
+    """
+    Whether two markets can be the same question: their named years and numbers agree wherever both name some,
+    and they close within close_window_ms of each other when both dates are known.
+    """
+    if a.years and b.years and not a.years & b.years:
+        return False
+    if a.numbers and b.numbers and not a.numbers & b.numbers:
+        return False
+    if (
+        a.close_ms is not None
+        and b.close_ms is not None
+        and abs(a.close_ms - b.close_ms) > close_window_ms
+    ):
+        return False
+    return True
+
+
+class BlockingIndex:
+    """
+    Indexes the markets of one venue so that each market of another venue is only compared with the markets it
+    could be equivalent to.
+
+    Hash indexes map every (token, year, number) of a title to the markets naming them, None standing for "names
+    no year" or "names no number", so markets about other years or thresholds are never even looked at. A sorted
+    close time array serves close date windows. Candidates share a token, agree on their years and numbers, and
+    close within the window.
+
+    Blocking is on every title token rather than on named entities only: no entity recognizer has to spot the
+    subject of a title, so no pair is missed for an unrecognized name or a title typed in lower case, at the cost
+    of larger blocks for common words such as "election" or "price". Years, numbers and close dates keep those
+    blocks small.
+
+    Attributes:
+        keys (list): The blocking key of each indexed market, in input order.
+        close_window_ms (int): The largest close date difference of two candidates.
+    """
+
+    def __init__(
+        self, keys: Sequence[BlockingKey], close_window_ms: int = CLOSE_WINDOW_MS
+    ):
+        self.keys = list(keys)
+        self.close_window_ms = close_window_ms
+        # One index per combination of the query naming years and naming numbers: a query without years matches
+        # markets of any year, so its index leaves years out
+        indexes: Dict[Tuple[bool, bool], Dict[tuple, List[int]]] = {
+            (by_year, by_number): {}
+            for by_year in (False, True)
+            for by_number in (False, True)
+        }
+        for i, key in enumerate(self.keys):
+            years = key.years or (None,)
+            numbers = key.numbers or (None,)
+            for token in key.tokens:
+                for (by_year, by_number), index in indexes.items():
+                    for year in years if by_year else (None,):
+                        for number in numbers if by_number else (None,):
+                            index.setdefault((token, year, number), []).append(i)
+        self.indexes = {
+            kind: {k: np.array(v, dtype=int) for k, v in index.items()}
+            for kind, index in indexes.items()
+        }
+        # NaN for markets without a close date, which fit every window
+        self.close = np.array(
+            [np.nan if k.close_ms is None else k.close_ms for k in self.keys],
+            dtype=float,
+        )
+        dated = np.flatnonzero(~np.isnan(self.close))
+        order = np.argsort(self.close[dated], kind="stable")
+        self.close_positions = dated[order]
+        self.close_sorted = self.close[self.close_positions]
+        self.undated = np.flatnonzero(np.isnan(self.close))
+
+    def _close_window(self, close_ms: int) -> np.ndarray:
+        start = np.searchsorted(
+            self.close_sorted, close_ms - self.close_window_ms, "left"
+        )
+        end = np.searchsorted(
+            self.close_sorted, close_ms + self.close_window_ms, "right"
+        )
+        return np.concatenate([self.close_positions[start:end], self.undated])
+
+    def candidates(self, key: BlockingKey) -> np.ndarray:
+        """
+        The indexes of the markets that may be equivalent to a market with the given key, sorted.
+        """
+        empty = np.empty(0, dtype=int)
+        index = self.indexes[(bool(key.years), bool(key.numbers))]
+        years = (*key.years, None) if key.years else (None,)
+        numbers = (*key.numbers, None) if key.numbers else (None,)
+        blocks = [
+            index.get((token, year, number), empty)
+            for token in key.tokens
+            for year in years
+            for number in numbers
+        ]
+        shared = np.unique(np.concatenate(blocks)) if blocks else empty
+        if key.close_ms is not None and len(shared):
+            window = self._close_window(key.close_ms)
+            # Walk whichever of the token block and the close date window is smaller
+            if len(window) < len(shared):
+                shared = np.intersect1d(shared, window)
+            else:
+                distance = np.abs(self.close[shared] - key.close_ms)
+                shared = shared[~(distance > self.close_window_ms)]
+        return shared
+
+
+def candidate_pairs(
+    left: Sequence[BlockingKey],
+    right: Sequence[BlockingKey],
+    close_window_ms: int = CLOSE_WINDOW_MS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every (left, right) index pair sharing a block, as two aligned arrays.
+    """
+    index = BlockingIndex(right, close_window_ms)
+    columns = [index.candidates(key) for key in left]
+    rows = np.repeat(np.arange(len(left)), [len(c) for c in columns])
+    return rows, np.concatenate(columns) if columns else np.empty(0, dtype=int)
@@ -0,0 +1,307 @@
+import argparse
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import settings
+from futuur.futuur_api import FutuurAPI
+from history.price_store import now_ms
+from instrumentation.telemetry import span
+from .matcher import MarketCandidate, Matcher
+from .registry import MatchRegistry
+
+# Related market requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    futuur_id PRIMARY KEY,
+    title TEXT,
+    categories TEXT,
+    bet_end_date TEXT,
+    depth INTEGER,
+    discovered_ms INTEGER,
+    crawled_ms INTEGER,
+    matched_ms INTEGER
+);
+CREATE TABLE IF NOT EXISTS edges (
+    source NOT NULL,
+    target NOT NULL,
+    PRIMARY KEY (source, target)
+);
+CREATE INDEX IF NOT EXISTS nodes_unmatched ON nodes (matched_ms);
+"""
+
+
+def _related(response) -> List[dict]:
+    """
+    The markets of a related_markets response, which is either a list or a paginated page.
+    """
+    if isinstance(response, dict):
+        response = response.get("results") or []
+    return [market for market in response or [] if isinstance(market, dict)]
+
+
+class RelatedMarketsCrawler:
+    """
+    Grows the set of known Futuur markets by following FutuurAPI.get_related_markets breadth first.
+
+    The graph is stored in SQLite: every market ever seen is a node and every related link an edge. A node is
+    crawled at most once, so a new crawl only requests the related markets of nodes discovered since the last one,
+    and only markets never seen before are handed to the matcher.
+
+    Attributes:
+        path (str): The SQLite graph file, or ':memory:'.
+        max_workers (int): Related market requests in flight at once.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        futuur_api: Optional[FutuurAPI] = None,
+        max_workers: int = MAX_CONCURRENT_REQUESTS,
+    ):
+        """
+        Initializes the RelatedMarketsCrawler instance, creating the graph tables when needed.
+
+        Args:
+            path (str, optional): The SQLite graph file. Default is settings.RELATED_GRAPH_PATH.
+            futuur_api (FutuurAPI, optional): The Futuur client. Default client uses the settings.
+            max_workers (int): Related market requests in flight at once. Default is 8.
+        """
+        self.path = path or settings.RELATED_GRAPH_PATH
+        self.futuur_api = futuur_api or FutuurAPI(
+            settings.FUTUUR_PUBLIC_KEY,
+            settings.FUTUUR_PRIVATE_KEY,
+            base_url=settings.FUTUUR_BASE_URL,
+        )
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _fetch(self, sql: str, params=()) -> list:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def __len__(self) -> int:
+        return self._fetch("SELECT COUNT(*) FROM nodes")[0][0]
+
+    def known(self, futuur_ids: Iterable) -> set:
+        ids = list(futuur_ids)
+        known = set()
+        # SQLite limits the number of bound parameters, so look them up in chunks
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            rows = self._fetch(
+                f"SELECT futuur_id FROM nodes WHERE futuur_id IN ({', '.join('?' * len(chunk))})",
+                tuple(chunk),
+            )
+            known.update(row[0] for row in rows)
+        return known
+
+    def neighbours(self, futuur_id) -> list:
+        return [
+            row[0]
+            for row in self._fetch(
+                "SELECT target FROM edges WHERE source = ?", (futuur_id,)
+            )
+        ]
+
+    def add_seeds(self, futuur_ids: Iterable) -> int:
+        """
+        Adds markets to crawl from, e.g. the Futuur side of the matched pairs. Seeds count as already matched.
+
+        Returns:
+            int: The number of seeds that were not in the graph yet.
+        """
+        now = now_ms()
+        with self.lock, self.connection:
+            cursor = self.connection.executemany(
+                "INSERT OR IGNORE INTO nodes (futuur_id, depth, discovered_ms, matched_ms) VALUES (?, 0, ?, ?)",
+                [(futuur_id, now, now) for futuur_id in futuur_ids],
+            )
+        return cursor.rowcount
+
+    def crawl(self, max_depth: int = 2, max_nodes: Optional[int] = None) -> List[dict]:
+        """
+        Crawls, level by level, every node that was never crawled and is at most max_depth links away from a seed.
+
+        Args:
+            max_depth (int): How far from the seeds to go. Default is 2.
+            max_nodes (int, optional): Stop crawling deeper once this many new markets were found.
+
+        Returns:
+            list: The payloads of the markets discovered by this crawl.
+        """
+        discovered, attempted = [], set()
+        while max_nodes is None or len(discovered) < max_nodes:
+            frontier = [
+                (futuur_id, depth)
+                for futuur_id, depth in self._fetch(
+                    "SELECT futuur_id, depth FROM nodes WHERE crawled_ms IS NULL AND depth < ? ORDER BY depth",
+                    (max_depth,),
+                )
+                if futuur_id not in attempted
+            ]
+            if not frontier:
+                break
+            attempted.update(futuur_id for futuur_id, _ in frontier)
+            with span("crawl_level", venue="futuur"):
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    responses = list(
+                        executor.map(
+                            self._get_related, [futuur_id for futuur_id, _ in frontier]
+                        )
+                    )
+            for (futuur_id, depth), related in zip(frontier, responses):
+                discovered.extend(self._store(futuur_id, depth, related))
+        return discovered
+
+    def _get_related(self, futuur_id) -> Optional[List[dict]]:
+        try:
+            return _related(self.futuur_api.get_related_markets(futuur_id))
+        except Exception as e:
+            print(f"Failed to fetch the markets related to {futuur_id}: {e!r}")
+            return None
+
+    def _store(
+        self, futuur_id, depth: int, related: Optional[List[dict]]
+    ) -> List[dict]:
+        """
+        Records the edges of a crawled node and returns its related markets that are new to the graph.
+        """
+        if related is None:
+            # Left uncrawled so the next crawl retries it
+            return []
+        now = now_ms()
+        related = list(
+            {m["id"]: m for m in related if m.get("id") is not None}.values()
+        )
+        known = self.known(m["id"] for m in related)
+        new = [market for market in related if market["id"] not in known]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO nodes (futuur_id, title, categories, bet_end_date, depth, discovered_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        m["id"],
+                        m.get("title"),
+                        json.dumps([c.get("id") for c in m.get("categories") or []]),
+                        m.get("bet_end_date"),
+                        depth + 1,
+                        now,
+                    )
+                    for m in new
+                ],
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO edges (source, target) VALUES (?, ?)",
+                [(futuur_id, m["id"]) for m in related],
+            )
+            self.connection.execute(
+                "UPDATE nodes SET crawled_ms = ? WHERE futuur_id = ?", (now, futuur_id)
+            )
+        return new
+
+    def unmatched(self) -> List[dict]:
+        """
+        The discovered markets not handed to the matcher yet, with the id, title, categories and close date of their
+        payload.
+        """
+        return [
+            {
+                "id": futuur_id,
+                "title": title,
+                "categories": [{"id": c} for c in json.loads(categories or "[]")],
+                "bet_end_date": bet_end_date,
+            }
+            for futuur_id, title, categories, bet_end_date in self._fetch(
+                "SELECT futuur_id, title, categories, bet_end_date FROM nodes WHERE matched_ms IS NULL"
+            )
+        ]
+
+    def mark_matched(self, futuur_ids: Iterable):
+        now = now_ms()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "UPDATE nodes SET matched_ms = ? WHERE futuur_id = ?",
+                [(now, futuur_id) for futuur_id in futuur_ids],
+            )
+
+
+def expand(
+    crawler: RelatedMarketsCrawler,
+    registry: MatchRegistry,
+    matcher: Optional[Matcher] = None,
+    categories_path="categories.json",
+    max_depth: int = 2,
+    max_nodes: Optional[int] = None,
+    manifold_limit=20_000,
+    polymarket_limit=3000,
+) -> List[MarketCandidate]:
+    """
+    Crawls from the Futuur markets of the registry and matches only the markets the matcher has not seen yet,
+    storing the candidates in the registry.
+
+    Returns:
+        list: The new candidate matches.
+    """
+    crawler.add_seeds({match.futuur_id for match in registry.matches()})
+    discovered = crawler.crawl(max_depth=max_depth, max_nodes=max_nodes)
+    # Also markets discovered by an earlier crawl whose matching did not complete
+    unmatched = crawler.unmatched()
+    print(f"{len(discovered)} new markets, {len(crawler)} known")
+    if not unmatched:
+        return []
+
+    matcher = matcher or Matcher()
+    partitions = matcher.fetch_partitions(
+        matcher.load_categories_from_json(categories_path),
+        manifold_limit=manifold_limit,
+        polymarket_limit=polymarket_limit,
+        futuur_markets=unmatched,
+    )
+    candidates = matcher.match_partitions(partitions)
+    for c in candidates:
+        registry.upsert(c.futuur_id, c.venue, c.market_id, confidence=c.similarity)
+    crawler.mark_matched(market["id"] for market in unmatched)
+    return candidates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Discover markets related to the matched pairs and match the new ones."
+    )
+    parser.add_argument("--graph", help="The related markets graph database")
+    parser.add_argument("--registry", help="The match registry database")
+    parser.add_argument("--categories", default="categories.json")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--max-nodes", type=int, default=None)
+    args = parser.parse_args()
+
+    with RelatedMarketsCrawler(args.graph) as graph, MatchRegistry(
+        args.registry
+    ) as match_registry:
+        new_candidates = expand(
+            graph,
+            match_registry,
+            categories_path=args.categories,
+            max_depth=args.depth,
+            max_nodes=args.max_nodes,
+        )
+        print(f"{len(new_candidates)} new candidate matches")
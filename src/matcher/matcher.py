@@ -1,38 +1,376 @@
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
 import settings
 from futuur.futuur_api import FutuurAPI
+from history.recorder import MANIFOLD, POLYMARKET
+from instrumentation.telemetry import span
 from manifold.manifold_api import ManifoldAPI
+from polymarket.polymarket_api import PolymarketAPI
+from .blocking import blocking_key, candidate_pairs
+from .registry import MatchRegistry
+
+# Market titles are longer than outcome titles, so a higher similarity is required than for outcomes
+MIN_MARKET_SIMILARITY = 0.5
+
+# Candidate pairs scored at once by match_titles
+SCORE_CHUNK = 500_000
+
+# (market id, title, close date) tuples, which is all a matcher process needs. The close date is an ISO string or
+# milliseconds, and may be left out.
+Titles = List[Tuple]
+
+
+def _unique(markets: Iterable[tuple]) -> Titles:
+    """
+    The (id, title, close) markets with each id once, first seen kept.
+    """
+    unique = {}
+    for market in markets:
+        unique.setdefault(market[0], market)
+    return list(unique.values())
+
+
+@dataclass
+class CategoryPartition:
+    """
+    The markets of one Futuur category together with the markets of the equivalent Manifold groups and Polymarket
+    tags. Markets are only ever compared within a partition.
+    """
+
+    title: str
+    futuur_id: int
+    futuur_markets: Titles = field(default_factory=list)
+    manifold_markets: Titles = field(default_factory=list)
+    polymarket_markets: Titles = field(default_factory=list)
+
+
+@dataclass
+class MarketCandidate:
+    futuur_id: int
+    futuur_title: str
+    venue: str
+    market_id: str
+    title: str
+    similarity: float
+
+    def to_entry(self) -> dict:
+        """
+        The candidate as a markets.json entry.
+        """
+        key = "mani" if self.venue == MANIFOLD else "poly_condition_id"
+        return {"futuur": self.futuur_id, key: self.market_id, "title": self.title}
+
+
+def _keys(markets: Titles):
+    return [blocking_key(m[1], m[2] if len(m) > 2 else None) for m in markets]
+
+
+def match_titles(
+    futuur_markets: Titles,
+    other_markets: Titles,
+    venue: str,
+    min_similarity=MIN_MARKET_SIMILARITY,
+    blocking=True,
+) -> List[MarketCandidate]:
+    """
+    Matches every Futuur market with the most similar market title of the other venue, using TF-IDF cosine
+    similarity over the titles of both sides.
+
+    Args:
+        blocking (bool): Only score the pairs sharing a block, see matcher.blocking: a title token, close dates in the
+            same window and the same years and numbers. When False every pair is scored. Default is True.
+
+    Returns:
+        list: One candidate per Futuur market whose best match scores above min_similarity.
+    """
+    if not futuur_markets or not other_markets:
+        return []
+    vectorizer = TfidfVectorizer()
+    try:
+        tfidf_matrix = vectorizer.fit_transform(
+            [m[1] for m in futuur_markets] + [m[1] for m in other_markets]
+        )
+    except ValueError:
+        # Every title is made of stop words or punctuation only
+        return []
+    futuur_tfidf = tfidf_matrix[: len(futuur_markets)]
+    other_tfidf = tfidf_matrix[len(futuur_markets) :]
+
+    if blocking:
+        rows, columns = candidate_pairs(_keys(futuur_markets), _keys(other_markets))
+        if not len(rows):
+            return []
+        # Rows are L2 normalized, so the cosine similarity of a pair is the dot product of its rows. Pairs are
+        # scored in chunks to bound the memory of the gathered rows.
+        scores = np.concatenate(
+            [
+                np.asarray(
+                    futuur_tfidf[rows[start : start + SCORE_CHUNK]]
+                    .multiply(other_tfidf[columns[start : start + SCORE_CHUNK]])
+                    .sum(axis=1)
+                ).ravel()
+                for start in range(0, len(rows), SCORE_CHUNK)
+            ]
+        )
+        order = np.lexsort((-scores, rows))
+        _, first = np.unique(rows[order], return_index=True)
+        best = {
+            int(rows[order[i]]): (int(columns[order[i]]), float(scores[order[i]]))
+            for i in first
+        }
+    else:
+        similarity = cosine_similarity(futuur_tfidf, other_tfidf)
+        best = {
+            row: (int(column), float(similarity[row, column]))
+            for row, column in enumerate(similarity.argmax(axis=1))
+        }
+
+    candidates = []
+    for row, (column, score) in sorted(best.items()):
+        if score > min_similarity:
+            futuur_market, market = futuur_markets[row], other_markets[column]
+            candidates.append(
+                MarketCandidate(
+                    futuur_market[0],
+                    futuur_market[1],
+                    venue,
+                    market[0],
+                    market[1],
+                    score,
+                )
+            )
+    return candidates
+
+
+def match_partition(
+    partition: CategoryPartition, min_similarity=MIN_MARKET_SIMILARITY
+) -> List[MarketCandidate]:
+    """
+    Matches the Futuur markets of a partition against its Manifold and Polymarket markets. Runs in a worker process.
+    """
+    with span("match_batch", venue="partition", category=partition.title):
+        return match_titles(
+            partition.futuur_markets,
+            partition.manifold_markets,
+            MANIFOLD,
+            min_similarity,
+        ) + match_titles(
+            partition.futuur_markets,
+            partition.polymarket_markets,
+            POLYMARKET,
+            min_similarity,
+        )
 
 
 class Matcher:
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         """
-        Initializes the Analizer that will determine if there are or not arbitrage oportunities
+        Initializes the Matcher, which looks for equivalent markets across venues, one category at a time.
+
+        Args:
+            max_workers (int, optional): Threads used to fetch categories and processes used to match partitions.
+                Default lets the executors pick from the number of cores.
         """
-        self.manifold_api = ManifoldAPI()
+        self.max_workers = max_workers
+        self.manifold_api = ManifoldAPI(
+            base_url=settings.MANIFOLD_BASE_URL, api_key=settings.MANIFOLD_API_KEY
+        )
         self.futuur_api = FutuurAPI(
-            settings.FUTUUR_PUBLIC_KEY, settings.FUTUUR_PRIVATE_KEY
+            settings.FUTUUR_PUBLIC_KEY,
+            settings.FUTUUR_PRIVATE_KEY,
+            base_url=settings.FUTUUR_BASE_URL,
+        )
+        self.polymarket_api = PolymarketAPI(
+            host=settings.POLYMARKET_HOST,
+            key=settings.POLYMARKET_KEY,
+            chain_id=settings.POLYMARKET_CHAIN_ID,
+        )
+
+    def navigate_futuur(
+        self,
+        categories_path="categories.json",
+        output_path: Optional[str] = "matched_markets.json",
+        manifold_limit=20_000,
+        polymarket_limit=3000,
+        registry: Optional[MatchRegistry] = None,
+    ) -> List[MarketCandidate]:
+        """
+        Fetches every category of categories.json, partitions the other venues by the equivalent Manifold groups and
+        Polymarket tags, and matches each partition in its own process.
+
+        Args:
+            categories_path (str): The categories file. Default is 'categories.json'.
+            output_path (str, optional): Where to write the candidates as markets.json entries. None skips it.
+            manifold_limit (int): The maximum number of Manifold markets to fetch per group. Default is 20000.
+            polymarket_limit (int): The maximum number of Polymarket markets to fetch. Default is 3000.
+            registry (MatchRegistry, optional): When given, the candidates are stored in it with their similarity
+                as confidence.
+
+        Returns:
+            list: The matched candidates, best similarity first.
+        """
+        categories = self.load_categories_from_json(categories_path)
+        partitions = self.fetch_partitions(
+            categories, manifold_limit=manifold_limit, polymarket_limit=polymarket_limit
         )
+        for partition in partitions:
+            print(
+                f"{partition.title}: {len(partition.futuur_markets)} futuur, "
+                f"{len(partition.manifold_markets)} manifold, "
+                f"{len(partition.polymarket_markets)} polymarket markets"
+            )
+        candidates = self.match_partitions(partitions)
+        print(f"{len(candidates)} candidate matches")
+
+        if registry:
+            for c in candidates:
+                registry.upsert(
+                    c.futuur_id, c.venue, c.market_id, confidence=c.similarity
+                )
 
-    def navigate_futuur(self):
-        # TODO idea is the following, have a JSON with macro categories from futuur, match with betano or bet365
-        # retrieve all markets inside certain category
-        # within a defined category, use some sort of algorithm to match markets
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    [c.to_entry() for c in candidates], f, ensure_ascii=False, indent=4
+                )
+        return candidates
 
-        categories = self.load_categories_from_json()
-        for category in categories:
+    def fetch_partitions(
+        self,
+        categories: List[dict],
+        manifold_limit=20_000,
+        polymarket_limit=3000,
+        futuur_markets: Optional[List[dict]] = None,
+    ) -> List[CategoryPartition]:
+        """
+        Fetches the Futuur categories and the Manifold groups concurrently with the Polymarket catalog, then splits
+        the markets by category. Manifold lists markets without their groups, so each group is fetched on its own.
+
+        Args:
+            categories (list): Entries with 'title', 'futuur_id', and optionally 'manifold_groups' (group slugs) and
+                'polymarket_tags'.
+            futuur_markets (list, optional): Futuur market payloads to partition by their categories instead of
+                fetching every market of each category.
 
-            print(category)
-            futuur_category_markets = self.futuur_api.get_all_markets(
-                category=category.get("futuur_id")
+        Returns:
+            list: One partition per category.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if futuur_markets is None:
+                futuur_futures = [
+                    executor.submit(
+                        self.futuur_api.get_all_markets,
+                        category=category.get("futuur_id"),
+                        path=None,
+                    )
+                    for category in categories
+                ]
+            else:
+                futuur_by_category = {}
+                for market in futuur_markets:
+                    for category in market.get("categories") or []:
+                        futuur_by_category.setdefault(category.get("id"), []).append(
+                            market
+                        )
+                futuur_futures = [
+                    executor.submit(
+                        futuur_by_category.get, category.get("futuur_id"), []
+                    )
+                    for category in categories
+                ]
+            groups = dict.fromkeys(
+                group
+                for category in categories
+                for group in category.get("manifold_groups", [])
             )
-            print(len(futuur_category_markets))
-            # bet_category_markets = 0 # TODO retrieve this from any betting webiste which has categories that might match
+            manifold_futures = {
+                group: executor.submit(
+                    self.manifold_api.get_group_markets,
+                    group,
+                    total_limit=manifold_limit,
+                )
+                for group in groups
+            }
+            polymarket_future = executor.submit(
+                self.polymarket_api.get_all_markets,
+                max_markets=polymarket_limit,
+                path=None,
+            )
+            manifold_by_group = {
+                group: [
+                    (market.get("id"), market.get("question"), market.get("closeTime"))
+                    for market in future.result()
+                ]
+                for group, future in manifold_futures.items()
+            }
+            polymarket_by_tag = self._group_by(
+                polymarket_future.result(),
+                "tags",
+                "condition_id",
+                "question",
+                "end_date_iso",
+            )
+
+            partitions = []
+            for category, future in zip(categories, futuur_futures):
+                partition = CategoryPartition(
+                    title=category.get("title"),
+                    futuur_id=category.get("futuur_id"),
+                    futuur_markets=_unique(
+                        (
+                            market.get("id"),
+                            market.get("title"),
+                            market.get("bet_end_date"),
+                        )
+                        for market in future.result()
+                    ),
+                )
+                # A market in several groups or tags of the category is compared once
+                partition.manifold_markets = _unique(
+                    market
+                    for group in category.get("manifold_groups", [])
+                    for market in manifold_by_group.get(group, [])
+                )
+                partition.polymarket_markets = _unique(
+                    market
+                    for tag in category.get("polymarket_tags", [])
+                    for market in polymarket_by_tag.get(tag, [])
+                )
+                partitions.append(partition)
+        return partitions
 
-        # for market in futuur_category_markets:
-        #     print(market)
-        # pass
+    def _group_by(
+        self, markets: List[dict], key: str, id_key: str, title_key: str, close_key: str
+    ) -> Dict[str, Titles]:
+        groups: Dict[str, Titles] = {}
+        for market in markets:
+            for group in dict.fromkeys(market.get(key) or []):
+                groups.setdefault(group, []).append(
+                    (market.get(id_key), market.get(title_key), market.get(close_key))
+                )
+        return groups
+
+    def match_partitions(
+        self, partitions: List[CategoryPartition]
+    ) -> List[MarketCandidate]:
+        """
+        Runs match_partition on every partition, in a process pool when there is more than one.
+        """
+        if len(partitions) <= 1 or self.max_workers == 1:
+            results = [match_partition(partition) for partition in partitions]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(match_partition, partitions))
+        candidates = [candidate for result in results for candidate in result]
+        return sorted(candidates, key=lambda c: c.similarity, reverse=True)
 
     def load_categories_from_json(self, path="categories.json"):
         abs_path = os.path.abspath(path)
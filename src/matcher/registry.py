@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import settings
+from history.recorder import MANIFOLD, POLYMARKET
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS market_matches (
+    id INTEGER PRIMARY KEY,
+    futuur_id NOT NULL,
+    venue TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    url TEXT,
+    confidence REAL,
+    futuur_hash TEXT,
+    market_hash TEXT,
+    last_verified REAL,
+    UNIQUE (futuur_id, venue, market_id)
+);
+CREATE INDEX IF NOT EXISTS market_matches_futuur ON market_matches (futuur_id);
+CREATE INDEX IF NOT EXISTS market_matches_market ON market_matches (venue, market_id);
+CREATE INDEX IF NOT EXISTS market_matches_url ON market_matches (url);
+CREATE TABLE IF NOT EXISTS outcome_matches (
+    match_id INTEGER NOT NULL REFERENCES market_matches (id) ON DELETE CASCADE,
+    futuur_outcome_id NOT NULL,
+    outcome_key TEXT,
+    confidence REAL,
+    PRIMARY KEY (match_id, futuur_outcome_id)
+);
+"""
+
+
+def content_hash(title: Optional[str], outcomes: Iterable[Optional[str]] = ()) -> str:
+    """
+    Hash of a market title and its outcome titles. A changed hash means the pair must be matched again.
+    """
+    text = "\n".join([title or ""] + sorted(o or "" for o in outcomes))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class MarketMatch:
+    id: int
+    futuur_id: object
+    venue: str
+    market_id: str
+    url: Optional[str] = None
+    confidence: Optional[float] = None
+    futuur_hash: Optional[str] = None
+    market_hash: Optional[str] = None
+    last_verified: Optional[float] = None
+
+    def to_entry(self) -> dict:
+        """
+        The match as a markets.json entry.
+        """
+        entry = {"futuur": self.futuur_id}
+        if self.venue == MANIFOLD:
+            entry["mani"] = self.market_id
+        else:
+            if self.url:
+                entry["poly"] = self.url
+            if self.market_id != self.url:
+                entry["poly_condition_id"] = self.market_id
+        return entry
+
+
+class MatchRegistry:
+    """
+    Persistent registry of matched markets, replacing the hand-edited markets.json.
+
+    Each Futuur market is paired with a market on another venue, and each pair keeps its outcome-to-outcome
+    mapping, a match confidence, the last time it was verified and a hash of both sides' titles and outcomes, so a
+    scan only needs to match outcomes again when one of the hashes changed. Pairs are indexed by the Futuur id and by
+    the other venue's id.
+
+    Attributes:
+        path (str): The SQLite database file, or ':memory:'.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initializes the MatchRegistry instance, creating the tables when needed.
+
+        Args:
+            path (str, optional): The SQLite database file. Default is settings.MATCH_REGISTRY_PATH.
+        """
+        self.path = path or settings.MATCH_REGISTRY_PATH
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[MarketMatch]:
+        with self.lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [MarketMatch(**dict(row)) for row in rows]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM market_matches"
+            ).fetchone()[0]
+
+    def upsert(
+        self,
+        futuur_id,
+        venue: str,
+        market_id: str,
+        url: Optional[str] = None,
+        confidence: Optional[float] = None,
+    ) -> MarketMatch:
+        """
+        Adds a market pair, or updates its url and confidence when it already exists.
+
+        Args:
+            futuur_id (int): The Futuur market id.
+            venue (str): The other venue, MANIFOLD or POLYMARKET.
+            market_id (str): The market id on the other venue. For Polymarket events known only by URL, the URL.
+            url (str, optional): The event URL on the other venue.
+            confidence (float, optional): How sure we are the markets are the same, 1 for hand-curated pairs.
+
+        Returns:
+            MarketMatch: The stored pair.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO market_matches (futuur_id, venue, market_id, url, confidence) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (futuur_id, venue, market_id) DO UPDATE SET "
+                "url = COALESCE(excluded.url, url), confidence = COALESCE(excluded.confidence, confidence)",
+                (futuur_id, venue, market_id, url, confidence),
+            )
+        return self.get(futuur_id, venue, market_id)
+
+    def get(self, futuur_id, venue: str, market_id: str) -> Optional[MarketMatch]:
+        matches = self._query(
+            "SELECT * FROM market_matches WHERE futuur_id = ? AND venue = ? AND market_id = ?",
+            (futuur_id, venue, market_id),
+        )
+        return matches[0] if matches else None
+
+    def by_futuur_id(self, futuur_id) -> List[MarketMatch]:
+        return self._query(
+            "SELECT * FROM market_matches WHERE futuur_id = ?", (futuur_id,)
+        )
+
+    def by_market_id(self, venue: str, market_id: str) -> List[MarketMatch]:
+        return self._query(
+            "SELECT * FROM market_matches WHERE venue = ? AND market_id = ?",
+            (venue, market_id),
+        )
+
+    def by_url(self, url: str) -> List[MarketMatch]:
+        return self._query("SELECT * FROM market_matches WHERE url = ?", (url,))
+
+    def matches(
+        self, venue: Optional[str] = None, min_confidence: Optional[float] = None
+    ) -> List[MarketMatch]:
+        """
+        Lists the stored pairs, in insertion order.
+
+        Args:
+            venue (str, optional): Only pairs with this venue.
+            min_confidence (float, optional): Only pairs at least this confident. Pairs without a confidence are kept.
+        """
+        sql, params = "SELECT * FROM market_matches WHERE 1 = 1", []
+        if venue:
+            sql += " AND venue = ?"
+            params.append(venue)
+        if min_confidence is not None:
+            sql += " AND (confidence IS NULL OR confidence >= ?)"
+            params.append(min_confidence)
+        return self._query(sql + " ORDER BY id", tuple(params))
+
+    def outcome_map(self, match_id: int) -> Dict[object, Tuple[str, float]]:
+        """
+        Returns {futuur outcome id: (outcome key on the other venue, confidence)} of a pair. A None key means the
+        outcome has no equivalent.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT futuur_outcome_id, outcome_key, confidence FROM outcome_matches WHERE match_id = ?",
+                (match_id,),
+            ).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def needs_rematch(
+        self, match: MarketMatch, futuur_hash: str, market_hash: str
+    ) -> bool:
+        """
+        Whether the outcomes of a pair must be matched again, because they never were or a side changed.
+        """
+        return (
+            match.last_verified is None
+            or match.futuur_hash != futuur_hash
+            or match.market_hash != market_hash
+        )
+
+    def save_outcome_map(
+        self,
+        match_id: int,
+        outcome_map: Dict[object, Tuple[Optional[str], Optional[float]]],
+        futuur_hash: str,
+        market_hash: str,
+    ):
+        """
+        Replaces the outcome mapping of a pair and marks it verified against the given hashes.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM outcome_matches WHERE match_id = ?", (match_id,)
+            )
+            self.connection.executemany(
+                "INSERT INTO outcome_matches (match_id, futuur_outcome_id, outcome_key, confidence) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (match_id, outcome_id, key, confidence)
+                    for outcome_id, (key, confidence) in outcome_map.items()
+                ],
+            )
+            self.connection.execute(
+                "UPDATE market_matches SET futuur_hash = ?, market_hash = ?, last_verified = ? WHERE id = ?",
+                (futuur_hash, market_hash, time.time(), match_id),
+            )
+
+    def import_json(self, path="markets.json") -> int:
+        """
+        Imports the pairs of a markets.json style file, with 'futuur' and 'mani', 'poly' or 'poly_condition_id' keys.
+
+        Returns:
+            int: The number of pairs read from the file.
+        """
+        with open(os.path.abspath(path), "r") as file:
+            data = json.load(file)
+        count = 0
+        for item in data:
+            if item.get("mani"):
+                self.upsert(item["futuur"], MANIFOLD, item["mani"], confidence=1.0)
+                count += 1
+            if item.get("poly") or item.get("poly_condition_id"):
+                market_id = item.get("poly_condition_id") or item["poly"]
+                self.upsert(
+                    item["futuur"],
+                    POLYMARKET,
+                    market_id,
+                    url=item.get("poly"),
+                    confidence=1.0,
+                )
+                count += 1
+        return count
+
+    def import_json_if_empty(self, paths=("markets.json", "src/markets.json")):
+        """
+        Seeds an empty registry from the first markets.json found, so existing setups keep working.
+        """
+        if len(self):
+            return
+        for path in paths:
+            if os.path.exists(os.path.abspath(path)):
+                self.import_json(path)
+                return
+
+    def entries(self, venue: Optional[str] = None) -> List[dict]:
+        """
+        The stored pairs as markets.json entries.
+        """
+        return [match.to_entry() for match in self.matches(venue)]
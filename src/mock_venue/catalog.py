@@ -0,0 +1,338 @@
+import datetime
+import hashlib
+import math
+import time
+from typing import List, Optional, Sequence
+
+# Futuur category ids served by the mock. 2544 matches categories.json.
+CATEGORIES = [
+    {"id": 2544, "title": "2024 US Elections", "slug": "2024-us-elections"},
+    {"id": 2545, "title": "Crypto", "slug": "crypto"},
+    {"id": 2546, "title": "Technology", "slug": "technology"},
+    {"id": 2547, "title": "Sports", "slug": "sports"},
+]
+
+ENTITIES = [
+    "Trump",
+    "Biden",
+    "Harris",
+    "SpaceX",
+    "OpenAI",
+    "Apple",
+    "Tesla",
+    "Messi",
+    "Nvidia",
+    "Argentina",
+    "Brazil",
+    "Germany",
+]
+ASSETS = ["Bitcoin", "Ethereum", "Solana", "Gold", "S&P 500"]
+ACTIONS = ["announce a new CEO", "be indicted", "launch Starship", "win the election"]
+EVENTS = ["the World Cup", "the Super Bowl", "the presidential election", "the Oscars"]
+MONTHS = ["March", "June", "September", "December"]
+FAMILY_SIZE = len(MONTHS)
+FUTUUR_CURRENCIES = ["OOM", "BTC", "ETH", "USDC"]
+BASE_TIME = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _unit(*parts) -> float:
+    """
+    Deterministic pseudo random number in [0, 1) for the given seed parts.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64
+
+
+def condition_id(index: int) -> str:
+    return "0x" + format(index, "064x")
+
+
+def condition_index(value: str) -> Optional[int]:
+    try:
+        return int(value, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def manifold_id(index: int) -> str:
+    return f"mock{index:016d}"
+
+
+def manifold_index(value: str) -> Optional[int]:
+    if not value or not value.startswith("mock"):
+        return None
+    try:
+        return int(value[4:])
+    except ValueError:
+        return None
+
+
+class SyntheticCatalog:
+    """
+    Deterministic catalog of synthetic markets shared by the three mock venues.
+
+    Market ``i`` exists on every venue with the same question and a slightly different price, so matching code finds
+    real pairs.
+    Markets come in families of four (date ladders, threshold ladders and plain binaries) whose prices respect the
+    family ordering, and prices drift slowly over time so repeated scans see movement. Nothing is stored: every
+    market is derived from its index on demand, so catalogs of 100k markets cost no memory.
+
+    Attributes:
+        size (int): Number of markets on each venue.
+        seed (int): Seed for every pseudo random value.
+    """
+
+    def __init__(self, size: int = 100_000, seed: int = 0):
+        self.size = size
+        self.seed = seed
+
+    def category(self, index: int) -> dict:
+        return CATEGORIES[(index // FAMILY_SIZE) % len(CATEGORIES)]
+
+    def title(self, index: int) -> str:
+        family, member = divmod(index, FAMILY_SIZE)
+        year = 2024 + family % 3
+        kind = family % 3
+        if kind == 0:
+            entity = ENTITIES[family % len(ENTITIES)]
+            action = ACTIONS[(family // 3) % len(ACTIONS)]
+            return f"Will {entity} {action} by {MONTHS[member]} {year}?"
+        if kind == 1:
+            asset = ASSETS[family % len(ASSETS)]
+            threshold = (10 + family % 90) * (member + 1)
+            return f"Will {asset} be above ${threshold}k on December 31, {year}?"
+        entity = ENTITIES[family % len(ENTITIES)]
+        event = EVENTS[(family // 3) % len(EVENTS)]
+        return f"Will {entity} win {event} {year} (#{member + 1})?"
+
+    def close_time(self, index: int) -> datetime.datetime:
+        family, member = divmod(index, FAMILY_SIZE)
+        year = 2024 + family % 3
+        month = 3 * (member + 1) if family % 3 == 0 else 12
+        return datetime.datetime(year, month, 28, tzinfo=datetime.timezone.utc)
+
+    def created_time(self, index: int) -> datetime.datetime:
+        return BASE_TIME + datetime.timedelta(minutes=index)
+
+    def probability(self, index: int, venue: str, now: Optional[float] = None) -> float:
+        """
+        Yes probability of a market on a venue at a given time. Ladders are monotone in the family member.
+        """
+        now = time.time() if now is None else now
+        family, member = divmod(index, FAMILY_SIZE)
+        base = 0.05 + 0.8 * _unit(self.seed, "family", family)
+        if family % 3 == 0:
+            base = base * (member + 1) / FAMILY_SIZE
+        elif family % 3 == 1:
+            base = base * (FAMILY_SIZE - member) / FAMILY_SIZE
+        offset = 0.06 * (_unit(self.seed, venue, index) - 0.5)
+        phase = 2 * math.pi * _unit(self.seed, "phase", venue, index)
+        drift = 0.03 * math.sin(now / 300 + phase)
+        return round(min(max(base + offset + drift, 0.01), 0.99), 4)
+
+    def volume(self, index: int, venue: str) -> float:
+        return round(10_000 * _unit(self.seed, "volume", venue, index) ** 3, 2)
+
+    def futuur_market(self, index: int, now: Optional[float] = None) -> dict:
+        yes = self.probability(index, "futuur", now)
+        prices = {}
+        for currency in FUTUUR_CURRENCIES:
+            skew = 0.02 * (_unit(self.seed, "currency", currency, index) - 0.5)
+            prices[currency] = round(min(max(yes + skew, 0.01), 0.99), 4)
+        outcomes = [
+            {
+                "id": index * 2 + 1,
+                "title": "Yes",
+                "price": prices,
+            },
+            {
+                "id": index * 2 + 2,
+                "title": "No",
+                "price": {c: round(1 - p, 4) for c, p in prices.items()},
+            },
+        ]
+        category = self.category(index)
+        return {
+            "id": index + 1,
+            "title": self.title(index),
+            "slug": f"mock-market-{index + 1}",
+            "status": "o",
+            "categories": [{"id": category["id"], "title": category["title"]}],
+            "tags": [category["slug"]],
+            "bet_end_date": self.close_time(index).isoformat(),
+            "created_on": self.created_time(index).isoformat(),
+            "volume_play_money": self.volume(index, "futuur_play"),
+            "volume_real_money": self.volume(index, "futuur"),
+            "wagers_count": int(self.volume(index, "futuur") // 10),
+            "outcomes": outcomes,
+        }
+
+    def futuur_index(self, market_id) -> Optional[int]:
+        try:
+            index = int(market_id) - 1
+        except (TypeError, ValueError):
+            return None
+        return index if 0 <= index < self.size else None
+
+    def futuur_related_indexes(self, index: int) -> List[int]:
+        """
+        Indexes of the markets related to a market: the rest of its family and the first market of the neighbouring
+        families of the same category, so related markets form a connected graph.
+        """
+        family = index // FAMILY_SIZE
+        members = range(family * FAMILY_SIZE, (family + 1) * FAMILY_SIZE)
+        neighbours = [
+            (family + step) * FAMILY_SIZE
+            for step in (-len(CATEGORIES), len(CATEGORIES))
+        ]
+        return [i for i in [*members, *neighbours] if i != index and 0 <= i < self.size]
+
+    def futuur_category_indexes(self, category_id) -> Sequence[int]:
+        """
+        Indexes of the markets in a Futuur category. Families are assigned to categories round robin.
+        """
+        if category_id is None:
+            return range(self.size)
+        ids = [c["id"] for c in CATEGORIES]
+        if int(category_id) not in ids:
+            return range(0)
+        position = ids.index(int(category_id))
+        # Every FAMILY_SIZE consecutive markets share a category, so the category is a strided set of families.
+        return _StridedFamilies(position, len(CATEGORIES), self.size)
+
+    def manifold_group_indexes(self, slug: str) -> Sequence[int]:
+        """
+        Indexes of the markets in a Manifold group, which is the Futuur category with the same slug.
+        """
+        for category in CATEGORIES:
+            if category["slug"] == slug:
+                return self.futuur_category_indexes(category["id"])
+        return range(0)
+
+    def manifold_market(
+        self, index: int, now: Optional[float] = None, lite: bool = False
+    ) -> dict:
+        """
+        A Manifold market. Lite markets, as listed by /markets and /search-markets, have no groupSlugs, like the
+        LiteMarket of the real API; only the full market of /market/<id> has them.
+        """
+        probability = self.probability(index, "manifold", now)
+        liquidity = 100 + self.volume(index, "manifold_pool")
+        p = 0.5
+        # Pool sizes that reproduce the probability for a cpmm-1 market with p = 0.5
+        pool = {
+            "YES": round(liquidity * (1 - probability) / probability, 4),
+            "NO": liquidity,
+        }
+        market = {
+            "id": manifold_id(index),
+            "question": self.title(index),
+            "slug": f"mock-market-{index}",
+            "url": f"https://manifold.markets/mock/mock-market-{index}",
+            "outcomeType": "BINARY",
+            "mechanism": "cpmm-1",
+            "probability": probability,
+            "p": p,
+            "pool": pool,
+            "totalLiquidity": liquidity,
+            "createdTime": int(self.created_time(index).timestamp() * 1000),
+            "closeTime": int(self.close_time(index).timestamp() * 1000),
+            "volume": self.volume(index, "manifold"),
+            "volume24Hours": self.volume(index, "manifold_24h"),
+            "isResolved": False,
+        }
+        if not lite:
+            market["groupSlugs"] = [self.category(index)["slug"]]
+        return market
+
+    def polymarket_market(self, index: int, now: Optional[float] = None) -> dict:
+        yes = self.probability(index, "polymarket", now)
+        category = self.category(index)
+        return {
+            "condition_id": condition_id(index),
+            "question_id": condition_id(index),
+            "question": self.title(index),
+            "market_slug": f"mock-market-{index}",
+            "end_date_iso": self.close_time(index).isoformat(),
+            "active": True,
+            "closed": False,
+            "minimum_order_size": 5,
+            "minimum_tick_size": 0.01,
+            "tags": [category["title"]],
+            "tokens": [
+                {
+                    "token_id": str(index * 2 + 1),
+                    "outcome": "Yes",
+                    "price": yes,
+                    "winner": False,
+                },
+                {
+                    "token_id": str(index * 2 + 2),
+                    "outcome": "No",
+                    "price": round(1 - yes, 4),
+                    "winner": False,
+                },
+            ],
+        }
+
+    def polymarket_book(
+        self, token_id: str, now: Optional[float] = None
+    ) -> Optional[dict]:
+        try:
+            token = int(token_id)
+        except (TypeError, ValueError):
+            return None
+        index, side = divmod(token - 1, 2)
+        if not 0 <= index < self.size:
+            return None
+        yes = self.probability(index, "polymarket", now)
+        mid = yes if side == 0 else 1 - yes
+        bids: List[dict] = []
+        asks: List[dict] = []
+        for level in range(1, 6):
+            size = round(50 + 500 * _unit(self.seed, "depth", token, level), 2)
+            bid = round(mid - 0.01 * level, 2)
+            ask = round(mid + 0.01 * level, 2)
+            if bid > 0:
+                bids.append({"price": str(bid), "size": str(size)})
+            if ask < 1:
+                asks.append({"price": str(ask), "size": str(size)})
+        return {
+            "market": condition_id(index),
+            "asset_id": str(token),
+            "hash": hashlib.sha1(f"{token}{now}".encode()).hexdigest(),
+            "timestamp": str(int((now or time.time()) * 1000)),
+            "min_order_size": "5",
+            "tick_size": "0.01",
+            "neg_risk": False,
+            "last_trade_price": str(round(mid, 2)),
+            # The CLOB lists bids ascending and asks descending, best price last
+            "bids": list(reversed(bids)),
+            "asks": list(reversed(asks)),
+        }
+
+
+class _StridedFamilies:
+    """
+    Sequence of the market indexes belonging to every ``stride``-th family, starting at family ``start``.
+    """
+
+    def __init__(self, start: int, stride: int, size: int):
+        self.start = start
+        self.stride = stride
+        self.size = size
+        families = max(0, math.ceil((size // FAMILY_SIZE - start) / stride))
+        self._len = families * FAMILY_SIZE
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(self._len))]
+        if position < 0:
+            position += self._len
+        if not 0 <= position < self._len:
+            raise IndexError(position)
+        family, member = divmod(position, FAMILY_SIZE)
+        return (self.start + family * self.stride) * FAMILY_SIZE + member
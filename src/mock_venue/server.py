@@ -0,0 +1,589 @@
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from .catalog import SyntheticCatalog, condition_index, manifold_index
+
+FUTUUR_PREFIX = "/futuur/api/v1/"
+MANIFOLD_PREFIX = "/manifold/v0/"
+POLYMARKET_PREFIX = "/polymarket"
+MOCK_MANIFOLD_USER = "mockuser"
+# py_clob_client stops paginating on this cursor
+POLYMARKET_END_CURSOR = "LTE="
+POLYMARKET_PAGE_SIZE = 500
+
+
+@dataclass
+class MockVenueConfig:
+    """
+    Behaviour of the mock venues.
+
+    Attributes:
+        catalog_size (int): Number of markets on each venue.
+        seed (int): Seed of the synthetic catalog and of the error injection.
+        latency_ms (float): Fixed latency added to every response.
+        latency_jitter_ms (float): Uniform random latency added on top of latency_ms.
+        rate_limit (float, optional): Requests per second allowed per venue. Exceeding it returns 429.
+        error_rate (float): Probability of answering a request with error_status.
+        error_status (int): The HTTP status used for injected errors.
+    """
+
+    catalog_size: int = 100_000
+    seed: int = 0
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    rate_limit: Optional[float] = None
+    error_rate: float = 0.0
+    error_status: int = 500
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class MockVenueState:
+    """
+    State shared by every request handler: the catalog, the rate limiters and the bets placed on the mock Futuur.
+    """
+
+    def __init__(self, config: MockVenueConfig):
+        self.config = config
+        self.catalog = SyntheticCatalog(config.catalog_size, config.seed)
+        self.random = random.Random(config.seed)
+        self.random_lock = threading.Lock()
+        self.buckets: Dict[str, TokenBucket] = {}
+        if config.rate_limit:
+            self.buckets = {
+                venue: TokenBucket(config.rate_limit)
+                for venue in ("futuur", "manifold", "polymarket")
+            }
+        self.bets = []
+        self.manifold_bets = []
+        self.bets_lock = threading.Lock()
+        self.request_count = 0
+
+    def count_request(self):
+        with self.random_lock:
+            self.request_count += 1
+
+    def roll(self) -> float:
+        with self.random_lock:
+            return self.random.random()
+
+
+class MockVenueHandler(BaseHTTPRequestHandler):
+    state: MockVenueState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def _send(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _dispatch(self, method: str):
+        state = self.state
+        config = state.config
+        state.count_request()
+        parsed = urlparse(self.path)
+        path = parsed.path
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        if path.startswith(FUTUUR_PREFIX):
+            venue, route = "futuur", self._route_futuur
+            sub_path = path[len(FUTUUR_PREFIX) :]
+        elif path.startswith(MANIFOLD_PREFIX):
+            venue, route = "manifold", self._route_manifold
+            sub_path = path[len(MANIFOLD_PREFIX) :]
+        elif path.startswith(POLYMARKET_PREFIX):
+            venue, route = "polymarket", self._route_polymarket
+            sub_path = path[len(POLYMARKET_PREFIX) :].lstrip("/")
+        else:
+            self._send(404, {"detail": "Not found."})
+            return
+
+        latency = config.latency_ms
+        if config.latency_jitter_ms:
+            latency += config.latency_jitter_ms * state.roll()
+        if latency:
+            time.sleep(latency / 1000)
+
+        bucket = state.buckets.get(venue)
+        if bucket is not None and not bucket.take():
+            self._send(429, {"detail": "Request was throttled."})
+            return
+        if config.error_rate and state.roll() < config.error_rate:
+            self._send(config.error_status, {"detail": "Injected error."})
+            return
+
+        status, body = route(method, sub_path.strip("/"), query)
+        self._send(status, body)
+
+    def _base_url(self, prefix: str) -> str:
+        return f"http://{self.headers.get('Host')}{prefix}"
+
+    # Futuur
+
+    def _route_futuur(self, method: str, path: str, query: dict) -> Tuple[int, object]:
+        catalog = self.state.catalog
+        if path == "markets" and method == "GET":
+            return 200, self._futuur_markets(query)
+        match = re.fullmatch(r"markets/([^/]+)", path)
+        if match and method == "GET":
+            index = catalog.futuur_index(match.group(1))
+            if index is None:
+                return 404, {"detail": "Not found."}
+            return 200, catalog.futuur_market(index)
+        match = re.fullmatch(r"markets/([^/]+)/related_markets", path)
+        if match and method == "GET":
+            index = catalog.futuur_index(match.group(1))
+            if index is None:
+                return 404, {"detail": "Not found."}
+            now = time.time()
+            return 200, [
+                catalog.futuur_market(i, now)
+                for i in catalog.futuur_related_indexes(index)
+            ]
+        if path == "bets/simulate_purchase" and method == "GET":
+            return self._futuur_simulate(query)
+        if path == "bets" and method == "GET":
+            return 200, self._futuur_bets(query)
+        if path == "bets" and method == "POST":
+            return self._futuur_purchase(self._read_json())
+        match = re.fullmatch(r"bets/(\d+)", path)
+        if match and method == "GET":
+            bet_id = int(match.group(1))
+            with self.state.bets_lock:
+                bet = next((b for b in self.state.bets if b["id"] == bet_id), None)
+            if bet is None:
+                return 404, {"detail": "Not found."}
+            return 200, bet
+        if path == "bets/rates" and method == "GET":
+            return 200, {"BTC": 60_000.0, "ETH": 3_000.0, "USDC": 1.0, "OOM": 0.0}
+        return 404, {"detail": "Not found."}
+
+    def _paginate(self, total: int, query: dict, prefix: str, route: str):
+        limit = max(1, min(int(query.get("limit", 40)), 500))
+        offset = max(0, int(query.get("offset", 0)))
+        next_url = previous_url = None
+        if offset + limit < total:
+            next_url = f"{self._base_url(prefix)}{route}?" + urlencode(
+                {**query, "limit": limit, "offset": offset + limit}
+            )
+        if offset > 0:
+            previous_url = f"{self._base_url(prefix)}{route}?" + urlencode(
+                {**query, "limit": limit, "offset": max(0, offset - limit)}
+            )
+        pagination = {
+            "next": next_url,
+            "previous": previous_url,
+            "page_size": limit,
+            "count": total,
+        }
+        return offset, limit, pagination
+
+    def _futuur_markets(self, query: dict) -> dict:
+        catalog = self.state.catalog
+        indexes = catalog.futuur_category_indexes(query.get("category"))
+        offset, limit, pagination = self._paginate(
+            len(indexes), query, FUTUUR_PREFIX, "markets/"
+        )
+        now = time.time()
+        results = [
+            catalog.futuur_market(i, now) for i in indexes[offset : offset + limit]
+        ]
+        return {"pagination": pagination, "results": results}
+
+    def _futuur_outcome(self, outcome_id) -> Tuple[Optional[dict], Optional[dict]]:
+        try:
+            outcome_id = int(outcome_id)
+        except (TypeError, ValueError):
+            return None, None
+        index = (outcome_id - 1) // 2
+        if not 0 <= index < self.state.catalog.size:
+            return None, None
+        market = self.state.catalog.futuur_market(index)
+        outcome = next(o for o in market["outcomes"] if o["id"] == outcome_id)
+        return market, outcome
+
+    def _futuur_quote(self, query: dict) -> Tuple[int, dict]:
+        market, outcome = self._futuur_outcome(query.get("outcome_id"))
+        if outcome is None:
+            return 400, {"outcome_id": ["Invalid outcome."]}
+        currency = query.get("currency", "OOM")
+        price = outcome["price"].get(currency)
+        if price is None:
+            return 400, {"currency": ["Invalid currency."]}
+        amount = (
+            float(query.get("amount") or 0) or float(query.get("shares") or 0) * price
+        )
+        # Small linear price impact so larger stakes get a worse average price
+        avg_price = min(price * (1 + amount / 10_000), 0.99)
+        return 200, {
+            "market": market["id"],
+            "outcome": outcome["id"],
+            "currency": currency,
+            "amount": round(amount, 6),
+            "shares": round(amount / avg_price, 6),
+            "price": avg_price,
+            "current_price": price,
+        }
+
+    def _futuur_simulate(self, query: dict) -> Tuple[int, dict]:
+        return self._futuur_quote(query)
+
+    def _futuur_purchase(self, payload: dict) -> Tuple[int, dict]:
+        status, quote = self._futuur_quote(payload)
+        if status != 200:
+            return status, quote
+        with self.state.bets_lock:
+            bet = {
+                "id": len(self.state.bets) + 1,
+                "question": {"id": quote["market"]},
+                "outcome": {"id": quote["outcome"]},
+                "status": "p",
+                "active_purchases": [
+                    {
+                        "currency": quote["currency"],
+                        "amount": quote["amount"],
+                        "shares": quote["shares"],
+                    }
+                ],
+            }
+            self.state.bets.append(bet)
+        return 201, bet
+
+    def _futuur_bets(self, query: dict) -> dict:
+        bets = self.state.bets
+        if query.get("question"):
+            bets = [b for b in bets if str(b["question"]["id"]) == query["question"]]
+        offset, limit, pagination = self._paginate(
+            len(bets), query, FUTUUR_PREFIX, "bets/"
+        )
+        return {"pagination": pagination, "results": bets[offset : offset + limit]}
+
+    # Manifold
+
+    def _route_manifold(
+        self, method: str, path: str, query: dict
+    ) -> Tuple[int, object]:
+        catalog = self.state.catalog
+        if path == "markets" and method == "GET":
+            limit = max(1, min(int(query.get("limit", 500)), 1000))
+            # Markets are listed newest first, and before is the id of the last market of the previous page
+            end = catalog.size
+            if query.get("before"):
+                before = manifold_index(query["before"])
+                if before is None:
+                    return 404, {"message": "Market not found"}
+                end = before
+            now = time.time()
+            return 200, [
+                catalog.manifold_market(i, now, lite=True)
+                for i in range(end - 1, max(end - limit, 0) - 1, -1)
+            ]
+        if path == "search-markets" and method == "GET":
+            # Only the group filter and offset pagination of the real search are served
+            limit = max(1, min(int(query.get("limit", 100)), 1000))
+            offset = max(0, int(query.get("offset", 0)))
+            topic = query.get("topicSlug")
+            indexes = (
+                catalog.manifold_group_indexes(topic) if topic else range(catalog.size)
+            )
+            now = time.time()
+            return 200, [
+                catalog.manifold_market(i, now, lite=True)
+                for i in indexes[offset : offset + limit]
+            ]
+        match = re.fullmatch(r"market/([^/]+)", path)
+        if match and method == "GET":
+            index = manifold_index(match.group(1))
+            if index is None or not 0 <= index < catalog.size:
+                return 404, {"message": "Market not found"}
+            return 200, catalog.manifold_market(index)
+        match = re.fullmatch(r"market/([^/]+)/positions", path)
+        if match and method == "GET":
+            return 200, self._manifold_positions(match.group(1), query)
+        if path == "me" and method == "GET":
+            if not self._manifold_authorized():
+                return 401, {"message": "Unauthorized"}
+            return 200, {"id": MOCK_MANIFOLD_USER, "username": "mock", "balance": 1000}
+        if path == "bet" and method == "POST":
+            if not self._manifold_authorized():
+                return 401, {"message": "Unauthorized"}
+            return self._manifold_bet(self._read_json())
+        match = re.fullmatch(r"bet/cancel/([^/]+)", path)
+        if match and method == "POST":
+            if not self._manifold_authorized():
+                return 401, {"message": "Unauthorized"}
+            return self._manifold_cancel(match.group(1))
+        if path == "bets" and method == "GET":
+            return 200, self._manifold_bets(query)
+        return 404, {"message": "Not found"}
+
+    def _manifold_authorized(self) -> bool:
+        return (self.headers.get("Authorization") or "").startswith("Key ")
+
+    def _manifold_bet(self, payload: dict) -> Tuple[int, dict]:
+        index = manifold_index(payload.get("contractId"))
+        if index is None or not 0 <= index < self.state.catalog.size:
+            return 404, {"message": "Market not found"}
+        outcome = payload.get("outcome", "YES")
+        amount = float(payload.get("amount") or 0)
+        if amount <= 0 or outcome not in ("YES", "NO"):
+            return 400, {"message": "Invalid bet"}
+        probability = self.state.catalog.manifold_market(index)["probability"]
+        price = probability if outcome == "YES" else 1 - probability
+        limit_prob = payload.get("limitProb")
+        # Market orders fill at the current probability, limit orders only when the limit is reached
+        filled = limit_prob is None or (
+            probability <= limit_prob if outcome == "YES" else probability >= limit_prob
+        )
+        bet = {
+            "contractId": payload["contractId"],
+            "userId": MOCK_MANIFOLD_USER,
+            "outcome": outcome,
+            "amount": amount if filled else 0,
+            "orderAmount": amount,
+            "shares": amount / price if filled else 0,
+            "probBefore": probability,
+            "probAfter": probability,
+            "limitProb": limit_prob,
+            "isFilled": filled,
+            "isCancelled": False,
+            "fills": [{"amount": amount, "shares": amount / price}] if filled else [],
+            "createdTime": int(time.time() * 1000),
+        }
+        if payload.get("dryRun"):
+            return 200, {**bet, "betId": None}
+        with self.state.bets_lock:
+            bet["id"] = bet["betId"] = f"mockbet{len(self.state.manifold_bets) + 1}"
+            self.state.manifold_bets.append(bet)
+        return 200, bet
+
+    def _manifold_cancel(self, bet_id: str) -> Tuple[int, dict]:
+        with self.state.bets_lock:
+            bet = next((b for b in self.state.manifold_bets if b["id"] == bet_id), None)
+            if bet is None or bet["limitProb"] is None:
+                return 404, {"message": "Bet not found"}
+            bet["isCancelled"] = True
+        return 200, bet
+
+    def _manifold_bets(self, query: dict) -> List[dict]:
+        bets = list(reversed(self.state.manifold_bets))
+        if query.get("contractId"):
+            bets = [b for b in bets if b["contractId"] == query["contractId"]]
+        if query.get("userId"):
+            bets = [b for b in bets if b["userId"] == query["userId"]]
+        if query.get("kinds") == "open-limit":
+            bets = [b for b in bets if not b["isFilled"] and not b["isCancelled"]]
+        return bets[: int(query.get("limit", 1000))]
+
+    def _manifold_positions(self, market_id: str, query: dict) -> List[dict]:
+        with self.state.bets_lock:
+            bets = [
+                b
+                for b in self.state.manifold_bets
+                if b["contractId"] == market_id and b["amount"]
+            ]
+        if query.get("userId") and query["userId"] != MOCK_MANIFOLD_USER:
+            return []
+        if not bets:
+            return []
+        shares = {"YES": 0.0, "NO": 0.0}
+        for bet in bets:
+            shares[bet["outcome"]] += bet["shares"]
+        return [
+            {
+                "contractId": market_id,
+                "userId": MOCK_MANIFOLD_USER,
+                "totalShares": shares,
+                "invested": sum(b["amount"] for b in bets),
+                "hasYesShares": shares["YES"] > 0,
+                "hasNoShares": shares["NO"] > 0,
+            }
+        ]
+
+    # Polymarket
+
+    def _route_polymarket(
+        self, method: str, path: str, query: dict
+    ) -> Tuple[int, object]:
+        catalog = self.state.catalog
+        if path == "markets" and method == "GET":
+            # Cursors are the base64 encoded offset, as on the real CLOB ("MA==" is 0)
+            try:
+                offset = int(base64.b64decode(query.get("next_cursor") or "MA=="))
+            except ValueError:
+                return 400, {"error": "invalid next_cursor"}
+            if offset < 0:
+                offset = catalog.size
+            end = min(offset + POLYMARKET_PAGE_SIZE, catalog.size)
+            next_cursor = POLYMARKET_END_CURSOR
+            if end < catalog.size:
+                next_cursor = base64.b64encode(str(end).encode()).decode()
+            now = time.time()
+            return 200, {
+                "limit": POLYMARKET_PAGE_SIZE,
+                "count": end - offset,
+                "next_cursor": next_cursor,
+                "data": [catalog.polymarket_market(i, now) for i in range(offset, end)],
+            }
+        match = re.fullmatch(r"markets/([^/]+)", path)
+        if match and method == "GET":
+            index = condition_index(match.group(1))
+            if index is None or not 0 <= index < catalog.size:
+                return 404, {"error": "market not found"}
+            return 200, catalog.polymarket_market(index)
+        if path == "book" and method == "GET":
+            book = catalog.polymarket_book(query.get("token_id"))
+            if book is None:
+                return 404, {"error": "No orderbook exists for the requested token id"}
+            return 200, book
+        return 404, {"error": "not found"}
+
+
+class MockVenueServer:
+    """
+    Local stand-in for the Futuur, Manifold and Polymarket CLOB APIs, served from a background thread.
+
+    Point the clients at it with ``futuur_url``, ``manifold_url`` and ``polymarket_url`` (e.g. through the
+    FUTUUR_BASE_URL, MANIFOLD_BASE_URL and POLYMARKET_HOST settings).
+
+    Usage:
+        with MockVenueServer(MockVenueConfig(catalog_size=1000, latency_ms=20)) as server:
+            FutuurAPI(base_url=server.futuur_url).get_markets()
+    """
+
+    def __init__(
+        self, config: Optional[MockVenueConfig] = None, host="127.0.0.1", port=0
+    ):
+        self.config = config or MockVenueConfig()
+        self.state = MockVenueState(self.config)
+        handler = type(
+            "BoundMockVenueHandler", (MockVenueHandler,), {"state": self.state}
+        )
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def futuur_url(self) -> str:
+        return self.url + FUTUUR_PREFIX
+
+    @property
+    def manifold_url(self) -> str:
+        return self.url + MANIFOLD_PREFIX
+
+    @property
+    def polymarket_url(self) -> str:
+        return self.url + POLYMARKET_PREFIX
+
+    @property
+    def request_count(self) -> int:
+        return self.state.request_count
+
+    def start(self) -> "MockVenueServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self) -> "MockVenueServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local mock venue server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--catalog-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    server = MockVenueServer(
+        MockVenueConfig(
+            catalog_size=args.catalog_size,
+            seed=args.seed,
+            latency_ms=args.latency_ms,
+            latency_jitter_ms=args.latency_jitter_ms,
+            rate_limit=args.rate_limit,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    print("FUTUUR_BASE_URL=" + server.futuur_url)
+    print("MANIFOLD_BASE_URL=" + server.manifold_url)
+    print("POLYMARKET_HOST=" + server.polymarket_url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
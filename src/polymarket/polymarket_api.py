@@ -7,12 +7,17 @@ import time
 from typing import List
 from urllib.parse import urlencode
 
-from py_clob_client.client import ClobClient
 from py_clob_client.clob_types import OrderArgs, OrderType
 from py_clob_client.order_builder.constants import BUY
 
 import requests
 
+from instrumentation.telemetry import span
+from transport.record_replay import clob_client
+
+# Cursor returned by the CLOB on the last page
+END_CURSOR = "LTE="
+
 
 class PolymarketAPI:
 
@@ -25,33 +30,40 @@ class PolymarketAPI:
 
     def __init__(self, host="https://clob.polymarket.com/", key=None, chain_id=137):
 
-        self.HOST = "https://api.futuur.com/api/v1/"
+        self.HOST = host
         self.PRIVATE_KEY = key
         self.CHAIN_ID = chain_id
-        self.client = ClobClient(host, key=key, chain_id=chain_id)
-
-    def get_all_markets(self):
+        self.client = clob_client(host, key=key, chain_id=chain_id)
 
-        # params = {'offset': offset}
+    def get_all_markets(self, max_markets=3000, page_delay=2, path="poly_data.json"):
+        """
+        Fetches pages of CLOB markets until the end cursor or max_markets is reached.
 
-        # def get(endpoint, headers=None, data=None):
-        #     return request(endpoint, GET, headers, data)
+        Args:
+            max_markets (int): Stop paginating once this many markets were fetched. Default is 3000.
+            page_delay (float): Seconds to sleep between pages. Default is 2.
+            path (str, optional): Where to dump the markets as JSON. None skips the dump. Default is 'poly_data.json'.
 
-        response = self.client.get_markets()
+        Returns:
+            list: The markets, in CLOB order.
+        """
+        with span("pagination_page", venue="polymarket"):
+            response = self.client.get_markets()
 
         results: List = response.get("data")
         next_cursor = response.get("next_cursor")
 
-        count = 100
-        while next_cursor and count < 3000:
-            print(count)
-            count += 100
-            response = self.client.get_markets(next_cursor=next_cursor)
+        while next_cursor and next_cursor != END_CURSOR and len(results) < max_markets:
+            print(len(results))
+            with span("pagination_page", venue="polymarket"):
+                response = self.client.get_markets(next_cursor=next_cursor)
             results.extend(response.get("data"))
-            time.sleep(2)
+            next_cursor = response.get("next_cursor")
+            time.sleep(page_delay)
 
-        with open("poly_data.json", "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=4)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=4)
         return results
 
     # TODO get all (?) markets, or most markets with reasonable liquidity
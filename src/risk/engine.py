@@ -0,0 +1,253 @@
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+import settings
+from futuur.rates import PLAY_MONEY, RateCache
+
+# Names of the limits an order can breach, as reported by RiskCheck.breached
+MARKET = "market"
+VENUE = "venue"
+CATEGORY = "category"
+GLOBAL = "global"
+
+
+def futuur_category(market: dict):
+    """
+    The category id of a Futuur market payload, None when it has none.
+    """
+    categories = market.get("categories") or [market.get("category") or {}]
+    category = categories[0] if categories else {}
+    return category.get("id") if isinstance(category, dict) else category
+
+
+@dataclass
+class RiskLimits:
+    """
+    Maximum exposure, in USDC, per market, per venue, per category and overall. None disables a limit.
+
+    Attributes:
+        market (float, optional): Stake on a single market of a venue.
+        venue (float, optional): Stake on a venue, unless overridden in venues.
+        category (float, optional): Stake on a category, all venues together.
+        total (float, optional): Stake everywhere.
+        venues (dict): Per venue overrides of the venue limit.
+    """
+
+    market: Optional[float] = None
+    venue: Optional[float] = None
+    category: Optional[float] = None
+    total: Optional[float] = None
+    venues: Dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_settings(cls) -> "RiskLimits":
+        return cls(
+            market=settings.RISK_MARKET_LIMIT_USDC,
+            venue=settings.RISK_VENUE_LIMIT_USDC,
+            category=settings.RISK_CATEGORY_LIMIT_USDC,
+            total=settings.RISK_GLOBAL_LIMIT_USDC,
+        )
+
+    def venue_limit(self, venue: str) -> Optional[float]:
+        return self.venues.get(venue, self.venue)
+
+
+@dataclass
+class RiskCheck:
+    """
+    The answer to a proposed order.
+
+    Attributes:
+        allowed (bool): Whether the whole order fits every limit.
+        headroom (float): The largest stake that would fit, at most the proposed amount.
+        breached (str, optional): The first limit the order would breach: MARKET, VENUE, CATEGORY or GLOBAL.
+    """
+
+    allowed: bool
+    headroom: float
+    breached: Optional[str] = None
+
+
+class RiskEngine:
+    """
+    Keeps the open exposure per market, venue, category and overall in memory and checks orders against RiskLimits.
+
+    Exposure is updated incrementally: on_fill adds a position and on_settlement removes it, so a check is a handful
+    of dictionary lookups and never calls a venue. A SettlementTracker given the engine seeds it from the ledger and
+    feeds it every position added and settled. Amounts are in USDC; play money positions carry no risk and are not
+    counted.
+
+    Attributes:
+        limits (RiskLimits): The limits orders are checked against.
+        rates (RateCache, optional): Converts fills in other currencies to USDC.
+        unconverted (dict): Open amounts filled in a currency without a known USDC rate, per currency. They are
+            left out of the exposure, so they are logged and counted here rather than dropped silently.
+    """
+
+    def __init__(
+        self, limits: Optional[RiskLimits] = None, rates: Optional[RateCache] = None
+    ):
+        self.limits = limits or RiskLimits.from_settings()
+        self.rates = rates
+        self.lock = threading.Lock()
+        self.total = 0.0
+        self.by_market: Dict[Tuple[str, str], float] = {}
+        self.by_venue: Dict[str, float] = {}
+        self.by_category: Dict[object, float] = {}
+        self.categories: Dict[Tuple[str, str], object] = {}
+        self.unconverted: Dict[str, float] = {}
+        # (venue, position_id) -> (currency, amount) of the positions counted in unconverted
+        self.unconverted_positions: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        # (venue, position_id) -> (market key, USDC amount)
+        self.positions: Dict[Tuple[str, str], Tuple[Tuple[str, str], float]] = {}
+
+    @classmethod
+    def from_positions(
+        cls,
+        positions: Iterable,
+        limits: Optional[RiskLimits] = None,
+        rates: Optional[RateCache] = None,
+    ) -> "RiskEngine":
+        """
+        Builds an engine holding the given open positions, e.g. SettlementTracker.positions(open_only=True).
+        """
+        engine = cls(limits, rates)
+        for position in positions:
+            engine.on_fill(
+                position.venue,
+                position.position_id,
+                position.market_id,
+                position.amount,
+                position.currency,
+            )
+        return engine
+
+    def _usdc(self, amount: float, currency: Optional[str]) -> float:
+        """
+        The USDC value of an amount, NaN when its currency has no known rate.
+        """
+        if currency is None or currency.upper() == "USDC":
+            return float(amount)
+        if currency == PLAY_MONEY:
+            return 0.0
+        if self.rates is None:
+            return math.nan
+        return float(self.rates.to_usdc([amount], [currency])[0])
+
+    def _add(self, key: Tuple[str, str], amount: float):
+        category = self.categories.get(key)
+        self.total += amount
+        self.by_market[key] = self.by_market.get(key, 0.0) + amount
+        self.by_venue[key[0]] = self.by_venue.get(key[0], 0.0) + amount
+        if category is not None:
+            self.by_category[category] = self.by_category.get(category, 0.0) + amount
+
+    def set_category(self, venue: str, market_id, category):
+        """
+        Files a market under a category, moving the exposure it already has.
+        """
+        key = (venue, str(market_id))
+        with self.lock:
+            if self.categories.get(key) == category:
+                return
+            exposure = self.by_market.get(key, 0.0)
+            self._add(key, -exposure)
+            self.categories[key] = category
+            self._add(key, exposure)
+
+    def on_fill(
+        self,
+        venue: str,
+        position_id,
+        market_id,
+        amount: float,
+        currency: Optional[str] = "USDC",
+    ):
+        """
+        Adds a filled order. Filling the same position id twice counts it once.
+        """
+        position_key = (venue, str(position_id))
+        with self.lock:
+            if position_key in self.positions:
+                return
+        usdc = self._usdc(amount, currency)
+        key = (venue, str(market_id))
+        with self.lock:
+            if position_key in self.positions:
+                return
+            if math.isnan(usdc):
+                print(
+                    f"No USDC rate for {currency}: {amount} {currency} on {venue} market {market_id} "
+                    f"left out of the exposure"
+                )
+                usdc = 0.0
+                self.unconverted[currency] = (
+                    self.unconverted.get(currency, 0.0) + amount
+                )
+                self.unconverted_positions[position_key] = (currency, amount)
+            self.positions[position_key] = (key, usdc)
+            self._add(key, usdc)
+
+    def on_settlement(self, venue: str, position_id):
+        """
+        Releases the exposure of a settled, sold or cancelled position.
+        """
+        position_key = (venue, str(position_id))
+        with self.lock:
+            entry = self.positions.pop(position_key, None)
+            if entry:
+                self._add(entry[0], -entry[1])
+            unconverted = self.unconverted_positions.pop(position_key, None)
+            if unconverted:
+                currency, amount = unconverted
+                self.unconverted[currency] -= amount
+
+    def exposure(self, venue: str, market_id) -> float:
+        return self.by_market.get((venue, str(market_id)), 0.0)
+
+    def headroom(self, venue: Optional[str] = None, category=None) -> float:
+        """
+        Room left under the limit of a venue, of a category, or under the global limit when neither is given.
+        Infinite when that limit is disabled.
+        """
+        limits = self.limits
+        with self.lock:
+            if venue is not None:
+                limit, current = limits.venue_limit(venue), self.by_venue.get(
+                    venue, 0.0
+                )
+            elif category is not None:
+                limit, current = limits.category, self.by_category.get(category, 0.0)
+            else:
+                limit, current = limits.total, self.total
+        return math.inf if limit is None else max(0.0, limit - current)
+
+    def check(self, venue: str, market_id, amount: float) -> RiskCheck:
+        """
+        Checks a proposed stake, in USDC, on a market against every limit.
+        """
+        key = (venue, str(market_id))
+        limits = self.limits
+        with self.lock:
+            category = self.categories.get(key)
+            candidates = (
+                (MARKET, limits.market, self.by_market.get(key, 0.0)),
+                (VENUE, limits.venue_limit(venue), self.by_venue.get(venue, 0.0)),
+                (
+                    CATEGORY,
+                    limits.category if category is not None else None,
+                    self.by_category.get(category, 0.0),
+                ),
+                (GLOBAL, limits.total, self.total),
+            )
+        headroom, breached = float(amount), None
+        for name, limit, current in candidates:
+            if limit is None:
+                continue
+            room = max(0.0, limit - current)
+            if room < headroom:
+                headroom = room
+                breached = breached or name
+        return RiskCheck(allowed=breached is None, headroom=headroom, breached=breached)
@@ -0,0 +1,239 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import settings
+from alerts.sinks import sinks_from_settings
+from alerts.stream import OpportunityEvent, OpportunityStream
+from analysis.arbitrage import ARBITRAGE_THRESHOLD
+from history.recorder import POLYMARKET
+from matcher.registry import MatchRegistry
+from .evaluator import aggregate_values, opportunities
+from .price_table import SharedPriceTable
+from .worker import ScanPair, run_worker
+
+# Rows have a fixed number of outcome slots; pairs with more outcomes are skipped by the workers
+MAX_OUTCOMES = 32
+
+
+@dataclass
+class Opportunity:
+    pair: ScanPair
+    agg_value: float
+    updated_ms: int
+
+
+def load_scan_pairs(
+    registry: MatchRegistry, min_confidence: Optional[float] = None
+) -> List[ScanPair]:
+    """
+    The registry pairs a worker can quote: every Manifold pair, and Polymarket pairs known by condition id.
+    """
+    pairs = []
+    for match in registry.matches(min_confidence=min_confidence):
+        if match.venue == POLYMARKET and not str(match.market_id).startswith("0x"):
+            continue
+        pairs.append(
+            ScanPair(len(pairs), match.futuur_id, match.venue, match.market_id)
+        )
+    return pairs
+
+
+class ScanCoordinator:
+    """
+    Shards matched pairs across worker processes and evaluates every pair on each tick.
+
+    Workers fetch prices and match outcomes, so network waits and TF-IDF run in parallel, and publish the aligned
+    prices into a SharedPriceTable. The coordinator process owns the table and runs the evaluator over a snapshot of it.
+    The table only holds prices, so workers send the Futuur outcome titles of each row over a queue when they change.
+
+    Attributes:
+        pairs (list): The scanned pairs, pair i living in row i of the table.
+        workers (int): The number of worker processes.
+        interval (float): Seconds between two quotes of the same pair.
+        threshold (float): Aggregate values below this are opportunities.
+        max_staleness_ms (int, optional): Rows older than this are ignored by the evaluator.
+        outcome_titles (dict): The Futuur outcome title of each slot of each row, by pair index, None for the
+            outcomes only the other venue has.
+    """
+
+    def __init__(
+        self,
+        pairs: List[ScanPair],
+        workers: Optional[int] = None,
+        interval: float = 5.0,
+        max_outcomes: int = MAX_OUTCOMES,
+        threshold: float = ARBITRAGE_THRESHOLD,
+        max_staleness_ms: Optional[int] = None,
+    ):
+        self.pairs = pairs
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(pairs) or 1))
+        self.interval = interval
+        self.max_outcomes = max_outcomes
+        self.threshold = threshold
+        self.max_staleness_ms = max_staleness_ms
+        self.table: Optional[SharedPriceTable] = None
+        self.processes: List[multiprocessing.Process] = []
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_event = self.context.Event()
+        self.titles = self.context.Queue()
+        self.outcome_titles: Dict[int, List[Optional[str]]] = {}
+
+    def shards(self) -> List[List[ScanPair]]:
+        """
+        Splits the pairs round robin, so slow and fast markets spread evenly over the workers.
+        """
+        return [self.pairs[i :: self.workers] for i in range(self.workers)]
+
+    def start(self):
+        self.table = SharedPriceTable.create(len(self.pairs), self.max_outcomes)
+        self.stop_event.clear()
+        for index, shard in enumerate(self.shards()):
+            process = self.context.Process(
+                target=run_worker,
+                args=(
+                    self.table.spec,
+                    shard,
+                    self.interval,
+                    self.stop_event,
+                    index,
+                    self.titles,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self, timeout: float = 10.0):
+        self.stop_event.set()
+        self.receive_titles()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self.table:
+            self.table.close()
+            self.table.unlink()
+            self.table = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def receive_titles(self):
+        """
+        Stores the outcome titles the workers sent since the last call.
+        """
+        while True:
+            try:
+                index, titles = self.titles.get_nowait()
+            except queue.Empty:
+                return
+            self.outcome_titles[index] = titles
+
+    def evaluate(self) -> List[Opportunity]:
+        """
+        Runs the evaluator over the whole table and returns the current opportunities, cheapest first.
+        """
+        self.receive_titles()
+        snapshot = self.table.snapshot()
+        values = aggregate_values(snapshot, self.max_staleness_ms)
+        return [
+            Opportunity(self.pairs[i], float(values[i]), int(snapshot.updated_ms[i]))
+            for i in opportunities(values, self.threshold)
+        ]
+
+    def event(self, opportunity: Opportunity) -> Optional[OpportunityEvent]:
+        """
+        The opportunity as an alert event. Its outcomes are the Futuur outcomes of the row, by title, as run_main and
+        the Analizer report them, so the same opportunity has the same key whichever found it. None while the titles
+        of the row have not arrived yet.
+        """
+        pair = opportunity.pair
+        titles = self.outcome_titles.get(pair.index)
+        if titles is None:
+            return None
+        prices, _ = self.table.read_row(pair.index)
+        return OpportunityEvent(
+            venue=pair.venue,
+            futuur_id=pair.futuur_id,
+            market_id=pair.market_id,
+            outcomes=[
+                [title, float(f), float(o)]
+                for title, (f, o) in zip(titles, prices)
+                if title is not None
+            ],
+            agg_value=opportunity.agg_value,
+        )
+
+    def run(
+        self,
+        ticks: Optional[int] = None,
+        tick_interval: float = 1.0,
+        on_opportunity: Optional[Callable[[Opportunity], None]] = None,
+        stream: Optional[OpportunityStream] = None,
+    ):
+        """
+        Evaluates the table every tick_interval seconds, for the given number of ticks or until interrupted.
+
+        Args:
+            on_opportunity (callable, optional): Called with every opportunity of every tick. Default prints them
+                when no stream is given.
+            stream (OpportunityStream, optional): Receives the opportunities, so each is reported once until it
+                changes or disappears rather than on every tick.
+        """
+        if on_opportunity is None and stream is None:
+            on_opportunity = print
+        tick = 0
+        try:
+            while ticks is None or tick < ticks:
+                time.sleep(tick_interval)
+                found = self.evaluate()
+                if on_opportunity:
+                    for opportunity in found:
+                        on_opportunity(opportunity)
+                if stream:
+                    events = [self.event(opportunity) for opportunity in found]
+                    events = [event for event in events if event is not None]
+                    for event in events:
+                        stream.publish(event)
+                    stream.retain(events)
+                tick += 1
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scan the registry pairs for arbitrage with a pool of worker processes."
+    )
+    parser.add_argument("--registry", help="The match registry database")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--tick", type=float, default=1.0)
+    parser.add_argument("--ticks", type=int, default=None)
+    parser.add_argument("--min-confidence", type=float, default=None)
+    parser.add_argument("--max-staleness-ms", type=int, default=None)
+    args = parser.parse_args()
+
+    with MatchRegistry(args.registry) as registry:
+        scan_pairs = load_scan_pairs(registry, args.min_confidence)
+    print(f"Scanning {len(scan_pairs)} pairs")
+    with ScanCoordinator(
+        scan_pairs,
+        workers=args.workers,
+        interval=args.interval,
+        max_staleness_ms=args.max_staleness_ms,
+    ) as coordinator, OpportunityStream(
+        sinks_from_settings(), state_path=settings.ALERT_STATE_PATH
+    ) as stream:
+        coordinator.run(ticks=args.ticks, tick_interval=args.tick, stream=stream)
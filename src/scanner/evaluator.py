@@ -0,0 +1,47 @@
+from typing import Optional, Union
+
+import numpy as np
+
+from analysis.arbitrage import ARBITRAGE_THRESHOLD, cheapest_prices
+from history.price_store import now_ms
+from .price_table import FUTUUR_SIDE, OTHER_SIDE, PriceSnapshot, SharedPriceTable
+
+
+def aggregate_values(
+    table: Union[SharedPriceTable, PriceSnapshot],
+    max_staleness_ms: Optional[int] = None,
+    now: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Aggregate value of every pair of the table in one vectorized pass. A shared table is read through a snapshot,
+    so no row is seen half published.
+
+    Outcome slots beyond a pair's outcome count are ignored, while an outcome quoted on neither venue makes the
+    pair NaN. Pairs never published, or older than max_staleness_ms, are NaN as well.
+
+    Returns:
+        numpy.ndarray: One aggregate value per pair.
+    """
+    if isinstance(table, SharedPriceTable):
+        table = table.snapshot()
+    cheapest = cheapest_prices(
+        table.prices[:, :, FUTUUR_SIDE], table.prices[:, :, OTHER_SIDE], np.nan
+    )
+    in_use = np.arange(table.prices.shape[1]) < table.n_outcomes[:, None]
+    values = np.where(in_use, cheapest, 0.0).sum(axis=1)
+
+    stale = table.updated_ms == 0
+    if max_staleness_ms is not None:
+        now = now if now is not None else now_ms()
+        stale |= now - table.updated_ms > max_staleness_ms
+    values[stale] = np.nan
+    return values
+
+
+def opportunities(values: np.ndarray, threshold=ARBITRAGE_THRESHOLD) -> np.ndarray:
+    """
+    Indices of the pairs whose aggregate value is below the threshold, cheapest first.
+    """
+    with np.errstate(invalid="ignore"):
+        indices = np.flatnonzero(values < threshold)
+    return indices[np.argsort(values[indices])]
@@ -0,0 +1,205 @@
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from history.price_store import now_ms
+
+FUTUUR_SIDE = 0
+OTHER_SIDE = 1
+VENUE_SIDES = 2
+# Times a reader copies a row that is being written before giving up on it, see SharedPriceTable.snapshot
+MAX_READ_RETRIES = 1000
+
+
+@dataclass(frozen=True)
+class PriceTableSpec:
+    """
+    Everything a process needs to attach to an existing SharedPriceTable. Small enough to pickle to workers.
+    """
+
+    name: str
+    n_pairs: int
+    max_outcomes: int
+
+
+@dataclass
+class PriceSnapshot:
+    """
+    A consistent copy of a SharedPriceTable: every row is as one publish left it.
+    """
+
+    prices: np.ndarray
+    updated_ms: np.ndarray
+    n_outcomes: np.ndarray
+
+
+class SharedPriceTable:
+    """
+    A (pair, outcome, venue) NumPy price table living in shared memory.
+
+    Scan workers publish the prices of the pairs they own and the evaluator reads the same memory without copying.
+    Each pair row has a single writer, the worker its pair was sharded to. Rows carry the number of outcomes of the
+    pair and the time they were last published; unused outcome slots and unpublished rows are NaN.
+
+    Rows are guarded by a sequence lock: publish makes the sequence of the row odd before writing and even again
+    after, and readers copy rows, see snapshot and read_row, retrying the ones whose sequence was odd or moved
+    during the copy. Readers never block the writers and never see half of a publish.
+
+    Layout of the shared block:
+        prices      float64 (n_pairs, max_outcomes, 2)   side 0 is Futuur, side 1 the other venue
+        updated_ms  int64   (n_pairs,)                   0 until the row is first published
+        seq         int64   (n_pairs,)                   odd while the row is being written
+        n_outcomes  int32   (n_pairs,)
+
+    Attributes:
+        spec (PriceTableSpec): The name and shape of the table.
+        prices (numpy.ndarray): The price view.
+        updated_ms (numpy.ndarray): When each row was last published, in milliseconds.
+        seq (numpy.ndarray): The sequence of each row, bumped before and after every publish.
+        n_outcomes (numpy.ndarray): How many outcome slots of each row are in use.
+    """
+
+    def __init__(
+        self, spec: PriceTableSpec, shm: shared_memory.SharedMemory, owner: bool
+    ):
+        self.spec = spec
+        self.shm = shm
+        self.owner = owner
+        prices_size = spec.n_pairs * spec.max_outcomes * VENUE_SIDES * 8
+        self.prices = np.ndarray(
+            (spec.n_pairs, spec.max_outcomes, VENUE_SIDES),
+            dtype=np.float64,
+            buffer=shm.buf,
+        )
+        self.updated_ms = np.ndarray(
+            (spec.n_pairs,), dtype=np.int64, buffer=shm.buf, offset=prices_size
+        )
+        self.seq = np.ndarray(
+            (spec.n_pairs,),
+            dtype=np.int64,
+            buffer=shm.buf,
+            offset=prices_size + spec.n_pairs * 8,
+        )
+        self.n_outcomes = np.ndarray(
+            (spec.n_pairs,),
+            dtype=np.int32,
+            buffer=shm.buf,
+            offset=prices_size + spec.n_pairs * 16,
+        )
+
+    @staticmethod
+    def _size(n_pairs: int, max_outcomes: int) -> int:
+        return max(1, n_pairs * (max_outcomes * VENUE_SIDES * 8 + 8 + 8 + 4))
+
+    @classmethod
+    def create(cls, n_pairs: int, max_outcomes: int) -> "SharedPriceTable":
+        """
+        Allocates a new table. The creating process owns it and must unlink it when done.
+        """
+        shm = shared_memory.SharedMemory(
+            create=True, size=cls._size(n_pairs, max_outcomes)
+        )
+        table = cls(PriceTableSpec(shm.name, n_pairs, max_outcomes), shm, owner=True)
+        table.prices.fill(np.nan)
+        table.updated_ms.fill(0)
+        table.seq.fill(0)
+        table.n_outcomes.fill(0)
+        return table
+
+    @classmethod
+    def attach(cls, spec: PriceTableSpec) -> "SharedPriceTable":
+        """
+        Attaches to a table created by another process.
+        """
+        # Worker processes share the owner's resource tracker, so the block stays registered once and is only
+        # unlinked by the owner, or by the tracker if the owner dies.
+        shm = shared_memory.SharedMemory(name=spec.name)
+        return cls(spec, shm, owner=False)
+
+    def publish(
+        self,
+        pair: int,
+        futuur_prices: Sequence[Optional[float]],
+        other_prices: Sequence[Optional[float]],
+        timestamp: Optional[int] = None,
+    ):
+        """
+        Writes the aligned outcome prices of one pair. Missing prices are given as None or NaN.
+
+        Raises:
+            ValueError: When the pair has more outcomes than the table has slots, since a truncated pair would look
+                cheaper than it is.
+        """
+        count = len(futuur_prices)
+        if count != len(other_prices):
+            raise ValueError("Both sides must list the same outcomes")
+        if count > self.spec.max_outcomes:
+            raise ValueError(
+                f"Pair {pair} has {count} outcomes, the table holds {self.spec.max_outcomes}"
+            )
+        futuur_prices = np.asarray(futuur_prices, dtype=float)
+        other_prices = np.asarray(other_prices, dtype=float)
+        row = self.prices[pair]
+        self.seq[pair] += 1
+        try:
+            row[:count, FUTUUR_SIDE] = futuur_prices
+            row[:count, OTHER_SIDE] = other_prices
+            row[count:] = np.nan
+            self.n_outcomes[pair] = count
+            self.updated_ms[pair] = timestamp if timestamp is not None else now_ms()
+        finally:
+            self.seq[pair] += 1
+
+    def snapshot(self, max_retries: int = MAX_READ_RETRIES) -> PriceSnapshot:
+        """
+        Copies the whole table, then copies again only the rows a publish went through meanwhile.
+
+        Rows still being written after max_retries attempts, which only happens when their worker died in the middle
+        of a publish, are returned as never published.
+        """
+        rows = np.arange(self.spec.n_pairs)
+        prices = np.empty_like(self.prices)
+        updated_ms = np.empty_like(self.updated_ms)
+        n_outcomes = np.empty_like(self.n_outcomes)
+        for _ in range(max_retries):
+            before = self.seq[rows]
+            prices[rows] = self.prices[rows]
+            updated_ms[rows] = self.updated_ms[rows]
+            n_outcomes[rows] = self.n_outcomes[rows]
+            torn = (before % 2 == 1) | (self.seq[rows] != before)
+            rows = rows[torn]
+            if not len(rows):
+                break
+            # Give the writers a chance to finish
+            time.sleep(0)
+        prices[rows] = np.nan
+        updated_ms[rows] = 0
+        n_outcomes[rows] = 0
+        return PriceSnapshot(prices, updated_ms, n_outcomes)
+
+    def read_row(
+        self, pair: int, max_retries: int = MAX_READ_RETRIES
+    ) -> Tuple[np.ndarray, int]:
+        """
+        A consistent copy of the prices in use of one row, and when they were published. See snapshot.
+        """
+        for _ in range(max_retries):
+            before = int(self.seq[pair])
+            prices = self.prices[pair, : self.n_outcomes[pair]].copy()
+            updated_ms = int(self.updated_ms[pair])
+            if before % 2 == 0 and int(self.seq[pair]) == before:
+                return prices, updated_ms
+            time.sleep(0)
+        return self.prices[pair, :0].copy(), 0
+
+    def close(self):
+        # Drop the views first, the block cannot be closed while NumPy still exports its buffer
+        self.prices = self.updated_ms = self.seq = self.n_outcomes = None
+        self.shm.close()
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,192 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+import settings
+from analysis.arbitrage import (
+    align_manifold_answers,
+    best_outcome_match,
+    manifold_answers,
+)
+from futuur.futuur_api import FutuurAPI
+from futuur.rates import FutuurPriceTable
+from history.recorder import MANIFOLD, POLYMARKET
+from instrumentation.telemetry import span
+from manifold.manifold_api import ManifoldAPI
+from matcher.registry import content_hash
+from transport.record_replay import clob_client, get_transport, set_archive_name
+from .price_table import PriceTableSpec, SharedPriceTable
+
+# Futuur currency pool compared against each venue: play money against mana, real money against USDC
+VENUE_BASIS = {MANIFOLD: "play_money", POLYMARKET: "real_money"}
+
+# An aligned outcome: its index on the other venue and its index on Futuur, either None when unmatched
+Row = Tuple[Optional[int], Optional[int]]
+
+
+@dataclass(frozen=True)
+class ScanPair:
+    """
+    A matched pair and its row in the shared price table.
+    """
+
+    index: int
+    futuur_id: object
+    venue: str
+    market_id: str
+
+
+class PairQuoter:
+    """
+    Fetches both sides of a pair and aligns their prices outcome by outcome.
+
+    Manifold pairs are aligned on the Manifold answers, as the Analizer does, so answers without a Futuur outcome
+    still count; Polymarket pairs are aligned on the Futuur outcomes, as run_main does. Polymarket outcomes are
+    matched with TF-IDF, which is the CPU heavy part of a scan, so each alignment is cached until the titles or
+    outcomes of either side change.
+    """
+
+    def __init__(self):
+        self.futuur_api = FutuurAPI(
+            settings.FUTUUR_PUBLIC_KEY,
+            settings.FUTUUR_PRIVATE_KEY,
+            base_url=settings.FUTUUR_BASE_URL,
+        )
+        self.manifold_api = ManifoldAPI(
+            base_url=settings.MANIFOLD_BASE_URL, api_key=settings.MANIFOLD_API_KEY
+        )
+        self.poly_client = clob_client(
+            settings.POLYMARKET_HOST,
+            key=settings.POLYMARKET_KEY,
+            chain_id=settings.POLYMARKET_CHAIN_ID,
+        )
+        self.outcome_maps: Dict[Tuple[int, str], List[Row]] = {}
+
+    def quote(
+        self, pair: ScanPair
+    ) -> Optional[
+        Tuple[List[Optional[float]], List[Optional[float]], List[Optional[str]]]
+    ]:
+        """
+        Returns the Futuur prices, the other venue prices and the Futuur outcome titles of every aligned outcome of
+        the pair, or None when the other venue does not price the market yet. Outcomes without a Futuur side have no
+        title.
+        """
+        futuur_market = self.futuur_api.get_market(pair.futuur_id)
+        futuur_outcomes = futuur_market.get("outcomes") or []
+        futuur_prices = FutuurPriceTable([futuur_market]).outcome_probabilities(
+            (o.get("id") for o in futuur_outcomes), basis=VENUE_BASIS[pair.venue]
+        )
+
+        if pair.venue == MANIFOLD:
+            market = self.manifold_api.get_market_by_id(pair.market_id)
+            answers = manifold_answers(market)
+            if answers is None:
+                return None
+            other_titles = [text for text, _ in answers]
+            other_prices = [probability for _, probability in answers]
+        else:
+            market = self.poly_client.get_market(condition_id=pair.market_id)
+            tokens = market.get("tokens") or []
+            other_titles = [token.get("outcome") for token in tokens]
+            other_prices = [token.get("price") for token in tokens]
+
+        with span("match_batch", venue=pair.venue):
+            rows = self._outcome_map(pair, futuur_market, other_titles)
+        return (
+            [futuur_prices[f] if f is not None else None for _, f in rows],
+            [other_prices[o] if o is not None else None for o, _ in rows],
+            [
+                futuur_outcomes[f].get("title") if f is not None else None
+                for _, f in rows
+            ],
+        )
+
+    def _outcome_map(
+        self, pair: ScanPair, futuur_market: dict, other_titles: List[str]
+    ) -> List[Row]:
+        futuur_titles = [o.get("title") for o in futuur_market.get("outcomes") or []]
+        key = (
+            pair.index,
+            content_hash(futuur_market.get("title"), futuur_titles)
+            + content_hash(None, other_titles),
+        )
+        rows = self.outcome_maps.get(key)
+        if rows is None:
+            if pair.venue == MANIFOLD:
+                rows = align_manifold_answers(other_titles, futuur_titles)
+            else:
+                rows = [
+                    (best_outcome_match(title, other_titles)[0], f)
+                    for f, title in enumerate(futuur_titles)
+                ]
+            self.outcome_maps[key] = rows
+        return rows
+
+
+def run_worker(
+    spec: PriceTableSpec,
+    pairs: List[ScanPair],
+    interval: float,
+    stop,
+    shard: int = 0,
+    titles=None,
+):
+    """
+    Worker process entry point: quotes its shard of pairs every interval seconds and publishes the prices into the
+    shared table until the stop event is set.
+
+    Args:
+        spec (PriceTableSpec): The shared table to attach to.
+        pairs (list): The pairs owned by this worker. No other process writes their rows.
+        interval (float): Seconds between the starts of two passes over the shard.
+        stop (multiprocessing.Event): Set by the coordinator to end the worker.
+        shard (int): The index of the shard, which names the archive of a recorded or replayed scan.
+        titles (multiprocessing.Queue, optional): Receives (pair index, outcome titles) before the first prices of
+            a pair and whenever its titles change, so the coordinator can name the outcomes of a row.
+    """
+    set_archive_name(f"worker{shard}")
+    table = SharedPriceTable.attach(spec)
+    quoter = PairQuoter()
+    # Pairs with more outcomes than the table holds, reported once and no longer quoted
+    oversized = set()
+    sent_titles: Dict[int, List[Optional[str]]] = {}
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            for pair in pairs:
+                if stop.is_set():
+                    break
+                if pair.index in oversized:
+                    continue
+                try:
+                    quote = quoter.quote(pair)
+                    if quote is None:
+                        continue
+                    futuur_prices, other_prices, outcome_titles = quote
+                    if len(futuur_prices) > spec.max_outcomes:
+                        oversized.add(pair.index)
+                        print(
+                            f"Skipping pair {pair}: {len(futuur_prices)} outcomes, "
+                            f"the table holds {spec.max_outcomes}"
+                        )
+                        continue
+                    if (
+                        titles is not None
+                        and sent_titles.get(pair.index) != outcome_titles
+                    ):
+                        titles.put((pair.index, outcome_titles))
+                        sent_titles[pair.index] = outcome_titles
+                    table.publish(pair.index, futuur_prices, other_prices)
+                except Exception as e:
+                    # One broken market must not stop the shard, its row just goes stale
+                    print(f"Failed to quote pair {pair}: {e!r}")
+            stop.wait(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        table.close()
+        if titles is not None:
+            # Titles the coordinator no longer reads must not keep the process from exiting
+            titles.cancel_join_thread()
+        # Worker processes skip atexit, so a recording must be closed here to be readable
+        get_transport().close()
@@ -10,6 +10,80 @@ load_dotenv(dotenv_path)
 FUTUUR_PUBLIC_KEY = os.environ.get("FUTUUR_PUBLIC_KEY")
 FUTUUR_PRIVATE_KEY = os.environ.get("FUTUUR_PRIVATE_KEY")
 
+# Leave unset to use the production APIs, or point at the local mock venue server.
+FUTUUR_BASE_URL = os.environ.get("FUTUUR_BASE_URL")
+# How long Futuur currency rates are cached, in seconds
+FUTUUR_RATES_TTL = float(os.environ.get("FUTUUR_RATES_TTL", 300))
+MANIFOLD_BASE_URL = os.environ.get("MANIFOLD_BASE_URL")
+MANIFOLD_API_KEY = os.environ.get("MANIFOLD_API_KEY")
+
 POLYMARKET_HOST = os.environ.get("POLYMARKET_HOST")
 POLYMARKET_KEY = os.environ.get("POLYMARKET_KEY")
 POLYMARKET_CHAIN_ID = os.environ.get("POLYMARKET_CHAIN_ID")
+
+PRICE_HISTORY_DIR = os.environ.get(
+    "PRICE_HISTORY_DIR", os.path.join(BASE_DIR, "price_history")
+)
+
+MATCH_REGISTRY_PATH = os.environ.get(
+    "MATCH_REGISTRY_PATH", os.path.join(BASE_DIR, "matches.db")
+)
+
+# Futuur markets discovered through related markets, see matcher/crawler.py
+RELATED_GRAPH_PATH = os.environ.get(
+    "RELATED_GRAPH_PATH", os.path.join(BASE_DIR, "related_markets.db")
+)
+
+SETTLEMENT_LEDGER_PATH = os.environ.get(
+    "SETTLEMENT_LEDGER_PATH", os.path.join(BASE_DIR, "settlement.db")
+)
+
+# Results of the last analysis, reused for pairs whose markets did not change
+ANALYSIS_CACHE_PATH = os.environ.get(
+    "ANALYSIS_CACHE_PATH", os.path.join(BASE_DIR, "analysis_cache.json")
+)
+
+
+# Risk limits in USDC; an empty value disables a limit
+def _limit(name, default):
+    value = os.environ.get(name, default)
+    return float(value) if value not in (None, "") else None
+
+
+RISK_MARKET_LIMIT_USDC = _limit("RISK_MARKET_LIMIT_USDC", 50)
+RISK_VENUE_LIMIT_USDC = _limit("RISK_VENUE_LIMIT_USDC", 500)
+RISK_CATEGORY_LIMIT_USDC = _limit("RISK_CATEGORY_LIMIT_USDC", 200)
+RISK_GLOBAL_LIMIT_USDC = _limit("RISK_GLOBAL_LIMIT_USDC", 1000)
+# Capital allocated across the opportunities of a scan, and how: 'greedy' or 'lp'
+SCAN_BUDGET_USDC = _limit("SCAN_BUDGET_USDC", 100)
+RANKING_METHOD = os.environ.get("RANKING_METHOD", "greedy")
+if RANKING_METHOD not in ("greedy", "lp"):
+    raise ValueError(f"RANKING_METHOD must be 'greedy' or 'lp', not {RANKING_METHOD!r}")
+# Fraction of the stake each venue keeps as fees
+FUTUUR_FEE = float(os.environ.get("FUTUUR_FEE", 0))
+MANIFOLD_FEE = float(os.environ.get("MANIFOLD_FEE", 0))
+POLYMARKET_FEE = float(os.environ.get("POLYMARKET_FEE", 0))
+
+# Where opportunity alerts are sent; alerts are printed when none is set
+ALERT_JSONL_PATH = os.environ.get("ALERT_JSONL_PATH")
+ALERT_WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL")
+# 'host:port' for TCP or the path of a Unix socket
+ALERT_SOCKET_ADDRESS = os.environ.get("ALERT_SOCKET_ADDRESS")
+# What was already reported, so a new run does not report the same opportunities again; empty to keep it in memory
+ALERT_STATE_PATH = os.environ.get(
+    "ALERT_STATE_PATH", os.path.join(BASE_DIR, "alert_state.json")
+)
+
+# 'live', 'record' to archive every venue request of a run, or 'replay' to answer them from the archive
+HTTP_MODE = os.environ.get("HTTP_MODE", "live")
+# '{name}' is replaced by the archive name of the process, so scanner workers do not share the archive of the main
+# process; a path without it gets the name appended, see transport.record_replay.archive_path
+HTTP_ARCHIVE_PATH = os.environ.get(
+    "HTTP_ARCHIVE_PATH", os.path.join(BASE_DIR, "http_archive_{name}.zip")
+)
+# 'fast', or 'original' to replay each request with its recorded latency
+HTTP_REPLAY_TIMING = os.environ.get("HTTP_REPLAY_TIMING", "fast")
+
+TELEMETRY_ENABLED = os.environ.get("TELEMETRY_ENABLED", "").lower() in ("1", "true")
+# '.prom' files get Prometheus text, any other path gets JSON lines
+TELEMETRY_EXPORT_PATH = os.environ.get("TELEMETRY_EXPORT_PATH")
@@ -0,0 +1,613 @@
+import argparse
+import datetime
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from py_clob_client.client import ClobClient
+
+import settings
+from futuur.futuur_api import FutuurAPI
+from history.price_store import now_ms
+from history.recorder import FUTUUR, MANIFOLD, POLYMARKET
+from manifold.manifold_api import ManifoldAPI
+from risk.engine import RiskEngine, futuur_category
+from transport.record_replay import clob_client
+
+# Futuur bet statuses, see FutuurAPI.get_betting_list
+BET_PURCHASED = "p"
+BET_WON = "w"
+BET_LOST = "l"
+BET_SOLD = "s"
+BET_CANCELLED = "x"
+BET_DISABLED = "d"
+SETTLED_BET_STATUSES = {BET_WON, BET_LOST, BET_SOLD, BET_CANCELLED, BET_DISABLED}
+
+# Futuur market statuses, see FutuurAPI.get_markets
+MARKET_OPEN = "o"
+MARKET_STOPPED = "s"
+MARKET_CLOSED = "c"
+MARKET_CANCELLED = "x"
+MARKET_REVERSED = "r"
+SETTLED_MARKET_STATUSES = {MARKET_CLOSED, MARKET_CANCELLED, MARKET_REVERSED}
+
+# Markets closing within this window, or already past their close date, are polled often; the others rarely
+NEAR_CLOSE_MS = 24 * 3600 * 1000
+POLL_NEAR_CLOSE_MS = 5 * 60 * 1000
+POLL_FAR_MS = 6 * 3600 * 1000
+# Settled Futuur markets are still fetched every POLL_FAR_MS for this long, since a result can be reversed
+REVERSAL_WINDOW_MS = 30 * 24 * 3600 * 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS markets (
+    venue TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    title TEXT,
+    status TEXT,
+    close_ms INTEGER,
+    resolution TEXT,
+    settled INTEGER NOT NULL DEFAULT 0,
+    last_checked_ms INTEGER,
+    category,
+    PRIMARY KEY (venue, market_id)
+);
+CREATE TABLE IF NOT EXISTS positions (
+    venue TEXT NOT NULL,
+    position_id TEXT NOT NULL,
+    market_id TEXT NOT NULL,
+    outcome_id TEXT,
+    currency TEXT,
+    amount REAL NOT NULL DEFAULT 0,
+    shares REAL NOT NULL DEFAULT 0,
+    status TEXT,
+    opened_ms INTEGER,
+    settled_ms INTEGER,
+    payout REAL,
+    pnl REAL,
+    PRIMARY KEY (venue, position_id)
+);
+CREATE INDEX IF NOT EXISTS positions_market ON positions (venue, market_id);
+CREATE INDEX IF NOT EXISTS positions_open ON positions (settled_ms);
+CREATE INDEX IF NOT EXISTS markets_open ON markets (settled, close_ms);
+"""
+
+
+def _iso_to_ms(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(
+            datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            * 1000
+        )
+    except ValueError:
+        return None
+
+
+@dataclass
+class Position:
+    venue: str
+    position_id: str
+    market_id: str
+    outcome_id: Optional[str]
+    currency: Optional[str]
+    amount: float
+    shares: float
+    status: Optional[str] = None
+    opened_ms: Optional[int] = None
+    settled_ms: Optional[int] = None
+    payout: Optional[float] = None
+    pnl: Optional[float] = None
+
+
+@dataclass
+class MarketState:
+    venue: str
+    market_id: str
+    title: Optional[str] = None
+    status: Optional[str] = None
+    close_ms: Optional[int] = None
+    resolution: Optional[str] = None
+    settled: bool = False
+    last_checked_ms: Optional[int] = None
+    category: Optional[object] = None
+
+
+class SettlementTracker:
+    """
+    Follows the resolution of every market we hold a position in, on Futuur, Manifold and Polymarket, and keeps a
+    realized PnL ledger in SQLite.
+
+    Tracking is incremental: only unsettled markets are polled, often when they are near or past their close date
+    and rarely otherwise, and a settled market or position is never fetched again. Futuur positions are discovered
+    from the active bets; positions on other venues are added with add_position.
+
+    With a RiskEngine, the engine follows the ledger: it is seeded with the open positions and their categories,
+    every position added is filled into it and every position settled is released from it.
+
+    Attributes:
+        path (str): The SQLite ledger file, or ':memory:'.
+        risk (RiskEngine, optional): The engine kept in line with the ledger.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        futuur_api: Optional[FutuurAPI] = None,
+        manifold_api: Optional[ManifoldAPI] = None,
+        poly_client: Optional[ClobClient] = None,
+        risk: Optional[RiskEngine] = None,
+    ):
+        """
+        Initializes the SettlementTracker instance, creating the ledger tables when needed.
+
+        Args:
+            path (str, optional): The SQLite ledger file. Default is settings.SETTLEMENT_LEDGER_PATH.
+            futuur_api, manifold_api, poly_client (optional): The venue clients. Default clients use the settings.
+            risk (RiskEngine, optional): An engine to seed from the ledger and keep up to date.
+        """
+        self.path = path or settings.SETTLEMENT_LEDGER_PATH
+        self.futuur_api = futuur_api or FutuurAPI(
+            settings.FUTUUR_PUBLIC_KEY,
+            settings.FUTUUR_PRIVATE_KEY,
+            base_url=settings.FUTUUR_BASE_URL,
+        )
+        self.manifold_api = manifold_api or ManifoldAPI(
+            base_url=settings.MANIFOLD_BASE_URL, api_key=settings.MANIFOLD_API_KEY
+        )
+        self.poly_client = poly_client
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self.risk = risk
+        if risk is not None:
+            self._seed_risk()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # Ledger
+
+    def _execute(self, sql: str, params=()):
+        with self.lock, self.connection:
+            return self.connection.execute(sql, params)
+
+    def _fetch(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def market(self, venue: str, market_id) -> Optional[MarketState]:
+        rows = self._fetch(
+            "SELECT * FROM markets WHERE venue = ? AND market_id = ?",
+            (venue, str(market_id)),
+        )
+        return MarketState(**dict(rows[0])) if rows else None
+
+    def positions(self, venue: Optional[str] = None, open_only=False) -> List[Position]:
+        sql, params = "SELECT * FROM positions WHERE 1 = 1", []
+        if venue:
+            sql += " AND venue = ?"
+            params.append(venue)
+        if open_only:
+            sql += " AND settled_ms IS NULL"
+        return [Position(**dict(row)) for row in self._fetch(sql, tuple(params))]
+
+    # Risk
+
+    def _seed_risk(self):
+        """
+        Fills the open positions of the ledger into the risk engine, filed under the category of their market, and
+        releases the ones settled since the engine last saw them. Filling is idempotent, so an engine kept from an
+        earlier run can be seeded again.
+        """
+        for row in self._fetch("SELECT venue, market_id, category FROM markets"):
+            if row["category"] is not None:
+                self.risk.set_category(row["venue"], row["market_id"], row["category"])
+        for position in self.positions():
+            if position.settled_ms is None:
+                self._fill_risk(position)
+            else:
+                self.risk.on_settlement(position.venue, position.position_id)
+
+    def _fill_risk(self, position: Position):
+        if self.risk is not None:
+            self.risk.on_fill(
+                position.venue,
+                position.position_id,
+                position.market_id,
+                position.amount,
+                position.currency,
+            )
+
+    def _save_market(self, state: MarketState):
+        if self.risk is not None and state.category is not None:
+            self.risk.set_category(state.venue, state.market_id, state.category)
+        self._execute(
+            "INSERT INTO markets (venue, market_id, title, status, close_ms, resolution, settled, last_checked_ms, "
+            "category) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (venue, market_id) DO UPDATE SET "
+            "title = COALESCE(excluded.title, title), status = excluded.status, "
+            "close_ms = COALESCE(excluded.close_ms, close_ms), resolution = excluded.resolution, "
+            "settled = excluded.settled, last_checked_ms = excluded.last_checked_ms, "
+            "category = COALESCE(excluded.category, category)",
+            (
+                state.venue,
+                str(state.market_id),
+                state.title,
+                state.status,
+                state.close_ms,
+                state.resolution,
+                int(state.settled),
+                state.last_checked_ms,
+                state.category,
+            ),
+        )
+
+    def add_position(
+        self,
+        venue: str,
+        position_id,
+        market_id,
+        outcome_id,
+        amount: float,
+        shares: float,
+        currency: Optional[str] = None,
+        close_ms: Optional[int] = None,
+        category=None,
+    ) -> Position:
+        """
+        Adds a position to follow, e.g. a Polymarket or Manifold bet placed by hand, and fills it into the risk
+        engine. Existing positions are kept.
+
+        Args:
+            venue (str): FUTUUR, MANIFOLD or POLYMARKET.
+            position_id: Any id unique within the venue, e.g. the bet or order id.
+            market_id: The market id, a condition id on Polymarket.
+            outcome_id: The outcome bought: a Futuur outcome id, a Manifold 'YES'/'NO' or answer id, a Polymarket
+                token id.
+            amount (float): The stake.
+            shares (float): The shares bought. A share pays 1 when its outcome wins.
+            currency (str, optional): The stake currency.
+            close_ms (int, optional): The market close time, fetched by the next poll when missing.
+            category (optional): The Futuur category the market counts against, see risk.engine.futuur_category.
+        """
+        self._execute(
+            "INSERT OR IGNORE INTO positions (venue, position_id, market_id, outcome_id, currency, amount, shares, "
+            "status, opened_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                venue,
+                str(position_id),
+                str(market_id),
+                None if outcome_id is None else str(outcome_id),
+                currency,
+                amount,
+                shares,
+                BET_PURCHASED,
+                now_ms(),
+            ),
+        )
+        state = self.market(venue, market_id)
+        if state is None:
+            # Never checked, so the next poll fetches it; settling is left to poll
+            self._save_market(
+                MarketState(venue, str(market_id), close_ms=close_ms, category=category)
+            )
+        elif category is not None and state.category is None:
+            state.category = category
+            self._save_market(state)
+        position = next(
+            p for p in self.positions(venue) if p.position_id == str(position_id)
+        )
+        if position.settled_ms is None:
+            self._fill_risk(position)
+        return position
+
+    def _settle_position(
+        self, position: Position, status: str, payout: float, now: int
+    ):
+        self._execute(
+            "UPDATE positions SET status = ?, payout = ?, pnl = ?, settled_ms = ? WHERE venue = ? AND position_id = ?",
+            (
+                status,
+                payout,
+                payout - position.amount,
+                now,
+                position.venue,
+                position.position_id,
+            ),
+        )
+        if self.risk is not None:
+            self.risk.on_settlement(position.venue, position.position_id)
+
+    # Discovery
+
+    def sync_futuur_positions(self, currency_mode="real_money", page_size=40) -> int:
+        """
+        Adds the active Futuur bets that are not in the ledger yet, one purchase per position. Positions are keyed
+        on the bet and purchase ids, so selling a purchase does not shift the others.
+
+        Returns:
+            int: The number of new positions.
+        """
+        known = {p.position_id for p in self.positions(FUTUUR)}
+        added, offset = 0, 0
+        while True:
+            response = self.futuur_api.get_betting_list(
+                active=True, currency_mode=currency_mode, limit=page_size, offset=offset
+            )
+            bets = response.get("results") or []
+            for bet in bets:
+                question = bet.get("question") or {}
+                market_id = question.get("id")
+                outcome_id = (bet.get("outcome") or {}).get("id")
+                purchases = bet.get("active_purchases") or []
+                for i, purchase in enumerate(purchases):
+                    purchase_id = purchase.get("id") or purchase.get("created") or i
+                    position_id = f"{bet.get('id')}:{purchase_id}"
+                    if position_id in known:
+                        continue
+                    self.add_position(
+                        FUTUUR,
+                        position_id,
+                        market_id,
+                        outcome_id,
+                        amount=purchase.get("amount") or 0,
+                        shares=purchase.get("shares") or 0,
+                        currency=purchase.get("currency"),
+                        category=futuur_category(question),
+                    )
+                    added += 1
+            if not (response.get("pagination") or {}).get("next") or not bets:
+                return added
+            offset += len(bets)
+
+    # Polling
+
+    def is_due(self, state: MarketState, now: int) -> bool:
+        """
+        Whether a market with open positions should be polled now: often when it closes soon, already closed or
+        resolved with bets still unsettled, rarely otherwise, so early resolutions are still noticed.
+        """
+        if state.last_checked_ms is None:
+            return True
+        near_close = (
+            state.settled
+            or state.close_ms is None
+            or state.close_ms - now <= NEAR_CLOSE_MS
+        )
+        interval = POLL_NEAR_CLOSE_MS if near_close else POLL_FAR_MS
+        return now - state.last_checked_ms >= interval
+
+    def poll(self, now: Optional[int] = None) -> List[Position]:
+        """
+        Polls every due market holding an open position and settles the positions of resolved markets.
+
+        Returns:
+            list: The positions settled by this poll.
+        """
+        now = now if now is not None else now_ms()
+        rows = self._fetch(
+            "SELECT DISTINCT m.* FROM markets m JOIN positions p "
+            "ON p.venue = m.venue AND p.market_id = m.market_id "
+            "WHERE p.settled_ms IS NULL"
+        )
+        # Settled Futuur markets whose positions settled recently, checked for a reversed result
+        reversible = self._fetch(
+            "SELECT DISTINCT m.* FROM markets m JOIN positions p "
+            "ON p.venue = m.venue AND p.market_id = m.market_id "
+            "WHERE m.venue = ? AND m.settled = 1 AND m.last_checked_ms <= ? "
+            "GROUP BY m.venue, m.market_id HAVING COUNT(p.settled_ms) = COUNT(*) "
+            "AND MAX(p.settled_ms) >= ?",
+            (FUTUUR, now - POLL_FAR_MS, now - REVERSAL_WINDOW_MS),
+        )
+        settled = []
+        for row in rows:
+            state = MarketState(**dict(row))
+            if self.is_due(state, now):
+                settled.extend(self.poll_market(state.venue, state.market_id, now))
+        for row in reversible:
+            settled.extend(self.poll_market(FUTUUR, row["market_id"], now))
+        return settled
+
+    def poll_market(
+        self, venue: str, market_id, now: Optional[int] = None
+    ) -> List[Position]:
+        """
+        Fetches one market, stores its state and settles its open positions when it resolved.
+        """
+        now = now if now is not None else now_ms()
+        fetch = {
+            FUTUUR: self._fetch_futuur_market,
+            MANIFOLD: self._fetch_manifold_market,
+            POLYMARKET: self._fetch_polymarket_market,
+        }[venue]
+        previous = self.market(venue, market_id)
+        if (
+            previous
+            and previous.settled
+            and not (
+                # Futuur results can be reversed, so resolved Futuur markets are still fetched now and then
+                venue == FUTUUR
+                and now - (previous.last_checked_ms or 0) >= POLL_FAR_MS
+            )
+        ):
+            # Only its positions still waiting for their bet status are checked
+            state = previous
+        else:
+            state = fetch(market_id)
+            state.last_checked_ms = now
+            self._save_market(state)
+
+        if (
+            venue == FUTUUR
+            and state.status == MARKET_REVERSED
+            and previous
+            and previous.status != MARKET_REVERSED
+        ):
+            # The result changed after settlement, so the positions must be settled again
+            self._execute(
+                "UPDATE positions SET settled_ms = NULL, payout = NULL, pnl = NULL, status = ? "
+                "WHERE venue = ? AND market_id = ?",
+                (BET_PURCHASED, venue, str(market_id)),
+            )
+            for position in self.positions(venue, open_only=True):
+                if position.market_id == str(market_id):
+                    self._fill_risk(position)
+        if not state.settled:
+            return []
+
+        settled = []
+        for position in self.positions(venue, open_only=True):
+            if position.market_id != str(market_id):
+                continue
+            if venue == FUTUUR:
+                status, payout = self._futuur_result(position)
+                if status not in SETTLED_BET_STATUSES:
+                    continue
+            else:
+                status, payout = self._resolution_result(position, state.resolution)
+            self._settle_position(position, status, payout, now)
+            settled.append(position)
+        return settled
+
+    def _fetch_futuur_market(self, market_id) -> MarketState:
+        market = self.futuur_api.get_market(market_id)
+        status = market.get("status")
+        return MarketState(
+            FUTUUR,
+            str(market_id),
+            title=market.get("title"),
+            status=status,
+            close_ms=_iso_to_ms(market.get("bet_end_date")),
+            resolution=None,
+            settled=status in SETTLED_MARKET_STATUSES,
+            category=futuur_category(market),
+        )
+
+    def _fetch_manifold_market(self, market_id) -> MarketState:
+        market = self.manifold_api.get_market_by_id(market_id)
+        resolution = market.get("resolution")
+        settled = bool(market.get("isResolved"))
+        if resolution == "MKT":
+            # Resolved to a probability: YES shares pay it, NO shares pay the rest
+            probability = market.get("resolutionProbability")
+            if probability is None:
+                probability = market.get("probability")
+            if probability is None:
+                # Not settled until the probability is known
+                resolution, settled = None, False
+            else:
+                resolution = f"MKT:{probability}"
+        return MarketState(
+            MANIFOLD,
+            str(market_id),
+            title=market.get("question"),
+            status="resolved" if market.get("isResolved") else "open",
+            close_ms=market.get("closeTime"),
+            resolution=resolution,
+            settled=settled,
+        )
+
+    def _fetch_polymarket_market(self, market_id) -> MarketState:
+        if self.poly_client is None:
+            self.poly_client = clob_client(
+                settings.POLYMARKET_HOST,
+                key=settings.POLYMARKET_KEY,
+                chain_id=settings.POLYMARKET_CHAIN_ID,
+            )
+        market = self.poly_client.get_market(condition_id=market_id)
+        winners = [
+            t.get("token_id") for t in market.get("tokens") or [] if t.get("winner")
+        ]
+        return MarketState(
+            POLYMARKET,
+            str(market_id),
+            title=market.get("question"),
+            status="closed" if market.get("closed") else "open",
+            close_ms=_iso_to_ms(market.get("end_date_iso")),
+            resolution=winners[0] if winners else None,
+            settled=bool(market.get("closed")) and bool(winners),
+        )
+
+    def _futuur_result(self, position: Position):
+        bet_id = position.position_id.split(":")[0]
+        bet = self.futuur_api.get_betting(bet_id)
+        status = bet.get("status")
+        # The payout is the whole bet's: each purchase gets its share of it
+        purchases = [
+            p for p in self.positions(FUTUUR) if p.position_id.split(":")[0] == bet_id
+        ]
+        total_shares = sum(p.shares for p in purchases)
+        if total_shares > 0:
+            fraction = position.shares / total_shares
+        else:
+            total_amount = sum(p.amount for p in purchases)
+            fraction = position.amount / total_amount if total_amount else 1.0
+        if status == BET_WON:
+            payout = (
+                bet["payout"] * fraction
+                if bet.get("payout") is not None
+                else position.shares
+            )
+        elif status == BET_LOST:
+            payout = 0.0
+        elif status == BET_SOLD:
+            payout = (
+                bet["payout"] * fraction
+                if bet.get("payout") is not None
+                else position.amount
+            )
+        else:
+            # Cancelled and disabled bets are refunded
+            payout = position.amount
+        return status, float(payout or 0)
+
+    def _resolution_result(self, position: Position, resolution: Optional[str]):
+        if resolution == "CANCEL":
+            return BET_CANCELLED, position.amount
+        if resolution and resolution.startswith("MKT:"):
+            probability = float(resolution[4:])
+            if (position.outcome_id or "").upper() == "NO":
+                probability = 1 - probability
+            return BET_WON, position.shares * probability
+        won = (resolution or "").lower() == (position.outcome_id or "").lower()
+        return (BET_WON, position.shares) if won else (BET_LOST, 0.0)
+
+    # Reporting
+
+    def realized_pnl(self) -> Dict[str, float]:
+        """
+        Realized PnL of the settled positions, per currency.
+        """
+        rows = self._fetch(
+            "SELECT COALESCE(currency, venue) AS currency, SUM(pnl) AS pnl FROM positions "
+            "WHERE settled_ms IS NOT NULL GROUP BY COALESCE(currency, venue)"
+        )
+        return {row["currency"]: row["pnl"] for row in rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Follow the resolution of open positions and print the realized PnL."
+    )
+    parser.add_argument("--ledger", help="The settlement ledger database")
+    parser.add_argument("--currency-mode", default="real_money")
+    args = parser.parse_args()
+
+    with SettlementTracker(args.ledger) as tracker:
+        print(f"{tracker.sync_futuur_positions(args.currency_mode)} new positions")
+        for position in tracker.poll():
+            print("Settled", position.venue, position.position_id)
+        print(
+            f"{len(tracker.positions(open_only=True))} open positions, "
+            f"realized PnL: {tracker.realized_pnl()}"
+        )
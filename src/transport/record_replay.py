@@ -0,0 +1,420 @@
+import argparse
+import atexit
+import base64
+import dataclasses
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import threading
+import time
+import zipfile
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+import settings
+from history.price_store import now_ms
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+# Replay timing: answer at once, or when the recording got the answer, relative to its start
+FAST = "fast"
+ORIGINAL = "original"
+
+INDEX_FILE = "index.json"
+# Query parameters that change on every call and must not tell requests apart
+VOLATILE_PARAMS = {"Timestamp", "HMAC", "Key"}
+
+
+class ReplayMiss(KeyError):
+    """
+    A request that the replayed archive never recorded.
+    """
+
+
+class ReplayedError(RuntimeError):
+    """
+    An exception raised by a recorded request or call, raised again on replay when its own type cannot be rebuilt.
+    """
+
+
+class RecordedResponse:
+    """
+    The parts of a requests.Response the API clients use, rebuilt from an archive.
+    """
+
+    def __init__(self, status_code: int, content: bytes, headers: dict = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def encode_result(value):
+    """
+    A client call result as JSON. Dataclasses, e.g. the py_clob_client order book, are stored with their class and
+    fields and anything else that is not JSON is pickled.
+    """
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        cls = type(value)
+        return {
+            "__dataclass__": f"{cls.__module__}:{cls.__qualname__}",
+            "fields": {
+                f.name: encode_result(getattr(value, f.name))
+                for f in dataclasses.fields(value)
+            },
+        }
+    if isinstance(value, (list, tuple)):
+        return [encode_result(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): encode_result(v) for k, v in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return {"__pickle__": base64.b64encode(pickle.dumps(value)).decode("ascii")}
+
+
+def decode_result(value):
+    """
+    The inverse of encode_result.
+    """
+    if isinstance(value, list):
+        return [decode_result(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__dataclass__" in value:
+        module, name = value["__dataclass__"].split(":")
+        cls = importlib.import_module(module)
+        for part in name.split("."):
+            cls = getattr(cls, part)
+        return cls(**{k: decode_result(v) for k, v in value["fields"].items()})
+    if "__pickle__" in value:
+        return pickle.loads(base64.b64decode(value["__pickle__"]))
+    return {k: decode_result(v) for k, v in value.items()}
+
+
+def encode_error(error: Exception) -> dict:
+    """
+    An exception raised by a recorded request or call, as JSON: its type and message.
+    """
+    cls = type(error)
+    return {
+        "error": repr(error),
+        "type": f"{cls.__module__}:{cls.__qualname__}",
+        "message": str(error),
+    }
+
+
+def raise_recorded(entry: dict):
+    """
+    Raises the exception of an archive entry again, with its original type when it can be rebuilt from its message,
+    e.g. a requests.ConnectionError, so callers handle it as they did live. Otherwise raises ReplayedError.
+    """
+    error = None
+    if entry.get("type"):
+        module, name = entry["type"].split(":")
+        try:
+            cls = importlib.import_module(module)
+            for part in name.split("."):
+                cls = getattr(cls, part)
+            if isinstance(cls, type) and issubclass(cls, Exception):
+                error = cls(entry.get("message", ""))
+        except Exception:
+            error = None
+    raise error or ReplayedError(entry["error"])
+
+
+def request_key(venue: str, method: str, url: str, body=None) -> str:
+    """
+    Identifies a request: its venue, method, URL without the signing parameters, sorted query and body.
+    """
+    parts = urlsplit(url)
+    query = urlencode(
+        sorted((k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS)
+    )
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+    key = f"{venue} {method.upper()} {url}"
+    if body is not None:
+        encoded = json.dumps(body, sort_keys=True, default=str).encode("utf-8")
+        key += " " + hashlib.sha1(encoded).hexdigest()
+    return key
+
+
+class Transport:
+    """
+    Sends requests to the venues. The base transport is live: HTTP requests go out through the given session, or
+    requests, and client calls run as they are.
+    """
+
+    mode = LIVE
+
+    def request(
+        self, venue: str, method: str, url: str, session=None, **kwargs
+    ) -> requests.Response:
+        return (session or requests).request(method=method, url=url, **kwargs)
+
+    def call(self, venue: str, name: str, function: Callable, *args, **kwargs):
+        """
+        Runs a call of a venue client that does its own HTTP, e.g. ClobClient.get_market.
+        """
+        return function(*args, **kwargs)
+
+    def close(self):
+        pass
+
+
+class RecordingTransport(Transport):
+    """
+    Sends requests live and stores every request and response in a zip archive.
+
+    Each exchange is a deflated JSON entry, and an index of the entries of each request key is written on close, so
+    a replay opens only the entries it needs. Entries hold when the request started, relative to the recording, and
+    how long it took. Client call results keep their types, see encode_result; since some may be pickled, archives
+    must only be replayed from trusted sources.
+
+    Attributes:
+        path (str): The archive written.
+    """
+
+    mode = RECORD
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.index: Dict[str, List[str]] = {}
+        self.archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+
+    def _store(self, key: str, started: float, entry: dict):
+        entry["key"] = key
+        entry["offset_ms"] = int((started - self.started) * 1000)
+        entry["duration_ms"] = int((time.monotonic() - started) * 1000)
+        with self.lock:
+            if self.archive is None:
+                return
+            name = f"{len(self.archive.filelist):08d}.json"
+            self.archive.writestr(name, json.dumps(entry, default=str))
+            self.index.setdefault(key, []).append(name)
+
+    def request(self, venue: str, method: str, url: str, session=None, **kwargs):
+        started = time.monotonic()
+        key = request_key(venue, method, url, kwargs.get("json"))
+        try:
+            response = super().request(venue, method, url, session, **kwargs)
+        except Exception as e:
+            # Timeouts and connection errors are replayed too, instead of missing
+            self._store(key, started, encode_error(e))
+            raise
+        self._store(
+            key,
+            started,
+            {
+                "status_code": response.status_code,
+                "headers": {"Content-Type": response.headers.get("Content-Type")},
+                "body": response.content.decode("latin-1"),
+            },
+        )
+        return response
+
+    def call(self, venue: str, name: str, function: Callable, *args, **kwargs):
+        started = time.monotonic()
+        key = request_key(venue, "CALL", name, [args, kwargs])
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            self._store(key, started, encode_error(e))
+            raise
+        self._store(key, started, {"result": encode_result(result)})
+        return result
+
+    def close(self):
+        with self.lock:
+            if self.archive is None:
+                return
+            self.archive.writestr(
+                INDEX_FILE,
+                json.dumps({"recorded_ms": now_ms(), "requests": self.index}),
+            )
+            self.archive.close()
+            self.archive = None
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests from an archive written by RecordingTransport, without any network.
+
+    Requests with the same key are answered with their recorded responses in recording order; once those run out
+    the last one is repeated. A request that was never recorded raises ReplayMiss.
+
+    Attributes:
+        path (str): The archive read.
+        timing (str): FAST answers at once. ORIGINAL answers each request when the recording got its answer,
+            counted from the start of the replay and the recording, which reproduces both the pacing and the
+            latencies of the recorded run. A replay running behind answers at once.
+    """
+
+    mode = REPLAY
+
+    def __init__(self, path: str, timing: str = FAST):
+        self.path = path
+        self.timing = timing
+        self.lock = threading.Lock()
+        self.archive = zipfile.ZipFile(path, "r")
+        self.index = json.loads(self.archive.read(INDEX_FILE))["requests"]
+        self.positions: Dict[str, int] = {}
+        self.started = time.monotonic()
+
+    def _next(self, key: str) -> dict:
+        with self.lock:
+            names = self.index.get(key)
+            if not names:
+                raise ReplayMiss(key)
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            entry = json.loads(self.archive.read(names[min(position, len(names) - 1)]))
+        if self.timing == ORIGINAL:
+            answered_ms = entry.get("offset_ms", 0) + entry.get("duration_ms", 0)
+            elapsed_ms = (time.monotonic() - self.started) * 1000
+            time.sleep(max(0.0, answered_ms - elapsed_ms) / 1000)
+        return entry
+
+    def request(self, venue: str, method: str, url: str, session=None, **kwargs):
+        entry = self._next(request_key(venue, method, url, kwargs.get("json")))
+        if "error" in entry:
+            raise_recorded(entry)
+        return RecordedResponse(
+            entry["status_code"], entry["body"].encode("latin-1"), entry.get("headers")
+        )
+
+    def call(self, venue: str, name: str, function: Callable, *args, **kwargs):
+        entry = self._next(request_key(venue, "CALL", name, [args, kwargs]))
+        if "error" in entry:
+            raise_recorded(entry)
+        return decode_result(entry["result"])
+
+    def close(self):
+        with self.lock:
+            self.archive.close()
+
+    def summary(self) -> List[Tuple[str, int, int]]:
+        """
+        (request key, times recorded, times replayed) of every recorded request.
+        """
+        return [
+            (key, len(names), self.positions.get(key, 0))
+            for key, names in self.index.items()
+        ]
+
+
+class ClobProxy:
+    """
+    Wraps a ClobClient so that its calls go through a transport. In replay no client is needed at all.
+    """
+
+    def __init__(self, client, transport: Optional[Transport] = None):
+        self._client = client
+        self._transport = transport
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._client, name) if self._client is not None else None
+        if attribute is not None and not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            transport = self._transport or get_transport()
+            return transport.call("polymarket", name, attribute, *args, **kwargs)
+
+        return call
+
+
+def clob_client(host=None, key=None, chain_id=None) -> ClobProxy:
+    """
+    A ClobClient behind the process transport. Replay does not build the client, so it needs no credentials.
+    """
+    if get_transport().mode == REPLAY:
+        return ClobProxy(None)
+    from py_clob_client.client import ClobClient
+
+    return ClobProxy(ClobClient(host, key=key, chain_id=chain_id))
+
+
+_transport: Optional[Transport] = None
+_transport_lock = threading.Lock()
+# Names the archive of this process, see set_archive_name
+_archive_name = "main"
+
+
+def set_transport(transport: Transport) -> Optional[Transport]:
+    """
+    Replaces the process transport, returning the previous one, which is not closed.
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
+
+
+def set_archive_name(name: str):
+    """
+    Names the archive of this process, see archive_path. Worker processes use a name that is the same from run to
+    run, e.g. their shard, so a recorded scan is replayed shard by shard. Must be called before the transport is
+    first used.
+    """
+    global _archive_name
+    _archive_name = name
+
+
+def archive_path(path: str, name: str) -> str:
+    """
+    The archive of the process named name: '{name}' in path is replaced by it, and a path without the placeholder
+    gets it appended before the extension, so no two processes ever write the same archive.
+    """
+    if "{name}" in path:
+        return path.replace("{name}", name)
+    root, extension = os.path.splitext(path)
+    return f"{root}_{name}{extension}"
+
+
+def get_transport() -> Transport:
+    """
+    The process transport, built on first use from HTTP_MODE, HTTP_ARCHIVE_PATH and HTTP_REPLAY_TIMING.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            path = archive_path(settings.HTTP_ARCHIVE_PATH or "", _archive_name)
+            if settings.HTTP_MODE == RECORD:
+                _transport = RecordingTransport(path)
+                atexit.register(_transport.close)
+            elif settings.HTTP_MODE == REPLAY:
+                _transport = ReplayTransport(path, settings.HTTP_REPLAY_TIMING)
+            else:
+                _transport = Transport()
+        return _transport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="List the requests of a recorded archive."
+    )
+    parser.add_argument("archive")
+    args = parser.parse_args()
+
+    replay = ReplayTransport(args.archive)
+    for request, recorded, _ in sorted(replay.summary()):
+        print(f"{recorded:5d}  {request}")
+    replay.close()
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from alerts.sinks import Sink
+from alerts.stream import OpportunityEvent, OpportunityStream
+
+
+class ListSink(Sink):
+    name = "list"
+
+    def __init__(self, queue_size=10, gate=None):
+        self.events = []
+        self.gate = gate
+        self.delivering = threading.Event()
+        super().__init__(queue_size)
+
+    def deliver(self, event):
+        self.delivering.set()
+        if self.gate is not None:
+            self.gate.wait()
+        self.events.append(event)
+
+
+def event(venue="polymarket", market_id="0x1", agg_value=0.9, detected_ms=1000):
+    return OpportunityEvent(
+        venue=venue,
+        futuur_id=1,
+        market_id=market_id,
+        outcomes=[["Yes", 0.4, 0.45], ["No", 0.5, 0.45]],
+        agg_value=agg_value,
+        detected_ms=detected_ms,
+    )
+
+
+def test_reported_opportunities_persist_across_runs(tmp_path):
+    path = str(tmp_path / "alert_state.json")
+    sink = ListSink()
+    with OpportunityStream([sink], state_path=path) as stream:
+        assert stream.publish(event())
+        assert stream.publish(event(venue="manifold", market_id="m1"))
+
+    with OpportunityStream([ListSink()], state_path=path) as stream:
+        # The next run knows both opportunities and only reports a moved value
+        assert not stream.publish(event(detected_ms=2000))
+        moved = event(agg_value=0.8, detected_ms=2000)
+        assert stream.publish(moved)
+        assert moved.repeat == 1
+        # A Polymarket scan forgets the missing Polymarket pairs only
+        stream.retain([], venues=["polymarket"])
+
+    with OpportunityStream([ListSink()], state_path=path) as stream:
+        assert stream.publish(event(detected_ms=3000))
+        assert not stream.publish(
+            event(venue="manifold", market_id="m1", detected_ms=3000)
+        )
+
+    with open(path, "w") as f:
+        f.write("[")
+    with OpportunityStream([ListSink()], state_path=path) as stream:
+        assert stream.publish(event(detected_ms=4000))
+
+
+def test_close_does_not_block_on_a_full_queue():
+    gate = threading.Event()
+    sink = ListSink(queue_size=2, gate=gate)
+    sink.submit(event(detected_ms=0))
+    # The thread is stuck delivering while the queue fills up
+    assert sink.delivering.wait(1)
+    for i in range(1, 5):
+        sink.submit(event(detected_ms=i))
+    assert sink.queue.full()
+    started = time.monotonic()
+    sink.close(timeout=0.2)
+    assert time.monotonic() - started < 1
+    assert sink.dropped == 3
+    gate.set()
+    sink.thread.join(1)
+    assert not sink.thread.is_alive()
@@ -0,0 +1,32 @@
+import pytest
+
+from backtest.backtester import Backtester, BacktestPair, FillAssumptions
+from history.price_store import PriceStore
+from history.recorder import FUTUUR, MANIFOLD
+
+
+def test_backtest_fills_an_opportunity_episode(tmp_path):
+    store = PriceStore(str(tmp_path))
+    labels = {"11:OOM": "Yes", "12:OOM": "No"}
+    store.append(FUTUUR, 1, {"11:OOM": 0.4, "12:OOM": 0.6}, 1000, labels=labels)
+    store.append(
+        MANIFOLD, "m", {"YES": 0.5, "NO": 0.5}, 1000, labels={"YES": "Yes", "NO": "No"}
+    )
+    store.append(FUTUUR, 1, {"11:OOM": 0.5, "12:OOM": 0.6}, 2000)
+
+    report = Backtester(store, FillAssumptions(stake=10)).run(
+        [BacktestPair(1, MANIFOLD, "m")]
+    )
+    pair = report.pairs[0]
+    assert pair.matched_outcomes == 2
+    assert (pair.opportunities, pair.filled) == (1, 1)
+    assert pair.durations_ms == [1000]
+    # Covering both outcomes for 0.9 pays 10 / 0.9
+    assert pair.pnl == pytest.approx(10 / 0.9 - 10)
+
+
+def test_stake_must_be_positive():
+    with pytest.raises(ValueError):
+        FillAssumptions(stake=None)
+    with pytest.raises(ValueError):
+        FillAssumptions(stake=0)
@@ -0,0 +1,30 @@
+from benchmarks.bench import compare, run_suite
+
+
+def test_suite_reports_every_case():
+    report = run_suite(["manifold_sync", "match"], [200], max_pairs=50)
+    results = {r["stage"]: r for r in report["results"]}
+    assert results["manifold_sync"]["items"] == 200
+    assert results["match"]["items"] == 50
+    for result in results.values():
+        assert result["throughput"] > 0 and result["peak_rss_kb"] > 0
+
+
+def test_compare_flags_slower_and_larger_cases():
+    def report(throughput, rss):
+        return {
+            "results": [
+                {
+                    "stage": "match",
+                    "size": 1000,
+                    "throughput": throughput,
+                    "peak_rss_kb": rss,
+                }
+            ]
+        }
+
+    baseline = report(100.0, 1000)
+    assert compare(report(95.0, 1050), baseline) == []
+    assert len(compare(report(80.0, 1000), baseline)) == 1
+    assert len(compare(report(100.0, 1200), baseline)) == 1
+    assert compare(report(100.0, 1000), {"results": []}) == []
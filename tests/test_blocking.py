@@ -0,0 +1,29 @@
+from matcher.blocking import blocking_key, candidate_pairs, compatible
+
+
+def test_keys_ignore_case_and_stop_words():
+    key = blocking_key("Will bitcoin be above $100k on December 31, 2025?")
+    assert key.tokens == {"bitcoin"}
+    assert key.years == {2025}
+    assert key.numbers == {100_000.0}
+    assert blocking_key("Will Bitcoin be above $100K?").tokens == key.tokens
+
+
+def test_only_compatible_pairs_share_a_block():
+    left = [
+        blocking_key("Will Bitcoin be above $100k in 2025?", "2025-12-31T00:00:00Z"),
+        blocking_key("Will SpaceX launch Starship by June?", "2025-06-30T00:00:00Z"),
+    ]
+    right = [
+        blocking_key("Bitcoin above $100k by end of 2025", "2025-12-31T12:00:00Z"),
+        blocking_key("Bitcoin above $100k by end of 2024", "2024-12-31T12:00:00Z"),
+        blocking_key("Bitcoin above $150k in 2025?", "2025-12-31T12:00:00Z"),
+        blocking_key("spacex starship launch", "2025-06-20T00:00:00Z"),
+        blocking_key("Starship launch this year?", "2025-12-31T00:00:00Z"),
+        blocking_key("Bitcoin above $100k in 2025, no date"),
+    ]
+    rows, columns = candidate_pairs(left, right)
+    assert sorted(zip(rows.tolist(), columns.tolist())) == [(0, 0), (0, 5), (1, 3)]
+    for row, column in zip(rows, columns):
+        assert compatible(left[row], right[column])
+    assert not compatible(left[0], right[1])
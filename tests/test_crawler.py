@@ -0,0 +1,54 @@
+from matcher.crawler import RelatedMarketsCrawler
+
+
+class StubFutuurAPI:
+    """
+    Related markets from a fixed graph. Markets in failing raise until they are removed from it.
+    """
+
+    def __init__(self, graph, failing=()):
+        self.graph = graph
+        self.failing = set(failing)
+        self.requested = []
+
+    def get_related_markets(self, futuur_id):
+        self.requested.append(futuur_id)
+        if futuur_id in self.failing:
+            raise ConnectionError("timed out")
+        return {
+            "results": [
+                {
+                    "id": related,
+                    "title": f"Market {related}",
+                    "categories": [{"id": 2544}],
+                    "bet_end_date": "2025-01-01T00:00:00Z",
+                }
+                for related in self.graph.get(futuur_id, [])
+            ]
+        }
+
+
+def test_crawl_only_visits_new_markets():
+    graph = {1: [2, 3], 2: [1, 4], 3: [5], 4: [6]}
+    api = StubFutuurAPI(graph, failing={3})
+    with RelatedMarketsCrawler(":memory:", futuur_api=api) as crawler:
+        assert crawler.add_seeds([1]) == 1
+        discovered = crawler.crawl(max_depth=2)
+        assert sorted(m["id"] for m in discovered) == [2, 3, 4]
+        assert sorted(crawler.neighbours(2)) == [1, 4]
+        # Seeds count as matched, discovered markets wait for the matcher with their close date
+        unmatched = {m["id"]: m for m in crawler.unmatched()}
+        assert sorted(unmatched) == [2, 3, 4]
+        assert unmatched[4]["bet_end_date"] == "2025-01-01T00:00:00Z"
+        assert unmatched[4]["categories"] == [{"id": 2544}]
+
+        # Crawled nodes are not requested again and the failed one is retried
+        api.failing.clear()
+        api.requested.clear()
+        discovered = crawler.crawl(max_depth=2)
+        assert api.requested == [3]
+        assert [m["id"] for m in discovered] == [5]
+
+        crawler.mark_matched([2, 3, 4, 5])
+        assert crawler.unmatched() == []
+        assert len(crawler) == 5
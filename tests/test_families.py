@@ -0,0 +1,58 @@
+import pytest
+
+from analysis.families import ABOVE, DATE, ladder_rungs, scan
+from history.recorder import MANIFOLD, POLYMARKET
+
+
+def manifold(market_id, question, probability):
+    return {
+        "id": market_id,
+        "question": question,
+        "probability": probability,
+        "outcomeType": "BINARY",
+        "isResolved": False,
+    }
+
+
+def test_titles_parse_into_rungs():
+    (date,) = ladder_rungs("Will SpaceX launch Starship by June 2025?")
+    assert date == (DATE, "will spacex launch starship {}?", 20250632)
+    # "before June" ends with May
+    assert (
+        ladder_rungs("Will SpaceX launch Starship before June 2025?")[0][2] == 20250532
+    )
+    rungs = ladder_rungs("Will Bitcoin be above $100k by December 31, 2025?")
+    assert [kind for kind, _, _ in rungs] == [DATE, ABOVE]
+    assert rungs[1][2] == 100_000
+
+
+def test_date_and_threshold_ladders_priced_out_of_order():
+    catalogs = {
+        MANIFOLD: [
+            manifold("m1", "Will SpaceX launch Starship by March 2025?", 0.6),
+            manifold("m2", "Will SpaceX launch Starship by June 2025?", 0.5),
+            manifold("m3", "Will SpaceX launch Starship by December 2025?", 0.7),
+            # A family of one market is no ladder
+            manifold("m4", "Will Apple announce a new CEO by June 2025?", 0.1),
+        ],
+        POLYMARKET: [
+            {
+                "condition_id": f"0x{threshold}",
+                "question": f"Will Bitcoin be above ${threshold}k in 2025?",
+                "active": True,
+                "closed": False,
+                "tokens": [
+                    {"outcome": "Yes", "price": price},
+                    {"outcome": "No", "price": 1 - price},
+                ],
+            }
+            for threshold, price in [(50, 0.8), (60, 0.85), (70, 0.4)]
+        ],
+    }
+    violations = scan(catalogs)
+    assert [(v.venue, v.narrow.market_id, v.wide.market_id) for v in violations] == [
+        (MANIFOLD, "m1", "m2"),
+        (POLYMARKET, "0x60", "0x50"),
+    ]
+    assert violations[0].margin == pytest.approx(0.1)
+    assert violations[1].margin == pytest.approx(0.05)
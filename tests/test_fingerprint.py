@@ -0,0 +1,50 @@
+from analysis.fingerprint import ChangeTracker, market_fingerprint, pair_fingerprint
+from history.recorder import FUTUUR, MANIFOLD
+
+
+def futuur_market(price=0.4, volume=10):
+    return {
+        "status": "open",
+        "title": "Will it rain?",
+        "volume": volume,
+        "outcomes": [
+            {"id": 1, "title": "Yes", "price": price},
+            {"id": 2, "title": "No", "price": 1 - price},
+        ],
+    }
+
+
+def test_fingerprints_only_follow_what_the_analysis_reads():
+    base = market_fingerprint(FUTUUR, futuur_market())
+    assert market_fingerprint(FUTUUR, futuur_market(volume=99)) == base
+    assert market_fingerprint(FUTUUR, futuur_market(price=0.45)) != base
+    manifold = {"question": "Rain?", "probability": 0.5, "commentCount": 1}
+    assert market_fingerprint(MANIFOLD, manifold) == market_fingerprint(
+        MANIFOLD, {**manifold, "commentCount": 7}
+    )
+    assert market_fingerprint(MANIFOLD, None) == market_fingerprint(MANIFOLD, {})
+
+
+def test_results_are_reused_across_runs_until_a_market_changes(tmp_path):
+    path = str(tmp_path / "analysis_cache.json")
+    fingerprint = pair_fingerprint(
+        market_fingerprint(FUTUUR, futuur_market()),
+        market_fingerprint(MANIFOLD, {"probability": 0.5}),
+    )
+    tracker = ChangeTracker(path)
+    assert tracker.get("1:m1", fingerprint) is None
+    tracker.put("1:m1", fingerprint, {"agg_value": 0.9})
+    tracker.save()
+
+    tracker = ChangeTracker(path)
+    assert tracker.get("1:m1", fingerprint) == {"agg_value": 0.9}
+    changed = pair_fingerprint(
+        market_fingerprint(FUTUUR, futuur_market(price=0.3)),
+        market_fingerprint(MANIFOLD, {"probability": 0.5}),
+    )
+    assert tracker.get("1:m1", changed) is None
+
+    # A damaged cache starts over instead of failing the run
+    with open(path, "w") as f:
+        f.write("{")
+    assert ChangeTracker(path).entries == {}
@@ -0,0 +1,24 @@
+from futuur.market import FutuurMarket
+
+
+class StubFutuurAPI:
+    def __init__(self, total):
+        self.total = total
+        self.offsets = []
+
+    def get_markets(self, limit, offset, **filters):
+        self.offsets.append(offset)
+        end = min(offset + limit, self.total)
+        return {
+            "results": [{"id": i} for i in range(offset, end)],
+            "pagination": {"next": "more" if end < self.total else None},
+        }
+
+
+def test_cursor_pages_through_the_given_client():
+    api = StubFutuurAPI(5)
+    cursor = FutuurMarket(page_size=2, max_pages_in_memory=1, futuur_api=api)
+    assert api.offsets == []
+    assert [m["id"] for m in cursor] == [0, 1, 2, 3, 4]
+    assert sorted(api.offsets) == [0, 2, 4]
+    assert cursor.markets == [{"id": 4}]
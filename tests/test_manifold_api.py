@@ -0,0 +1,12 @@
+from manifold.manifold_api import ManifoldAPI
+
+
+def test_later_construction_keeps_the_api_key():
+    api = ManifoldAPI(base_url="http://localhost:1/v0/", api_key="secret")
+    assert ManifoldAPI() is api
+    assert api.api_key == "secret"
+    assert api.base_url == "http://localhost:1/v0/"
+
+    ManifoldAPI(api_key="other")
+    assert api.api_key == "other"
+    assert api.base_url == "http://localhost:1/v0/"
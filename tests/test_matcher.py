@@ -0,0 +1,48 @@
+import settings
+from manifold.manifold_api import ManifoldAPI
+from matcher.matcher import Matcher
+from mock_venue.catalog import CATEGORIES, SyntheticCatalog, manifold_id
+from mock_venue.server import MockVenueConfig, MockVenueServer
+
+
+class StubFutuurAPI:
+    def __init__(self, markets):
+        self.markets = markets
+
+    def get_all_markets(self, category=None, path=None, **kwargs):
+        return self.markets.get(category, [])
+
+
+class StubPolymarketAPI:
+    def get_all_markets(self, max_markets=None, path=None, **kwargs):
+        return []
+
+
+def test_partitions_take_manifold_groups_from_search(monkeypatch):
+    catalog = SyntheticCatalog(size=64)
+    crypto = CATEGORIES[1]
+    indexes = catalog.futuur_category_indexes(crypto["id"])
+    with MockVenueServer(MockVenueConfig(catalog_size=64)) as server:
+        monkeypatch.setattr(settings, "MANIFOLD_BASE_URL", server.manifold_url)
+        monkeypatch.setattr(settings, "POLYMARKET_HOST", server.polymarket_url)
+        matcher = Matcher(max_workers=1)
+        matcher.manifold_api = ManifoldAPI(base_url=server.manifold_url)
+        matcher.futuur_api = StubFutuurAPI(
+            {crypto["id"]: [{"id": i, "title": catalog.title(i)} for i in indexes]}
+        )
+        matcher.polymarket_api = StubPolymarketAPI()
+        categories = [
+            {
+                "title": crypto["title"],
+                "futuur_id": crypto["id"],
+                "manifold_groups": [crypto["slug"], "not-a-group"],
+            }
+        ]
+        (partition,) = matcher.fetch_partitions(categories)
+
+    # Listed Manifold markets carry no groups, the partition is filled from the group search
+    assert {m[0] for m in partition.manifold_markets} == {
+        manifold_id(i) for i in indexes
+    }
+    assert len(partition.futuur_markets) == len(indexes)
+    assert partition.polymarket_markets == []
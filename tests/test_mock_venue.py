@@ -0,0 +1,65 @@
+import requests
+
+from mock_venue.catalog import CATEGORIES, manifold_id
+from mock_venue.server import MockVenueConfig, MockVenueServer
+
+
+def test_venues_serve_the_same_catalog():
+    with MockVenueServer(MockVenueConfig(catalog_size=64)) as server:
+        page = requests.get(
+            server.futuur_url + "markets/", params={"category": 2544, "limit": 10}
+        ).json()
+        assert page["pagination"]["count"] == 16
+        assert len(page["results"]) == 10
+        rest = requests.get(page["pagination"]["next"]).json()
+        assert len(rest["results"]) == 6 and rest["pagination"]["next"] is None
+
+        listed = requests.get(
+            server.manifold_url + "markets", params={"limit": 5}
+        ).json()
+        assert [m["id"] for m in listed] == [manifold_id(i) for i in range(63, 58, -1)]
+        older = requests.get(
+            server.manifold_url + "markets", params={"before": listed[-1]["id"]}
+        ).json()
+        assert len(older) == 59
+
+        polymarket = requests.get(server.polymarket_url + "/markets").json()
+        assert polymarket["count"] == 64
+        first = requests.get(server.manifold_url + f"market/{manifold_id(0)}").json()
+        # Market i has the same question on every venue
+        assert polymarket["data"][0]["question"] == first["question"]
+        assert page["results"][0]["title"] == first["question"]
+
+
+def test_manifold_lists_lite_markets_and_searches_groups():
+    with MockVenueServer(MockVenueConfig(catalog_size=64)) as server:
+        # As on the real API, listed markets are lite and carry no group membership
+        listed = requests.get(server.manifold_url + "markets").json()
+        assert all("groupSlugs" not in m for m in listed)
+        full = requests.get(server.manifold_url + f"market/{manifold_id(4)}").json()
+        assert full["groupSlugs"] == [CATEGORIES[1]["slug"]]
+
+        slug = CATEGORIES[1]["slug"]
+        found = []
+        for offset in range(0, 32, 10):
+            found += requests.get(
+                server.manifold_url + "search-markets",
+                params={"topicSlug": slug, "limit": 10, "offset": offset},
+            ).json()
+        assert len(found) == 16
+        assert all("groupSlugs" not in m for m in found)
+        for market in found:
+            market = requests.get(server.manifold_url + f"market/{market['id']}").json()
+            assert market["groupSlugs"] == [slug]
+
+
+def test_injected_errors_and_rate_limits():
+    config = MockVenueConfig(catalog_size=8, error_rate=1.0, error_status=503)
+    with MockVenueServer(config) as server:
+        assert requests.get(server.manifold_url + "markets").status_code == 503
+
+    with MockVenueServer(MockVenueConfig(catalog_size=8, rate_limit=1)) as server:
+        statuses = [
+            requests.get(server.manifold_url + "markets").status_code for _ in range(5)
+        ]
+        assert 429 in statuses and statuses[0] == 200
@@ -0,0 +1,15 @@
+import numpy as np
+
+from analysis.price_impact import lmsr_buy, lmsr_liquidity
+
+
+def test_lmsr_liquidity_recovers_the_quote():
+    shares = lmsr_buy(0.5, 30, 10).shares.item()
+    assert np.isclose(lmsr_liquidity(0.5, 10, shares), 30)
+
+
+def test_lmsr_liquidity_rejects_impossible_quotes():
+    # No liquidity buys fewer shares than the stake, nor as many as stake / price
+    assert np.isnan(lmsr_liquidity(0.5, 10, 8))
+    assert np.isnan(lmsr_liquidity(0.5, 10, 20))
+    assert np.isnan(lmsr_liquidity(0.5, 0, 3))
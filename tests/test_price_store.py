@@ -0,0 +1,43 @@
+import pytest
+
+from history.price_store import PriceStore
+
+
+def test_out_of_order_observation_leaves_no_trace(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.append("futuur", 1, {"yes": 0.4}, timestamp=2000)
+    with pytest.raises(ValueError):
+        # 'no' is new, but 'yes' is out of order, so neither is stored
+        store.append("futuur", 1, {"no": 0.6, "yes": 0.5}, timestamp=1000, title="T")
+    assert store.outcomes("futuur", 1) == {"yes": "yes"}
+    assert store.market_info("futuur", 1)["title"] == ""
+
+    store.append("futuur", 1, {"no": 0.6, "yes": 0.5}, timestamp=3000)
+    timestamps, prices = store.query("futuur", 1, "yes")
+    assert timestamps.tolist() == [2000, 3000]
+    assert prices.tolist() == pytest.approx([0.4, 0.5])
+    store.close()
+
+
+def test_index_is_written_on_new_chunks_and_on_close(tmp_path):
+    store = PriceStore(str(tmp_path), chunk_size=2)
+    store.append("futuur", 1, {"yes": 0.1}, timestamp=1000)
+    store.append("futuur", 1, {"yes": 0.2}, timestamp=2000)
+    # A new chunk writes the index, a plain append does not
+    assert (
+        PriceStore(str(tmp_path)).market_info("futuur", 1)["outcomes"]["yes"]["chunks"][
+            0
+        ]["count"]
+        == 1
+    )
+
+    store.append("futuur", 1, {"yes": 0.3}, timestamp=3000)
+    chunks = PriceStore(str(tmp_path)).market_info("futuur", 1)["outcomes"]["yes"][
+        "chunks"
+    ]
+    assert [c["count"] for c in chunks] == [2, 1]
+
+    store.append("futuur", 1, {"yes": 0.4}, timestamp=4000)
+    store.close()
+    timestamps, _ = PriceStore(str(tmp_path)).query("futuur", 1, "yes")
+    assert timestamps.tolist() == [1000, 2000, 3000, 4000]
@@ -0,0 +1,60 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from scanner.evaluator import aggregate_values
+from scanner.price_table import SharedPriceTable
+
+
+def _write(spec, stop):
+    # Every publish writes one price across the whole row
+    table = SharedPriceTable.attach(spec)
+    price = 0
+    while not stop.is_set():
+        price = (price + 1) % 100
+        table.publish(1, [price / 100] * 8, [price / 100] * 8, timestamp=price + 1)
+    table.close()
+
+
+def test_snapshot_never_sees_half_a_publish():
+    table = SharedPriceTable.create(n_pairs=4, max_outcomes=8)
+    stop = multiprocessing.Event()
+    writer = multiprocessing.Process(target=_write, args=(table.spec, stop))
+    writer.start()
+    try:
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            snapshot = table.snapshot()
+            row = snapshot.prices[1]
+            if snapshot.updated_ms[1]:
+                assert np.all(row == row[0, 0])
+                assert snapshot.updated_ms[1] == round(row[0, 0] * 100) + 1
+            prices, updated_ms = table.read_row(1)
+            if updated_ms:
+                assert np.all(prices == prices[0, 0])
+                assert updated_ms == round(prices[0, 0] * 100) + 1
+    finally:
+        stop.set()
+        writer.join()
+        table.close()
+        table.unlink()
+
+
+def test_rows_left_mid_publish_read_as_unpublished():
+    table = SharedPriceTable.create(n_pairs=2, max_outcomes=2)
+    try:
+        table.publish(0, [0.4, 0.5], [0.45, 0.45], timestamp=10)
+        table.publish(1, [0.4, 0.5], [0.45, 0.45], timestamp=10)
+        assert table.seq.tolist() == [2, 2]
+        # A worker that died in the middle of a publish
+        table.seq[1] += 1
+        snapshot = table.snapshot(max_retries=3)
+        assert snapshot.updated_ms.tolist() == [10, 0]
+        values = aggregate_values(snapshot)
+        assert values[0] == pytest.approx(0.85) and np.isnan(values[1])
+        assert table.read_row(1, max_retries=3)[1] == 0
+    finally:
+        table.close()
+        table.unlink()
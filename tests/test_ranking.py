@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from analysis.ranking import (
+    GREEDY,
+    LP,
+    book_average_price,
+    executable_size,
+    leg_stakes,
+    rank,
+)
+
+NOW = 10**12
+DAY_MS = 24 * 3600 * 1000
+
+
+def test_shorter_lockup_ranks_first_and_budget_is_spent_in_order():
+    ranking = rank(
+        [0.95, 0.95, 1.02],
+        [NOW + 300 * DAY_MS, NOW + 10 * DAY_MS, NOW + 10 * DAY_MS],
+        [50, 50, 50],
+        budget=80,
+        now=NOW,
+    )
+    assert list(ranking.order) == [1, 0, 2]
+    assert list(ranking.allocation) == [30, 50, 0]
+
+
+@pytest.mark.parametrize("method", [GREEDY, LP])
+def test_group_limits_are_respected(method):
+    ranking = rank(
+        [0.90, 0.92, 0.95],
+        [NOW + 30 * DAY_MS] * 3,
+        [50, 50, 50],
+        budget=100,
+        method=method,
+        groups=[[0, 1]],
+        group_limits=[20],
+        now=NOW,
+    )
+    assert ranking.allocation[[0, 1]].sum() == pytest.approx(20)
+    assert ranking.allocation[2] == pytest.approx(50)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        rank([0.9], [NOW], [10], budget=10, method="best")
+
+
+def test_depth_caps_the_executable_size():
+    # 10 shares at 0.40 then 100 at 0.60
+    asks = [(0.60, 100), (0.40, 10)]
+    np.testing.assert_allclose(book_average_price(asks, [2, 4, 10]), [0.4, 0.4, 0.5])
+    assert np.isnan(book_average_price(asks, [100])[0])
+
+    stakes = leg_stakes([0.4, 0.5], [1, 9])
+    np.testing.assert_allclose(stakes.sum(axis=0), [1, 9])
+    assert list(executable_size([1, 2, 4], [[0.9, 0.95, 1.01]], 0.97)) == [2]
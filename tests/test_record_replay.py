@@ -0,0 +1,67 @@
+import pytest
+import requests
+
+from transport.record_replay import (
+    RecordingTransport,
+    ReplayMiss,
+    ReplayTransport,
+    archive_path,
+)
+
+
+class StubSession:
+    """
+    Answers requests with a counter, and fails on the URLs it is told to.
+    """
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        if url in self.failing:
+            raise requests.ConnectionError(f"refused {url}")
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = f'{{"call": {self.calls}}}'.encode()
+        return response
+
+
+def test_archive_path_keeps_processes_apart():
+    assert (
+        archive_path("http_archive_{name}.zip", "worker1") == "http_archive_worker1.zip"
+    )
+    assert archive_path("/tmp/http_archive.zip", "main") == "/tmp/http_archive_main.zip"
+
+
+def test_replay_answers_as_recorded(tmp_path):
+    path = str(tmp_path / "archive.zip")
+    session = StubSession(failing={"https://venue/down"})
+    recording = RecordingTransport(path)
+    # Signing parameters do not tell requests apart
+    url = "https://venue/markets?limit=2&Timestamp=1"
+    assert recording.request("futuur", "GET", url, session).json() == {"call": 1}
+    assert recording.request("futuur", "GET", url, session).json() == {"call": 2}
+    with pytest.raises(requests.ConnectionError):
+        recording.request("futuur", "GET", "https://venue/down", session)
+    assert recording.call("polymarket", "get_market", lambda c: {"id": c}, "0x1") == {
+        "id": "0x1"
+    }
+    recording.close()
+
+    replay = ReplayTransport(path)
+    url = "https://venue/markets?Timestamp=2&limit=2"
+    assert replay.request("futuur", "GET", url).json() == {"call": 1}
+    assert replay.request("futuur", "GET", url).json() == {"call": 2}
+    # Once the recorded responses run out the last one is repeated
+    assert replay.request("futuur", "GET", url).json() == {"call": 2}
+    # A recorded error is raised again with its type, not as a miss
+    with pytest.raises(requests.ConnectionError, match="refused"):
+        replay.request("futuur", "GET", "https://venue/down")
+    assert replay.call("polymarket", "get_market", None, "0x1") == {"id": "0x1"}
+    with pytest.raises(ReplayMiss):
+        replay.request("futuur", "GET", "https://venue/other")
+    replay.close()
+    assert session.calls == 3
@@ -0,0 +1,68 @@
+import json
+
+from history.recorder import MANIFOLD, POLYMARKET
+from matcher.registry import MatchRegistry, content_hash
+
+
+def test_import_and_lookup(tmp_path):
+    path = tmp_path / "markets.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"futuur": 1, "mani": "m1"},
+                {"futuur": 2, "poly": "https://polymarket.com/event/x"},
+                {
+                    "futuur": 3,
+                    "poly": "https://polymarket.com/event/y",
+                    "poly_condition_id": "0x3",
+                },
+            ]
+        )
+    )
+    with MatchRegistry(":memory:") as registry:
+        registry.import_json_if_empty([str(path)])
+        assert len(registry) == 3
+        # Seeding only happens once
+        registry.import_json_if_empty([str(path)])
+        assert len(registry) == 3
+
+        assert registry.by_futuur_id(1)[0].market_id == "m1"
+        assert registry.by_market_id(POLYMARKET, "0x3")[0].futuur_id == 3
+        assert registry.by_url("https://polymarket.com/event/x")[0].futuur_id == 2
+        assert registry.entries(POLYMARKET) == [
+            {"futuur": 2, "poly": "https://polymarket.com/event/x"},
+            {
+                "futuur": 3,
+                "poly": "https://polymarket.com/event/y",
+                "poly_condition_id": "0x3",
+            },
+        ]
+
+        # Upserts keep what they do not set
+        registry.upsert(4, MANIFOLD, "m4", confidence=0.6)
+        match = registry.upsert(4, MANIFOLD, "m4", url="https://manifold.markets/m4")
+        assert match.confidence == 0.6 and match.url == "https://manifold.markets/m4"
+        assert [
+            m.futuur_id for m in registry.matches(MANIFOLD, min_confidence=0.7)
+        ] == [1]
+
+
+def test_outcomes_are_matched_again_only_when_a_side_changed():
+    with MatchRegistry(":memory:") as registry:
+        match = registry.upsert(1, MANIFOLD, "m1")
+        futuur_hash = content_hash("Will it rain?", ["Yes", "No"])
+        market_hash = content_hash("Rain tomorrow?")
+        assert registry.needs_rematch(match, futuur_hash, market_hash)
+
+        registry.save_outcome_map(
+            match.id, {10: ("YES", 0.9), 11: (None, None)}, futuur_hash, market_hash
+        )
+        match = registry.get(1, MANIFOLD, "m1")
+        assert registry.outcome_map(match.id) == {10: ("YES", 0.9), 11: (None, None)}
+        # Outcome order does not change the hash
+        assert not registry.needs_rematch(
+            match, content_hash("Will it rain?", ["No", "Yes"]), market_hash
+        )
+        assert registry.needs_rematch(
+            match, content_hash("Will it rain?", ["Yes", "No", "Maybe"]), market_hash
+        )
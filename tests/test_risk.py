@@ -0,0 +1,67 @@
+import math
+
+import pytest
+
+from futuur.rates import RateCache
+from risk.engine import CATEGORY, GLOBAL, MARKET, VENUE, RiskEngine, RiskLimits
+
+
+class StubRatesAPI:
+    def get_rates(self):
+        return {"BTC": 60_000.0}
+
+
+def test_checks_report_the_first_limit_breached():
+    limits = RiskLimits(
+        market=100, venue=300, category=250, total=400, venues={"manifold": 50}
+    )
+    risk = RiskEngine(limits)
+    risk.on_fill("polymarket", "p1", "m1", 80)
+    risk.set_category("polymarket", "m1", 7)
+    risk.on_fill("polymarket", "p2", "m2", 150)
+    risk.set_category("polymarket", "m2", 7)
+
+    assert risk.check("polymarket", "m3", 10).allowed
+    check = risk.check("polymarket", "m1", 50)
+    assert (check.allowed, check.headroom, check.breached) == (False, 20, MARKET)
+    # m3 has no category, so only the venue limit binds it
+    check = risk.check("polymarket", "m3", 100)
+    assert (check.headroom, check.breached) == (70, VENUE)
+    risk.set_category("polymarket", "m3", 7)
+    check = risk.check("polymarket", "m3", 50)
+    assert (check.headroom, check.breached) == (20, CATEGORY)
+    # Every limit is checked, the first one breached is reported
+    check = risk.check("polymarket", "m3", 100)
+    assert (check.headroom, check.breached) == (20, VENUE)
+    assert risk.check("manifold", "x", 60).breached == VENUE
+    risk.on_fill("manifold", "f1", "x", 40)
+    risk.on_fill("futuur", "f2", "y", 100)
+    check = risk.check("futuur", "z", 100)
+    assert (check.headroom, check.breached) == (30, GLOBAL)
+
+    assert risk.headroom() == 30
+    assert risk.headroom("manifold") == 10
+    assert risk.headroom(category=7) == 20
+    assert risk.headroom(category=8) == 250
+    assert RiskEngine(RiskLimits()).headroom() == math.inf
+
+
+def test_exposure_follows_fills_and_settlements():
+    risk = RiskEngine(RiskLimits(total=1000), rates=RateCache(StubRatesAPI()))
+    risk.on_fill("futuur", "a", 1, 0.001, "BTC")
+    # Filling the same position again counts it once, play money carries no risk
+    risk.on_fill("futuur", "a", 1, 0.001, "BTC")
+    risk.on_fill("futuur", "b", 1, 500, "OOM")
+    assert risk.exposure("futuur", 1) == pytest.approx(60)
+
+    risk.on_fill("futuur", "c", 2, 3, "DOGE")
+    assert risk.unconverted == {"DOGE": 3}
+    assert risk.exposure("futuur", 2) == 0
+
+    risk.set_category("futuur", 1, 9)
+    assert risk.by_category[9] == pytest.approx(60)
+    risk.on_settlement("futuur", "a")
+    risk.on_settlement("futuur", "c")
+    assert risk.total == pytest.approx(0)
+    assert risk.by_category[9] == pytest.approx(0)
+    assert risk.unconverted == {"DOGE": 0}
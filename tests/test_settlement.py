@@ -0,0 +1,82 @@
+from history.recorder import FUTUUR
+from risk.engine import RiskEngine, RiskLimits
+from settlement.tracker import BET_WON, MARKET_CLOSED, SettlementTracker
+
+
+class StubFutuurAPI:
+    def __init__(self, bets, market):
+        self.bets = bets
+        self.market = market
+
+    def get_betting_list(self, **kwargs):
+        return {"results": list(self.bets.values()), "pagination": {"next": None}}
+
+    def get_betting(self, bet_id):
+        return self.bets[int(bet_id)]
+
+    def get_market(self, market_id):
+        return self.market
+
+
+def test_multi_purchase_bet_splits_payout():
+    bet = {
+        "id": 7,
+        "status": "p",
+        "question": {"id": 1},
+        "outcome": {"id": 11},
+        "active_purchases": [
+            {"id": 100, "amount": 10, "shares": 20, "currency": "USDC"},
+            {"id": 101, "amount": 5, "shares": 8, "currency": "USDC"},
+        ],
+    }
+    api = StubFutuurAPI({7: bet}, {"id": 1, "status": "o"})
+    with SettlementTracker(
+        ":memory:", futuur_api=api, manifold_api=object()
+    ) as tracker:
+        assert tracker.sync_futuur_positions() == 2
+        assert {p.position_id for p in tracker.positions()} == {"7:100", "7:101"}
+        # Adding positions does not settle them
+        assert tracker.positions(open_only=True)
+
+        api.market = {"id": 1, "status": MARKET_CLOSED}
+        bet.update(status=BET_WON, payout=28)
+        settled = tracker.poll(now=10**13)
+
+        assert len(settled) == 2
+        assert tracker.realized_pnl()["USDC"] == 13
+        payouts = {p.position_id: p.payout for p in tracker.positions(FUTUUR)}
+        assert payouts == {"7:100": 20, "7:101": 8}
+
+
+def test_tracker_feeds_risk_engine(tmp_path):
+    bet = {
+        "id": 7,
+        "status": "p",
+        "question": {"id": 1, "categories": [{"id": 3}]},
+        "outcome": {"id": 11},
+        "active_purchases": [
+            {"id": 100, "amount": 10, "shares": 20, "currency": "USDC"}
+        ],
+    }
+    api = StubFutuurAPI({7: bet}, {"id": 1, "status": "o"})
+    ledger = str(tmp_path / "ledger.db")
+    risk = RiskEngine(RiskLimits(category=50))
+    with SettlementTracker(
+        ledger, futuur_api=api, manifold_api=object(), risk=risk
+    ) as tracker:
+        tracker.sync_futuur_positions()
+        assert risk.exposure(FUTUUR, 1) == 10
+        assert risk.by_category[3] == 10
+
+    # An engine seeded from the ledger files the position under its category too
+    seeded = RiskEngine(RiskLimits(category=50))
+    with SettlementTracker(
+        ledger, futuur_api=api, manifold_api=object(), risk=seeded
+    ) as tracker:
+        assert seeded.by_category[3] == 10
+
+        api.market = {"id": 1, "status": MARKET_CLOSED}
+        bet.update(status=BET_WON, payout=20)
+        tracker.poll(now=10**13)
+        assert seeded.exposure(FUTUUR, 1) == 0
+        assert seeded.by_category[3] == 0